@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+
+from app.models.schemas import JobResponse, JobSectionStatus
+from app.services import jobs
+
+router = APIRouter()
+
+
+def job_response(job: dict) -> JobResponse:
+    sections = [JobSectionStatus(**s) for s in job["sections"]]
+    return JobResponse(
+        job_id=job["id"],
+        kind=job["kind"],
+        status=job["status"],
+        params=job["params"],
+        sections=sections,
+        completed_sections=sum(s.status == "done" for s in sections),
+        total_sections=len(sections),
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str) -> JobResponse:
+    """Status and per-section progress of a background job."""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
@@ -1,27 +1,31 @@
 import asyncio
-import json
 import logging
 
 import httpx
 from fastapi import APIRouter, HTTPException, Query
 
-from app.cache import sqlite_cache as redis_client
+from app.cache import store as cache
 from app.config import get_settings
 from app.models.schemas import (
     AbstractTranslations,
     AuthorDetail,
     FulltextSection,
     FulltextTranslationResponse,
+    JobResponse,
     PaperDetailResponse,
     PaperSummaryResponse,
 )
-from app.services.pdf_extractor import extract_text_from_url, split_into_sections
+from app.api.routes.jobs import job_response
+from app.services import cache_refresher, jobs, paper_identity
+from app.services.pdf_extractor import PdfError, extract_sections_from_url
 from app.services.summarizer import (
     generate_paper_summary,
+    prompt_version,
     translate_abstract,
     translate_abstract_all_levels,
     translate_fulltext_sections,
 )
+from app.utils import circuit_breaker
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -31,11 +35,15 @@ router = APIRouter()
 async def get_paper_summary(
     paper_id: str,
     language: str = Query(default="ja"),
+    retry_failed: bool = Query(default=False),
 ) -> PaperSummaryResponse:
     """Get or generate a summary for a specific paper in the specified language."""
 
-    # Check cache
-    cached = await redis_client.get_cached_summary(paper_id, language)
+    # Check cache (entries from an older prompt version are served and refreshed)
+    version = prompt_version("summary")
+    cached, stale = await cache.get_cached_summary(paper_id, language, version)
+    if stale:
+        cache_refresher.schedule_summary_refresh(paper_id, language)
     if cached:
         return PaperSummaryResponse(
             paper_id=paper_id,
@@ -45,7 +53,7 @@ async def get_paper_summary(
         )
 
     # Fetch paper abstract from Semantic Scholar
-    paper_data = await _fetch_paper_from_semantic_scholar(paper_id)
+    paper_data = await _fetch_paper_from_semantic_scholar(paper_id, retry_failed=retry_failed)
     if not paper_data or not paper_data.get("abstract"):
         raise HTTPException(status_code=404, detail="Paper not found or no abstract available")
 
@@ -58,7 +66,7 @@ async def get_paper_summary(
         raise HTTPException(status_code=500, detail="Failed to generate summary")
 
     # Cache it
-    await redis_client.set_cached_summary(paper_id, language, summary)
+    await cache.set_cached_summary(paper_id, language, summary, version)
 
     return PaperSummaryResponse(
         paper_id=paper_id,
@@ -72,10 +80,11 @@ async def get_paper_summary(
 async def get_paper_detail(
     paper_id: str,
     language: str = Query(default="ja"),
+    retry_failed: bool = Query(default=False),
 ) -> PaperDetailResponse:
     """Get full paper details including translated abstract."""
 
-    paper_data = await _fetch_paper_from_semantic_scholar(paper_id)
+    paper_data = await _fetch_paper_from_semantic_scholar(paper_id, retry_failed=retry_failed)
     if not paper_data:
         raise HTTPException(status_code=404, detail="Paper not found")
 
@@ -87,13 +96,16 @@ async def get_paper_detail(
     abstract_translations = None
 
     if abstract:
-        cached_summary = await redis_client.get_cached_summary(paper_id, language)
+        version = prompt_version("summary")
+        cached_summary, stale = await cache.get_cached_summary(paper_id, language, version)
+        if stale:
+            cache_refresher.schedule_summary_refresh(paper_id, language, abstract, title)
         if cached_summary:
             summary = cached_summary
         else:
             summary = await generate_paper_summary(abstract, language, title)
             if summary:
-                await redis_client.set_cached_summary(paper_id, language, summary)
+                await cache.set_cached_summary(paper_id, language, summary, version)
 
         # For non-English languages, the abstract translation is the summary itself
         if language != "en":
@@ -158,29 +170,149 @@ async def get_paper_fulltext(
     paper_id: str,
     language: str = Query(default="ja"),
     difficulty: str = Query(default="layperson"),
+    section: int | None = Query(default=None, ge=0),
+    outline: bool = Query(default=False),
+    retry_failed: bool = Query(default=False),
 ) -> FulltextTranslationResponse:
     """Extract and translate the full text of a paper from its PDF.
 
-    Only works for open access papers with a PDF URL.
+    Only works for open access papers with a PDF URL. By default every
+    section is translated. With ``outline`` the section list is returned
+    immediately, filled in only where translations are already cached; a
+    single section is then translated on demand via ``section`` (its index
+    in the outline). Sections are cached individually and the full-document
+    entry is written once all of them are translated.
+
+    Recent failures (missing paper, unreadable PDF) are answered from the
+    negative cache unless ``retry_failed`` is set.
     """
     # Validate difficulty
     if difficulty not in ("expert", "layperson", "children"):
         difficulty = "layperson"
 
     # Check fulltext cache first
-    cached_data = await redis_client.get_cached_fulltext(paper_id, language, difficulty)
-    if cached_data:
-        sections_raw = json.loads(cached_data)
-        return FulltextTranslationResponse(
-            paper_id=paper_id,
-            language=language,
-            difficulty=difficulty,
-            sections=[FulltextSection(**s) for s in sections_raw],
-            cached=True,
+    version = prompt_version("fulltext")
+    cached_sections, stale = await cache.get_cached_fulltext(
+        paper_id, language, difficulty, version
+    )
+    if stale:
+        cache_refresher.schedule_fulltext_refresh(paper_id, language, difficulty)
+    if cached_sections:
+        return _fulltext_response(
+            paper_id, language, difficulty, cached_sections, section, cached=True
         )
 
-    # Fetch paper metadata to get PDF URL
-    paper_data = await _fetch_paper_from_semantic_scholar(paper_id)
+    pdf_url = await _get_pdf_url(paper_id, retry_failed)
+    sections = await _extract_sections(pdf_url, retry_failed)
+    logger.info("Paper %s: extracted %d sections from PDF", paper_id, len(sections))
+    if section is not None and section >= len(sections):
+        raise HTTPException(status_code=404, detail=f"Section {section} not found")
+
+    translated, stale_indices = await cache.get_cached_fulltext_sections(
+        paper_id, language, difficulty, [s["text"] for s in sections], version
+    )
+    if stale_indices:
+        cache_refresher.schedule_fulltext_refresh(paper_id, language, difficulty)
+
+    if section is not None:
+        todo = [section] if section not in translated else []
+    elif outline:
+        todo = []
+    else:
+        todo = [i for i in range(len(sections)) if i not in translated]
+
+    if todo:
+        await _translate_and_cache(
+            paper_id, language, difficulty, sections, todo, translated, version
+        )
+    assembled = await _assemble_fulltext(
+        paper_id, language, difficulty, sections, translated, version,
+        store=not stale_indices,
+    )
+
+    return _fulltext_response(
+        paper_id, language, difficulty, assembled, section, cached=not todo
+    )
+
+
+async def _translate_and_cache(
+    paper_id: str,
+    language: str,
+    difficulty: str,
+    sections: list[dict],
+    indices: list[int],
+    translated: dict[int, str],
+    version: str,
+    progress: jobs.JobProgress | None = None,
+) -> None:
+    """Translate ``sections[i]`` for each index into ``translated``.
+
+    Each section is cached as soon as it finishes, so work done before a
+    failure or cancellation is kept.
+    """
+    async def on_section(pos: int, entry: dict) -> None:
+        i = indices[pos]
+        if entry["translated"]:
+            translated[i] = entry["translated"]
+            await cache.set_cached_fulltext_sections(
+                paper_id, language, difficulty, [entry], version
+            )
+        if progress:
+            progress.mark(i, "done" if entry["translated"] else "failed")
+
+    await translate_fulltext_sections(
+        [sections[i] for i in indices], language, difficulty, on_section=on_section
+    )
+
+
+async def _assemble_fulltext(
+    paper_id: str,
+    language: str,
+    difficulty: str,
+    sections: list[dict],
+    translated: dict[int, str],
+    version: str,
+    *,
+    store: bool,
+) -> list[dict]:
+    """Merge section translations into the document; cache it once complete."""
+    assembled = [
+        {"section_name": s["name"], "original": s["text"], "translated": translated.get(i, "")}
+        for i, s in enumerate(sections)
+    ]
+    if store and len(translated) == len(sections):
+        await cache.set_cached_fulltext(paper_id, language, difficulty, assembled, version)
+    return assembled
+
+
+def _fulltext_response(
+    paper_id: str,
+    language: str,
+    difficulty: str,
+    sections: list[dict],
+    section: int | None,
+    *,
+    cached: bool,
+) -> FulltextTranslationResponse:
+    """Build the response for the whole document or one section of it."""
+    complete = all(s["translated"] for s in sections)
+    if section is not None:
+        if section >= len(sections):
+            raise HTTPException(status_code=404, detail=f"Section {section} not found")
+        sections = [sections[section]]
+    return FulltextTranslationResponse(
+        paper_id=paper_id,
+        language=language,
+        difficulty=difficulty,
+        sections=[FulltextSection(**s) for s in sections],
+        complete=complete,
+        cached=cached,
+    )
+
+
+async def _get_pdf_url(paper_id: str, retry_failed: bool) -> str:
+    """Open access PDF URL of a paper, or raise 404."""
+    paper_data = await _fetch_paper_from_semantic_scholar(paper_id, retry_failed=retry_failed)
     if not paper_data:
         raise HTTPException(status_code=404, detail="Paper not found")
 
@@ -191,33 +323,97 @@ async def get_paper_fulltext(
             status_code=404,
             detail="No PDF available for this paper (not open access)",
         )
+    return pdf_url
+
 
-    # Extract text from PDF
+async def _extract_sections(pdf_url: str, retry_failed: bool) -> list[dict]:
+    """Sections of a PDF (cached per PDF), or raise 422 if it can't be read."""
+    # Fail fast if this PDF recently could not be downloaded or parsed
+    if retry_failed:
+        await cache.clear_negative("pdf", pdf_url)
+    else:
+        failure = await cache.get_negative("pdf", pdf_url)
+        if failure:
+            raise HTTPException(status_code=422, detail=failure["reason"])
+
+    # Extract text from PDF and split into sections (in the PDF process pool)
     try:
-        full_text = await extract_text_from_url(pdf_url)
+        return await extract_sections_from_url(pdf_url)
+    except circuit_breaker.CircuitOpenError as e:
+        # Not remembered: the host is retried once its circuit half-opens
+        raise HTTPException(
+            status_code=503, detail="PDF host is temporarily unavailable"
+        ) from e
     except ValueError as e:
+        # Only failures that repeat on an immediate retry (403/404/410, too
+        # large, not a PDF, image-based) are remembered; 429, 5xx, timeouts
+        # and unreadable pages may succeed next time
+        if isinstance(e, PdfError) and e.permanent:
+            await cache.set_negative("pdf", pdf_url, str(e))
         raise HTTPException(status_code=422, detail=str(e)) from e
 
-    # Split into sections
-    sections = split_into_sections(full_text)
-    logger.info("Paper %s: extracted %d sections from PDF", paper_id, len(sections))
 
-    # Translate all sections in parallel
-    translated = await translate_fulltext_sections(sections, language, difficulty)
+@router.post(
+    "/paper/{paper_id}/fulltext/jobs",
+    response_model=JobResponse,
+    status_code=202,
+)
+async def submit_fulltext_job(
+    paper_id: str,
+    language: str = Query(default="ja"),
+    difficulty: str = Query(default="layperson"),
+) -> JobResponse:
+    """Queue fulltext translation in the background and return the job.
 
-    # Cache the result
-    await redis_client.set_cached_fulltext(
-        paper_id, language, difficulty,
-        json.dumps(translated, ensure_ascii=False),
+    Poll ``/jobs/{job_id}`` for per-section progress; once it is done the
+    result is served from cache by ``/paper/{paper_id}/fulltext``. A job for
+    the same paper, language and difficulty that is still queued or running
+    is returned instead of starting another.
+    """
+    if difficulty not in ("expert", "layperson", "children"):
+        difficulty = "layperson"
+    canonical = (await cache.resolve_paper_ids([paper_id]))[paper_id]
+    job = jobs.submit(
+        "fulltext",
+        f"fulltext:{canonical}:{language}:{difficulty}",
+        {"paper_id": paper_id, "language": language, "difficulty": difficulty},
     )
+    return job_response(job)
 
-    return FulltextTranslationResponse(
-        paper_id=paper_id,
-        language=language,
-        difficulty=difficulty,
-        sections=[FulltextSection(**s) for s in translated],
-        cached=False,
+
+async def _run_fulltext_job(params: dict, progress: jobs.JobProgress) -> None:
+    """Job handler: translate every section not yet cached for the current prompts."""
+    paper_id, language, difficulty = params["paper_id"], params["language"], params["difficulty"]
+    version = prompt_version("fulltext")
+
+    cached_sections, stale = await cache.get_cached_fulltext(
+        paper_id, language, difficulty, version
+    )
+    if cached_sections and not stale:
+        names = [s["section_name"] for s in cached_sections]
+        progress.set_sections(names, done=set(range(len(names))))
+        return
+
+    pdf_url = await _get_pdf_url(paper_id, retry_failed=False)
+    sections = await _extract_sections(pdf_url, retry_failed=False)
+    translated, stale_indices = await cache.get_cached_fulltext_sections(
+        paper_id, language, difficulty, [s["text"] for s in sections], version
     )
+    fresh = set(translated) - stale_indices
+    progress.set_sections([s["name"] for s in sections], done=fresh)
+
+    todo = [i for i in range(len(sections)) if i not in fresh]
+    if todo:
+        await _translate_and_cache(
+            paper_id, language, difficulty, sections, todo, translated, version, progress
+        )
+    await _assemble_fulltext(
+        paper_id, language, difficulty, sections, translated, version,
+        store=all(s["status"] == "done" for s in progress.sections),
+    )
+
+
+jobs.register_handler("fulltext", _run_fulltext_job)
 
 
 async def _get_abstract_translations(
@@ -229,18 +425,21 @@ async def _get_abstract_translations(
     """Get or generate 3-level abstract translations with caching."""
     difficulties = ["expert", "layperson", "children"]
 
-    # Check cache for all 3 levels
-    cached: dict[str, str | None] = {}
-    for d in difficulties:
-        cached[d] = await redis_client.get_cached_translation(paper_id, language, d)
-
-    uncached = [d for d in difficulties if not cached[d]]
+    # Check cache for all 3 levels in one round trip
+    version = prompt_version("translation")
+    cached, stale = await cache.get_cached_translations(
+        paper_id, language, difficulties, version
+    )
+    for d in stale:
+        cache_refresher.schedule_translation_refresh(paper_id, language, d, abstract, title)
+    uncached = [d for d in difficulties if not cached.get(d)]
+    to_cache: dict[str, str] = {}
 
     if uncached:
         # For English expert level, just use the original abstract
         if language == "en" and "expert" in uncached:
             cached["expert"] = abstract
-            await redis_client.set_cached_translation(paper_id, language, "expert", abstract)
+            to_cache["expert"] = abstract
             uncached.remove("expert")
 
         # Generate uncached translations in parallel
@@ -258,7 +457,10 @@ async def _get_abstract_translations(
                 else:
                     cached[d] = result or ""
                     if cached[d]:
-                        await redis_client.set_cached_translation(paper_id, language, d, cached[d])
+                        to_cache[d] = cached[d]
+
+    if to_cache:
+        await cache.set_cached_translations(paper_id, language, to_cache, version)
 
     return AbstractTranslations(
         expert=cached.get("expert") or None,
@@ -267,13 +469,28 @@ async def _get_abstract_translations(
     )
 
 
-async def _fetch_paper_from_semantic_scholar(paper_id: str) -> dict | None:
-    """Fetch a single paper from Semantic Scholar by ID with cache and retry."""
+async def _fetch_paper_from_semantic_scholar(
+    paper_id: str, *, retry_failed: bool = False
+) -> dict | None:
+    """Fetch a single paper from Semantic Scholar by ID with cache and retry.
+
+    A 404 is remembered in the negative cache so repeated lookups of an
+    unknown ID don't spend S2 quota; ``retry_failed`` bypasses it.
+
+    While the S2 circuit is open (or every attempt failed) stale cached
+    metadata is served if there is any. Without it an open circuit raises
+    CircuitOpenError (503), so an outage is not reported as a missing paper.
+    """
     # Check cache first
-    cached = await redis_client.get_cached_paper_metadata(paper_id)
+    cached = await cache.get_cached_paper_metadata(paper_id)
     if cached:
         return cached
 
+    if retry_failed:
+        await cache.clear_negative("paper", paper_id)
+    elif await cache.get_negative("paper", paper_id):
+        return None
+
     settings = get_settings()
     fields = "title,abstract,authors,year,citationCount,referenceCount,journal,isOpenAccess,openAccessPdf,externalIds"
     url = f"https://api.semanticscholar.org/graph/v1/paper/{paper_id}"
@@ -282,27 +499,59 @@ async def _fetch_paper_from_semantic_scholar(paper_id: str) -> dict | None:
     if settings.semantic_scholar_api_key:
         headers["x-api-key"] = settings.semantic_scholar_api_key
 
+    breaker = circuit_breaker.get("semantic_scholar_paper")
     max_retries = 3
+    data = None
     for attempt in range(max_retries):
+        # Skip the call (and the remaining retries) while S2 is failing
+        if not breaker.allow():
+            logger.warning("Semantic Scholar circuit open, not fetching paper %s", paper_id)
+            stale = await cache.get_cached_paper_metadata(paper_id, max_age=float("inf"))
+            circuit_breaker.mark_degraded(breaker.name)
+            if stale:
+                return stale
+            raise circuit_breaker.CircuitOpenError(breaker.name)
         try:
             async with httpx.AsyncClient(timeout=10.0) as client:
                 resp = await client.get(url, params={"fields": fields}, headers=headers)
                 if resp.status_code == 404:
+                    breaker.record_success()
+                    await cache.set_negative(
+                        "paper", paper_id, "Paper not found on Semantic Scholar"
+                    )
                     return None
                 if resp.status_code == 429:
+                    breaker.record_failure()
                     wait = 1.0 * (attempt + 1)
                     logger.warning("Semantic Scholar rate limited (429), retrying in %.1fs (attempt %d/%d)", wait, attempt + 1, max_retries)
                     await asyncio.sleep(wait)
                     continue
                 resp.raise_for_status()
                 data = resp.json()
-                # Cache paper metadata for 24 hours
-                await redis_client.set_cached_paper_metadata(paper_id, data)
-                return data
-        except Exception:
+                breaker.record_success()
+                break
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status < 500:  # the upstream answered; the request was bad
+                breaker.record_success()
+                logger.warning("Semantic Scholar HTTP error %s for paper %s", status, paper_id)
+                break
+            breaker.record_failure()
+            logger.warning("Semantic Scholar HTTP error %s for paper %s (attempt %d/%d)", status, paper_id, attempt + 1, max_retries)
+        except httpx.TransportError:  # timeouts and connection errors
+            breaker.record_failure()
             logger.exception("Failed to fetch paper %s from Semantic Scholar (attempt %d/%d)", paper_id, attempt + 1, max_retries)
-            if attempt < max_retries - 1:
-                await asyncio.sleep(1.0 * (attempt + 1))
-            else:
-                return None
-    return None
+        except ValueError:  # the upstream answered, but not with JSON
+            logger.exception("Invalid Semantic Scholar response for paper %s (attempt %d/%d)", paper_id, attempt + 1, max_retries)
+        if attempt < max_retries - 1:
+            await asyncio.sleep(1.0 * (attempt + 1))
+
+    if data is not None:
+        # Link this ID with the paper's S2 ID, PMID and DOI, then cache
+        # metadata under the canonical key
+        canonical = (await paper_identity.register(
+            [paper_identity.metadata_aliases(paper_id, data)]
+        ))[0]
+        await cache.set_cached_paper_metadata(canonical, data)
+        return data
+    return await cache.get_cached_paper_metadata(paper_id, max_age=float("inf"))
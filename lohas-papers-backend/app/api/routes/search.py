@@ -3,7 +3,8 @@ import logging
 
 from fastapi import APIRouter
 
-from app.cache import sqlite_cache as redis_client
+from app.cache import store as cache
+from app.config import get_settings
 from app.models.schemas import (
     AISummary,
     PaperResult,
@@ -14,7 +15,17 @@ from app.models.schemas import (
     SearchResponse,
     UnifiedPaper,
 )
-from app.services import paper_searcher, query_transformer, relevance_ranker, summarizer
+from app.services import (
+    cache_refresher,
+    paper_searcher,
+    query_rules,
+    query_transformer,
+    relevance_ranker,
+    study_classifier,
+    summarizer,
+)
+from app.utils import circuit_breaker, deadline
+from app.utils.query_normalizer import canonicalize
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -22,53 +33,114 @@ router = APIRouter()
 # Timeout per individual summary/overview task (seconds)
 _SUMMARY_TIMEOUT = 15.0
 
+# Time kept for the stages after each stage, out of settings.search_deadline
+# (seconds): a stage may use what is left of the deadline minus its reserve
+_RESERVE_AFTER_TRANSFORM = 15.0
+_RESERVE_AFTER_RETRIEVAL = 10.0
+_RESERVE_AFTER_RANKING = 4.0
+_RESERVE_AFTER_SUMMARIES = 0.5
+
+# Retrieval with less time than this searches only the first academic query
+_FULL_RETRIEVAL_SECONDS = 5.0
+# Retrieval always gets at least this long, even past the deadline
+_MIN_RETRIEVAL_SECONDS = 2.0
+# Summaries with less time than this are only generated for the top papers
+_FULL_SUMMARIES_SECONDS = 8.0
+_DEGRADED_SUMMARIES = 5
+
+# How long retrieval with dictionary-based queries waits for the LLM
+# transform's extra queries (seconds)
+_LLM_TRANSFORM_BUDGET = 4.0
+
+# Streamed (provisional) ranking score from which a first-page paper's
+# summary is started before the ranking finishes
+_EARLY_SCORE = 0.7
+_OVERVIEW_PAPERS = 5
+
+# Early summaries for papers that end up off the page keep running (their
+# result is cached); strong references keep them from being collected
+_background_tasks: set[asyncio.Task] = set()
+
 
 @router.post("/search", response_model=SearchResponse)
 async def search(request: SearchRequest) -> SearchResponse:
     """Main search endpoint: query transform -> paper search -> rank -> summarize."""
+    degraded = circuit_breaker.track_degraded()
+    request_deadline = deadline.start(get_settings().search_deadline)
 
     # 1. Check search result cache
-    cached = await redis_client.get_cached_search(
-        request.query, request.page, request.per_page, request.language
+    cached = await cache.get_cached_search(
+        request.query, request.page, request.per_page, request.language,
+        _filters_key(request),
     )
     if cached:
-        cached["cached"] = True
-        return SearchResponse(**cached)
+        return SearchResponse(**{**cached, "cached": True})
 
-    # 2. Transform query (with cache)
-    transform_result = await _get_or_transform_query(request.query, request.language)
+    # Recently seen zero-result searches are answered without any upstream calls
+    negative_key = _negative_search_key(request)
+    if request.retry_failed:
+        await cache.clear_negative("search", negative_key)
+    else:
+        failure = await cache.get_negative("search", negative_key)
+        if failure:
+            return _empty_response(request, failure.get("generated_queries", []), cached=True)
 
-    # 3. Search all sources in parallel (no sleep, fully parallel)
-    all_papers = await paper_searcher.search_all_sources(
-        transform_result,
-        year_from=request.filters.year_from,
-        year_to=request.filters.year_to,
-    )
+    # 2-3. Transform query (with cache) and search all sources in parallel
+    transform_result, all_papers = await _transform_and_search(request)
 
     if not all_papers:
-        return SearchResponse(
-            ai_summary=AISummary(
-                text="",
-                language=request.language,
+        # Nothing found because sources were skipped is not a real zero result
+        if not degraded and not request_deadline.degraded:
+            await cache.set_negative(
+                "search",
+                negative_key,
+                "No papers found",
                 generated_queries=transform_result.academic_queries,
-            ),
-            papers=[],
-            total_results=0,
-            page=request.page,
-            per_page=request.per_page,
+            )
+        return _empty_response(
+            request, transform_result.academic_queries,
+            degraded=degraded, stages=request_deadline.degraded,
         )
 
+    # Study-type filter works on metadata alone, before any LLM ranking
+    if request.filters.study_type:
+        all_papers = [
+            p for p in all_papers
+            if study_classifier.matches_filter(
+                study_classifier.classify(p)[0], request.filters.study_type
+            )
+        ]
+        if not all_papers:
+            return _empty_response(
+                request, transform_result.academic_queries,
+                degraded=degraded, stages=request_deadline.degraded,
+            )
+
     # 4. Run ranking + title translation in parallel
-    #    (both only need the paper list, not each other's results)
+    #    (both only need the paper list, not each other's results).
+    #    On the first page, summaries and the AI overview for papers the
+    #    streamed ranking scores highly start while ranking is still running.
+    #    Short of time, ranking falls back to pre-scores (BM25 + citations).
+    early = _EarlyWork(request, all_papers) if request.page == 1 else None
+    ranking_budget = deadline.budget(_RESERVE_AFTER_RANKING)
     ranking_task = relevance_ranker.rank_papers(
-        request.query, transform_result.interpreted_intent, all_papers
+        request.query,
+        transform_result.interpreted_intent,
+        all_papers,
+        transform_result,
+        on_ranked=early.on_ranked if early else None,
+        llm_timeout=ranking_budget,
     )
-    title_translation_task = summarizer.translate_titles_batch(
-        [p.title for p in all_papers], request.language
+    title_translation_task = asyncio.wait_for(
+        summarizer.translate_titles_batch([p.title for p in all_papers], request.language),
+        ranking_budget,
     )
     ranking_result, translation_result = await asyncio.gather(
         ranking_task, title_translation_task, return_exceptions=True
     )
+    if isinstance(translation_result, asyncio.TimeoutError):
+        logger.warning("Title translation over budget, showing original titles")
+        deadline.degrade("title_translation")
 
     rankings = ranking_result if not isinstance(ranking_result, Exception) else []
     all_translated_titles = translation_result if not isinstance(translation_result, Exception) else [p.title for p in all_papers]
@@ -85,7 +157,7 @@ async def search(request: SearchRequest) -> SearchResponse:
 
     # Sort papers by relevance score
     ranked_ids = [r.paper_id for r in sorted(rankings, key=lambda r: r.relevance_score, reverse=True)]
-    # Add un-ranked papers at the end
+    # Add papers without any score at the end
     for p in all_papers:
         if p.id not in ranking_map:
             ranked_ids.append(p.id)
@@ -99,23 +171,58 @@ async def search(request: SearchRequest) -> SearchResponse:
     page_papers = [paper_map[pid] for pid in page_ids if pid in paper_map]
 
     # 7. Generate summaries + AI overview in parallel (with per-task timeout)
-    summary_tasks = []
+    #    Cached summaries for the rest of the page are fetched in one round
+    #    trip; papers with an early summary task reuse it. Tasks are bounded
+    #    by the deadline; short of time only the top papers get new ones.
+    early_summaries = early.summaries if early else {}
+    summary_timeout = min(_SUMMARY_TIMEOUT, deadline.budget(_RESERVE_AFTER_SUMMARIES))
+    new_summary_limit = len(page_papers)
+    if summary_timeout < _FULL_SUMMARIES_SECONDS:
+        new_summary_limit = _DEGRADED_SUMMARIES
+    summary_version = summarizer.prompt_version("summary")
+    cached_summaries, stale = await cache.get_cached_summaries(
+        [
+            (p.id, request.language) for p in page_papers
+            if p.abstract and p.id not in early_summaries
+        ],
+        summary_version,
+    )
     for paper in page_papers:
-        if paper.abstract:
+        if (paper.id, request.language) in stale:
+            cache_refresher.schedule_summary_refresh(
+                paper.id, request.language, paper.abstract, paper.title
+            )
+    summary_tasks = []
+    for i, paper in enumerate(page_papers):
+        cached_summary = cached_summaries.get((paper.id, request.language))
+        if paper.id in early_summaries:
+            # Shielded: an early summary cut off here still finishes and is cached
+            summary_tasks.append(
+                _with_timeout(asyncio.shield(early_summaries[paper.id]), summary_timeout)
+            )
+        elif cached_summary:
+            summary_tasks.append(_return_value(cached_summary))
+        elif paper.abstract and i >= new_summary_limit:
+            deadline.degrade("summaries")
+            summary_tasks.append(_return_empty())
+        elif paper.abstract:
             summary_tasks.append(
                 _with_timeout(
-                    _get_or_generate_summary(paper.id, paper.abstract, request.language, paper.title),
-                    _SUMMARY_TIMEOUT,
+                    summarizer.generate_paper_summary(paper.abstract, request.language, paper.title),
+                    summary_timeout,
                 )
             )
         else:
             summary_tasks.append(_return_empty())
 
-    papers_context = _build_papers_context(page_papers[:5])
-    ai_overview_task = _with_timeout(
-        summarizer.generate_ai_overview(request.query, request.language, papers_context),
-        _SUMMARY_TIMEOUT,
-    )
+    if early and early.overview:
+        ai_overview_task = _with_timeout(asyncio.shield(early.overview), summary_timeout)
+    else:
+        papers_context = _build_papers_context(page_papers[:_OVERVIEW_PAPERS])
+        ai_overview_task = _with_timeout(
+            summarizer.generate_ai_overview(request.query, request.language, papers_context),
+            summary_timeout,
+        )
 
     # Run all in parallel
     all_tasks = [ai_overview_task] + summary_tasks
@@ -124,6 +231,17 @@ async def search(request: SearchRequest) -> SearchResponse:
     ai_overview_text = results[0] if not isinstance(results[0], Exception) else ""
     paper_summaries = results[1:]
 
+    new_summaries = {
+        (paper.id, request.language): summary_text
+        for paper, summary_text in zip(page_papers, paper_summaries)
+        if summary_text
+        and not isinstance(summary_text, Exception)
+        and (paper.id, request.language) not in cached_summaries
+        and paper.id not in early_summaries
+    }
+    if new_summaries:
+        await cache.set_cached_summaries(new_summaries, summary_version)
+
     # 8. Build response
     paper_results: list[PaperResult] = []
     for i, paper in enumerate(page_papers):
@@ -181,16 +299,20 @@ async def search(request: SearchRequest) -> SearchResponse:
         total_results=total_results,
         page=request.page,
         per_page=request.per_page,
+        degraded_sources=sorted(degraded),
+        degraded_stages=sorted(request_deadline.degraded),
     )
 
-    # 9. Cache the result
-    await redis_client.set_cached_search(
-        request.query,
-        request.page,
-        request.per_page,
-        response.model_dump(by_alias=True),
-        language=request.language,
-    )
+    # 9. Cache the result (degraded results are not worth keeping for hours)
+    if not degraded and not request_deadline.degraded:
+        await cache.set_cached_search(
+            request.query,
+            request.page,
+            request.per_page,
+            response.model_dump(by_alias=True),
+            language=request.language,
+            filters=_filters_key(request),
+        )
 
     # 10. Background: precache top 5 papers in all languages
     asyncio.create_task(_precache_top_papers(page_papers[:5]))
@@ -198,44 +320,242 @@ async def search(request: SearchRequest) -> SearchResponse:
     return response
 
 
+class _EarlyWork:
+    """Summary and overview tasks started from the streamed ranking.
+
+    Fed provisional scores through ``rank_papers(on_ranked=...)``. Every
+    paper scoring at least _EARLY_SCORE gets its summary task started (up to
+    one page worth); once _OVERVIEW_PAPERS such papers are known the AI
+    overview is started from them. A final ranking that differs slightly
+    only costs summaries for off-page papers, which are still cached.
+    """
+
+    def __init__(self, request: SearchRequest, papers: list[UnifiedPaper]):
+        self.request = request
+        self.paper_map = {p.id: p for p in papers}
+        self.summaries: dict[str, asyncio.Task] = {}
+        self.overview: asyncio.Task | None = None
+        self._top: list[UnifiedPaper] = []
+
+    def on_ranked(self, ranked: RankedPaper) -> None:
+        paper = self.paper_map.get(ranked.paper_id)
+        if (
+            paper is None
+            or ranked.relevance_score < _EARLY_SCORE
+            or any(p.id == paper.id for p in self._top)
+            or len(self._top) >= self.request.per_page
+        ):
+            return
+        self._top.append(paper)
+        if paper.abstract:
+            self.summaries[paper.id] = _spawn(_early_summary(paper, self.request.language))
+        if self.overview is None and len(self._top) == _OVERVIEW_PAPERS:
+            self.overview = _spawn(_with_timeout(
+                summarizer.generate_ai_overview(
+                    self.request.query, self.request.language, _build_papers_context(self._top)
+                ),
+                _SUMMARY_TIMEOUT,
+            ))
+            logger.info("AI overview started from streamed ranking")
+
+
+def _spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _early_summary(paper: UnifiedPaper, language: str) -> str:
+    """Cached or freshly generated (and cached) summary of one paper."""
+    version = summarizer.prompt_version("summary")
+    try:
+        cached, stale = await cache.get_cached_summaries([(paper.id, language)], version)
+        if (paper.id, language) in stale:
+            cache_refresher.schedule_summary_refresh(paper.id, language, paper.abstract, paper.title)
+        if (paper.id, language) in cached:
+            return cached[(paper.id, language)]
+        summary = await _with_timeout(
+            summarizer.generate_paper_summary(paper.abstract, language, paper.title),
+            _SUMMARY_TIMEOUT,
+        )
+        if summary:
+            await cache.set_cached_summaries({(paper.id, language): summary}, version)
+        return summary
+    except Exception:
+        logger.warning("Early summary failed for %s", paper.id, exc_info=True)
+        return ""
+
+
+def _filters_key(request: SearchRequest) -> str:
+    """Cache key component for filters that change the result set ("" if none)."""
+    filters = request.filters
+    if not (filters.year_from or filters.year_to or filters.study_type):
+        return ""
+    return f"{filters.year_from}|{filters.year_to}|{(filters.study_type or '').lower()}"
+
+
+def _negative_search_key(request: SearchRequest) -> str:
+    """Zero-result searches depend only on the query and year filters."""
+    filters = request.filters
+    return f"{canonicalize(request.query)}|{filters.year_from}|{filters.year_to}"
+
+
+def _empty_response(
+    request: SearchRequest,
+    generated_queries: list[str],
+    *,
+    cached: bool = False,
+    degraded: set[str] | None = None,
+    stages: set[str] | None = None,
+) -> SearchResponse:
+    return SearchResponse(
+        ai_summary=AISummary(
+            text="",
+            language=request.language,
+            generated_queries=generated_queries,
+        ),
+        papers=[],
+        total_results=0,
+        page=request.page,
+        per_page=request.per_page,
+        cached=cached,
+        degraded_sources=sorted(degraded or ()),
+        degraded_stages=sorted(stages or ()),
+    )
+
+
 async def _with_timeout(coro, timeout: float):
-    """Wrap a coroutine with a timeout. Returns empty string on timeout."""
+    """Wrap a summary/overview coroutine with a timeout. Returns empty string on timeout."""
     try:
         return await asyncio.wait_for(coro, timeout=timeout)
     except asyncio.TimeoutError:
         logger.warning("Task timed out after %.1fs", timeout)
+        deadline.degrade("summaries")
         return ""
 
 
-async def _get_or_transform_query(query: str, language: str) -> QueryTransformResult:
-    """Get cached transform or generate new one."""
-    cached = await redis_client.get_cached_transform(query)
-    if cached:
-        return QueryTransformResult(**cached)
+async def _transform_and_search(
+    request: SearchRequest,
+) -> tuple[QueryTransformResult, list[UnifiedPaper]]:
+    """Query transform (cached or new) and the paper search it drives.
 
-    result = await query_transformer.transform_query(query, language)
-    await redis_client.set_cached_transform(query, result.model_dump())
-    return result
+    Without a cached transform the LLM transform starts right away. When the
+    medical term dictionary covers the query, retrieval does not wait for
+    it: the rule-based queries are searched immediately, and LLM queries
+    arriving within _LLM_TRANSFORM_BUDGET are searched too and merged in.
 
+    An LLM transform that does not arrive within the transform stage's share
+    of the deadline is replaced by the plain fallback queries (and cached
+    once it does arrive).
+    """
+    years = {"year_from": request.filters.year_from, "year_to": request.filters.year_to}
 
-async def _get_or_generate_summary(
-    paper_id: str, abstract: str, language: str, title: str = ""
-) -> str:
-    """Get cached summary or generate new one."""
-    cached = await redis_client.get_cached_summary(paper_id, language)
+    cached = await cache.get_cached_transform(request.query)
     if cached:
-        return cached
+        transform = QueryTransformResult(**cached)
+        return transform, await _search(transform.academic_queries, years)
+
+    llm_task = asyncio.create_task(
+        query_transformer.transform_query(request.query, request.language)
+    )
+    rules = query_rules.transform(request.query)
+    if rules is None:
+        try:
+            transform = await asyncio.wait_for(
+                asyncio.shield(llm_task), deadline.budget(_RESERVE_AFTER_TRANSFORM)
+            )
+            await cache.set_cached_transform(request.query, transform.model_dump())
+        except asyncio.TimeoutError:
+            logger.warning("LLM transform over budget, searching fallback queries")
+            deadline.degrade("transform")
+            transform = query_transformer.fallback_result(request.query)
+            _spawn(_cache_late_transform(request.query, llm_task))
+        return transform, await _search(transform.academic_queries, years)
+
+    logger.info("Rule-based transform: '%s' -> %s", request.query, rules.academic_queries)
+    # Cached whenever the LLM finishes, even after this request is done
+    _spawn(_cache_merged_transform(request.query, rules, llm_task))
+
+    async def llm_extra() -> tuple[QueryTransformResult, list[UnifiedPaper]]:
+        try:
+            llm = await asyncio.wait_for(
+                asyncio.shield(llm_task),
+                min(_LLM_TRANSFORM_BUDGET, deadline.budget(_RESERVE_AFTER_TRANSFORM)),
+            )
+        except asyncio.TimeoutError:
+            logger.info("LLM transform over budget, searching rule-based queries only")
+            return rules, []
+        merged = _merge_transforms(rules, llm)
+        extra = merged.academic_queries[len(rules.academic_queries):]
+        if not extra:
+            return merged, []
+        return merged, await _fetch(extra, years)
+
+    rule_papers, (transform, extra_papers) = await asyncio.gather(
+        _fetch(rules.academic_queries, years), llm_extra()
+    )
+    return transform, await paper_searcher.merge_results(rule_papers + extra_papers)
+
+
+async def _fetch(queries: list[str], years: dict) -> list[UnifiedPaper]:
+    """Raw results for the queries within the retrieval stage's share of the deadline.
+
+    Short of time only the first query is searched.
+    """
+    timeout = deadline.budget(_RESERVE_AFTER_RETRIEVAL)
+    if timeout < _FULL_RETRIEVAL_SECONDS and len(queries) > 1:
+        logger.warning("%.1fs left for retrieval, searching the first query only", timeout)
+        deadline.degrade("retrieval")
+        queries = queries[:1]
+    return await paper_searcher.fetch_results(
+        queries, timeout=max(timeout, _MIN_RETRIEVAL_SECONDS), **years
+    )
+
+
+async def _search(queries: list[str], years: dict) -> list[UnifiedPaper]:
+    return await paper_searcher.merge_results(await _fetch(queries, years))
+
+
+def _merge_transforms(
+    rules: QueryTransformResult, llm: QueryTransformResult
+) -> QueryTransformResult:
+    """LLM transform with the rule-based queries first; the rules alone if the LLM failed."""
+    if query_transformer.is_fallback(llm):
+        return rules
+    return llm.model_copy(update={
+        "original_query": rules.original_query,
+        "academic_queries": list(dict.fromkeys(rules.academic_queries + llm.academic_queries)),
+        "mesh_terms": list(dict.fromkeys(rules.mesh_terms + llm.mesh_terms)),
+    })
 
-    summary = await summarizer.generate_paper_summary(abstract, language, title)
-    if summary:
-        await redis_client.set_cached_summary(paper_id, language, summary)
-    return summary
+
+async def _cache_merged_transform(
+    query: str, rules: QueryTransformResult, llm_task: asyncio.Task
+) -> None:
+    try:
+        merged = _merge_transforms(rules, await llm_task)
+    except Exception:
+        logger.warning("LLM transform failed for '%s'", query, exc_info=True)
+        merged = rules
+    await cache.set_cached_transform(query, merged.model_dump())
+
+
+async def _cache_late_transform(query: str, llm_task: asyncio.Task) -> None:
+    """Cache an LLM transform the request stopped waiting for."""
+    transform = await llm_task
+    if not query_transformer.is_fallback(transform):
+        await cache.set_cached_transform(query, transform.model_dump())
 
 
 async def _return_empty() -> str:
     return ""
 
 
+async def _return_value(value: str) -> str:
+    return value
+
+
 def _build_papers_context(papers: list[UnifiedPaper]) -> str:
     """Build a text summary of papers for AI overview generation."""
     parts = []
@@ -250,21 +570,29 @@ def _build_papers_context(papers: list[UnifiedPaper]) -> str:
 
 
 async def _precache_top_papers(papers: list[UnifiedPaper]) -> None:
-    """Background task to precache summaries for top papers in all 4 languages."""
+    """Background task to precache summaries for top papers in all languages."""
     all_languages = ["ja", "en", "zh-Hans", "ko", "es", "pt-BR", "th", "vi"]
+    papers = [p for p in papers if p.abstract]
+    version = summarizer.prompt_version("summary")
+    cached, stale = await cache.get_cached_summaries(
+        [(p.id, lang) for p in papers for lang in all_languages], version
+    )
     for paper in papers:
-        if not paper.abstract:
-            continue
+        generated: dict[tuple[str, str], str] = {}
         for lang in all_languages:
-            cached = await redis_client.get_cached_summary(paper.id, lang)
-            if not cached:
-                try:
-                    summary = await summarizer.generate_paper_summary(
-                        paper.abstract, lang, paper.title
-                    )
-                    if summary:
-                        await redis_client.set_cached_summary(paper.id, lang, summary)
-                except Exception:
-                    logger.warning(
-                        "Precache failed for %s/%s", paper.id, lang, exc_info=True
-                    )
+            # Entries from an older prompt version are regenerated here too
+            if (paper.id, lang) in cached and (paper.id, lang) not in stale:
+                continue
+            try:
+                summary = await summarizer.generate_paper_summary(
+                    paper.abstract, lang, paper.title
+                )
+                if summary:
+                    generated[(paper.id, lang)] = summary
+            except Exception:
+                logger.warning(
+                    "Precache failed for %s/%s", paper.id, lang, exc_info=True
+                )
+        # One write per paper so finished work survives a later failure
+        if generated:
+            await cache.set_cached_summaries(generated, version)
@@ -3,9 +3,10 @@ import logging
 
 from fastapi import APIRouter
 
-from app.cache import sqlite_cache as redis_client
+from app.cache import store as cache
 from app.models.schemas import BatchSummaryItem, BatchSummaryRequest, BatchSummaryResponse
-from app.services.summarizer import generate_paper_summary
+from app.services import cache_refresher
+from app.services.summarizer import generate_paper_summary, prompt_version
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -29,35 +30,49 @@ async def batch_summaries(request: BatchSummaryRequest) -> BatchSummaryResponse:
     Used when the user switches language — fetches cached or generates new summaries.
     """
 
-    async def get_one(paper_id: str) -> BatchSummaryItem:
-        # Check cache first
-        cached = await redis_client.get_cached_summary(paper_id, request.language)
-        if cached:
-            return BatchSummaryItem(paper_id=paper_id, summary=cached, cached=True)
+    # One cache round trip for the whole batch
+    version = prompt_version("summary")
+    cached, stale = await cache.get_cached_summaries(
+        [(pid, request.language) for pid in request.paper_ids], version
+    )
+    for paper_id, language in stale:
+        cache_refresher.schedule_summary_refresh(paper_id, language)
 
+    async def generate_one(paper_id: str) -> BatchSummaryItem:
         # Need to generate — fetch abstract first
         abstract, title = await _fetch_paper_abstract(paper_id)
         if not abstract:
             return BatchSummaryItem(paper_id=paper_id, summary="", cached=False)
 
         summary = await generate_paper_summary(abstract, request.language, title)
-        if summary:
-            await redis_client.set_cached_summary(paper_id, request.language, summary)
-
         return BatchSummaryItem(paper_id=paper_id, summary=summary, cached=False)
 
-    # Run all in parallel
-    tasks = [get_one(pid) for pid in request.paper_ids]
+    # Generate all uncached summaries in parallel
+    uncached_ids = [
+        pid for pid in dict.fromkeys(request.paper_ids)
+        if (pid, request.language) not in cached
+    ]
+    tasks = [generate_one(pid) for pid in uncached_ids]
     results = await asyncio.gather(*tasks, return_exceptions=True)
 
-    summaries = []
-    for i, result in enumerate(results):
+    generated: dict[str, BatchSummaryItem] = {}
+    for paper_id, result in zip(uncached_ids, results):
         if isinstance(result, Exception):
-            logger.warning("Batch summary failed for %s: %s", request.paper_ids[i], result)
-            summaries.append(
-                BatchSummaryItem(paper_id=request.paper_ids[i], summary="", cached=False)
-            )
+            logger.warning("Batch summary failed for %s: %s", paper_id, result)
+            result = BatchSummaryItem(paper_id=paper_id, summary="", cached=False)
+        generated[paper_id] = result
+
+    await cache.set_cached_summaries(
+        {(pid, request.language): item.summary for pid, item in generated.items() if item.summary},
+        version,
+    )
+
+    summaries = []
+    for paper_id in request.paper_ids:
+        summary = cached.get((paper_id, request.language))
+        if summary:
+            summaries.append(BatchSummaryItem(paper_id=paper_id, summary=summary, cached=True))
         else:
-            summaries.append(result)
+            summaries.append(generated[paper_id])
 
     return BatchSummaryResponse(summaries=summaries)
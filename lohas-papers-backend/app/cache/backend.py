@@ -0,0 +1,52 @@
+"""L2 cache backend protocol and selection.
+
+A backend stores codec-encoded values by key. Both ``sqlite_cache`` and
+``redis_client`` implement this protocol at module level.
+"""
+
+from types import ModuleType
+from typing import Protocol
+
+from app.config import get_settings
+
+
+class CacheBackend(Protocol):
+    name: str
+
+    async def get_many(self, keys: list[str]) -> dict:
+        """Return decoded values for the keys that exist and are not expired."""
+        ...
+
+    async def set_many(self, items: dict, ttl: int | None = None) -> None:
+        """Store values; ``ttl=None`` means no expiry."""
+        ...
+
+    async def delete_many(self, keys: list[str]) -> None:
+        ...
+
+    async def add_members(self, key: str, members: list[str]) -> None:
+        """Atomically add members to the set at ``key`` (existing ones are kept as is)."""
+        ...
+
+    async def get_members(self, key: str) -> list[str]:
+        """Members of the set at ``key``, in the order they were first added."""
+        ...
+
+
+_backend: CacheBackend | ModuleType | None = None
+
+
+def get_backend() -> CacheBackend:
+    """Return the L2 backend selected by ``Settings.cache_backend``."""
+    global _backend
+    if _backend is None:
+        settings = get_settings()
+        if settings.cache_backend == "redis":
+            from app.cache import redis_client
+
+            _backend = redis_client
+        else:
+            from app.cache import sqlite_cache
+
+            _backend = sqlite_cache
+    return _backend
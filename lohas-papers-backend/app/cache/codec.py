@@ -0,0 +1,66 @@
+"""Binary codec for cache values.
+
+Every value written by the cache layer is encoded as ``MAGIC + tag + payload``:
+
+- ``J``: compact UTF-8 JSON
+- ``Z``: zlib-compressed compact UTF-8 JSON (used above COMPRESS_THRESHOLD)
+
+Entries written before the codec existed are plain text (JSON documents or
+raw summaries). They never start with MAGIC, so ``decode`` passes them
+through unchanged and old and new entries can live in the same store.
+"""
+
+import json
+import zlib
+
+MAGIC = b"\x00"
+TAG_JSON = b"J"
+TAG_ZLIB = b"Z"
+
+# Values smaller than this are not worth the zlib header + CPU
+COMPRESS_THRESHOLD = 1024
+COMPRESS_LEVEL = 6
+
+
+def encode(value) -> bytes:
+    """Encode a JSON-serializable value into a tagged binary blob."""
+    payload = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+    if len(payload) >= COMPRESS_THRESHOLD:
+        compressed = zlib.compress(payload, COMPRESS_LEVEL)
+        if len(compressed) < len(payload):
+            return MAGIC + TAG_ZLIB + compressed
+    return MAGIC + TAG_JSON + payload
+
+
+def decode(raw: bytes | str | None):
+    """Decode a stored value.
+
+    Tagged blobs are decoded to Python objects. Legacy untagged values are
+    returned as ``str`` so callers can apply their old parsing.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        return raw
+    if not raw.startswith(MAGIC):
+        return raw.decode()
+
+    tag = raw[1:2]
+    payload = raw[2:]
+    if tag == TAG_ZLIB:
+        payload = zlib.decompress(payload)
+    elif tag != TAG_JSON:
+        raise ValueError(f"Unknown cache codec tag: {tag!r}")
+    return json.loads(payload)
+
+
+def decode_json(raw):
+    """Decode a value that is expected to be a JSON document (dict or list).
+
+    Accepts raw stored values or values already passed through ``decode``.
+    Legacy entries were stored as ``json.dumps`` text and are parsed here.
+    """
+    value = decode(raw) if isinstance(raw, (bytes, str)) else raw
+    if isinstance(value, str):
+        return json.loads(value) if value else None
+    return value
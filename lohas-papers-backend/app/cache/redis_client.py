@@ -1,13 +1,22 @@
-import hashlib
-import json
+"""Redis L2 cache backend.
+
+Implements the ``CacheBackend`` protocol; domain-level cache functions
+live in ``app.cache.store``. If Redis is unreachable every operation is a
+no-op (reads miss), matching the previous behavior.
+"""
+
 import logging
+import time
 
 import redis.asyncio as redis
 
+from app.cache import codec
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+name = "redis"
+
 _pool: redis.Redis | None = None
 
 
@@ -19,7 +28,8 @@ async def get_redis() -> redis.Redis | None:
 
     settings = get_settings()
     try:
-        _pool = redis.from_url(settings.redis_url, decode_responses=True)
+        # Values are codec-encoded bytes, so responses must not be decoded
+        _pool = redis.from_url(settings.redis_url, decode_responses=False)
         await _pool.ping()
         return _pool
     except Exception:
@@ -28,94 +38,61 @@ async def get_redis() -> redis.Redis | None:
         return None
 
 
-def _make_key(prefix: str, *parts: str) -> str:
-    raw = ":".join(parts)
-    hashed = hashlib.sha256(raw.encode()).hexdigest()[:16]
-    return f"{prefix}:{hashed}"
-
-
-# ── Search result cache ──
-
-
-async def get_cached_search(query: str, page: int, per_page: int) -> dict | None:
-    r = await get_redis()
-    if r is None:
-        return None
-
-    key = _make_key("search", query.lower().strip(), str(page), str(per_page))
-    try:
-        data = await r.get(key)
-        return json.loads(data) if data else None
-    except Exception:
-        logger.warning("Redis get failed for search cache", exc_info=True)
-        return None
+async def _get_many(r: redis.Redis, keys: list[str]) -> dict:
+    """Get several decoded values with a single MGET. Missing keys are omitted."""
+    if not keys:
+        return {}
+    values = await r.mget(keys)
+    return {k: codec.decode(v) for k, v in zip(keys, values) if v is not None}
 
 
-async def set_cached_search(
-    query: str, page: int, per_page: int, data: dict, ttl: int = 21600
-) -> None:
-    r = await get_redis()
-    if r is None:
+async def _set_many(r: redis.Redis, items: dict, ttl: int | None = None) -> None:
+    """Set several values in one pipelined round trip."""
+    if not items:
         return
+    async with r.pipeline(transaction=False) as pipe:
+        for key, value in items.items():
+            pipe.set(key, codec.encode(value), ex=ttl)
+        await pipe.execute()
 
-    key = _make_key("search", query.lower().strip(), str(page), str(per_page))
-    try:
-        await r.set(key, json.dumps(data, ensure_ascii=False), ex=ttl)
-    except Exception:
-        logger.warning("Redis set failed for search cache", exc_info=True)
 
+# ── CacheBackend protocol ──
 
-# ── Query transform cache ──
 
-
-async def get_cached_transform(query: str) -> dict | None:
+async def get_many(keys: list[str]) -> dict:
     r = await get_redis()
     if r is None:
-        return None
+        return {}
+    return await _get_many(r, list(dict.fromkeys(keys)))
 
-    key = _make_key("transform", query.lower().strip())
-    try:
-        data = await r.get(key)
-        return json.loads(data) if data else None
-    except Exception:
-        return None
 
-
-async def set_cached_transform(query: str, data: dict, ttl: int = 86400) -> None:
+async def set_many(items: dict, ttl: int | None = None) -> None:
     r = await get_redis()
     if r is None:
         return
+    await _set_many(r, items, ttl)
 
-    key = _make_key("transform", query.lower().strip())
-    try:
-        await r.set(key, json.dumps(data, ensure_ascii=False), ex=ttl)
-    except Exception:
-        logger.warning("Redis set failed for transform cache", exc_info=True)
 
+async def delete_many(keys: list[str]) -> None:
+    r = await get_redis()
+    if r is None or not keys:
+        return
+    await r.delete(*keys)
 
-# ── Summary cache ──
 
+# Sets are sorted sets scored by first-add time: ZADD NX is atomic and
+# keeps the original order
 
-async def get_cached_summary(paper_id: str, language: str) -> str | None:
+async def add_members(key: str, members: list[str]) -> None:
     r = await get_redis()
-    if r is None:
-        return None
-
-    key = f"summary:{paper_id}:{language}"
-    try:
-        return await r.get(key)
-    except Exception:
-        return None
+    if r is None or not members:
+        return
+    now = time.time()
+    await r.zadd(key, {m: now for m in members}, nx=True)
 
 
-async def set_cached_summary(paper_id: str, language: str, summary: str) -> None:
-    """Cache a summary permanently (no TTL — summaries don't change)."""
+async def get_members(key: str) -> list[str]:
     r = await get_redis()
     if r is None:
-        return
-
-    key = f"summary:{paper_id}:{language}"
-    try:
-        await r.set(key, summary)
-    except Exception:
-        logger.warning("Redis set failed for summary cache", exc_info=True)
+        return []
+    return [m.decode() for m in await r.zrange(key, 0, -1)]
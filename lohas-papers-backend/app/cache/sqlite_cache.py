@@ -1,19 +1,26 @@
-"""SQLite-based cache that works without Redis.
-Drop-in replacement exposing the same async API as redis_client.
+"""SQLite-based L2 cache backend that works without Redis.
+
+Implements the ``CacheBackend`` protocol; domain-level cache functions
+live in ``app.cache.store``.
 """
 
-import hashlib
-import json
 import logging
 import sqlite3
 import time
 from pathlib import Path
 
+from app.cache import codec
+
 logger = logging.getLogger(__name__)
 
+name = "sqlite"
+
 _DB_PATH = Path(__file__).resolve().parent.parent.parent / "cache.db"
 _conn: sqlite3.Connection | None = None
 
+# Stay well below SQLITE_MAX_VARIABLE_NUMBER for IN (...) queries
+_MAX_IN_PARAMS = 500
+
 
 def _get_conn() -> sqlite3.Connection:
     global _conn
@@ -28,160 +35,93 @@ def _get_conn() -> sqlite3.Connection:
             ")"
         )
         _conn.execute("CREATE INDEX IF NOT EXISTS idx_expires ON cache(expires_at)")
+        # Sets updated by several processes at once (INSERT OR IGNORE is atomic)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_sets ("
+            "  key TEXT NOT NULL,"
+            "  member TEXT NOT NULL,"
+            "  added_at REAL NOT NULL,"
+            "  PRIMARY KEY (key, member)"
+            ")"
+        )
         _conn.commit()
     return _conn
 
 
-def _make_key(prefix: str, *parts: str) -> str:
-    raw = ":".join(parts)
-    hashed = hashlib.sha256(raw.encode()).hexdigest()[:16]
-    return f"{prefix}:{hashed}"
-
+def _get_many(keys: list[str]) -> dict:
+    """Get several decoded values with one IN (...) query per 500 keys.
 
-def _get(key: str) -> str | None:
+    Missing and expired keys are omitted from the result.
+    """
     conn = _get_conn()
-    row = conn.execute(
-        "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
-    ).fetchone()
-    if row is None:
-        return None
-    value, expires_at = row
-    if expires_at is not None and time.time() > expires_at:
-        conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+    now = time.time()
+    found: dict = {}
+    expired: list[str] = []
+    unique_keys = list(dict.fromkeys(keys))
+    for i in range(0, len(unique_keys), _MAX_IN_PARAMS):
+        chunk = unique_keys[i:i + _MAX_IN_PARAMS]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT key, value, expires_at FROM cache WHERE key IN ({placeholders})",
+            chunk,
+        ).fetchall()
+        for key, value, expires_at in rows:
+            if expires_at is not None and now > expires_at:
+                expired.append(key)
+                continue
+            found[key] = codec.decode(value)
+    if expired:
+        conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in expired])
         conn.commit()
-        return None
-    return value
+    return found
 
 
-def _set(key: str, value: str, ttl: int | None = None) -> None:
+def _set_many(items: dict, ttl: int | None = None) -> None:
+    """Set several values in a single transaction."""
+    if not items:
+        return
     conn = _get_conn()
     expires_at = time.time() + ttl if ttl else None
-    conn.execute(
+    conn.executemany(
         "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
-        (key, value, expires_at),
+        [(key, codec.encode(value), expires_at) for key, value in items.items()],
     )
     conn.commit()
 
 
-# ── Search result cache ──
-
-
-async def get_cached_search(query: str, page: int, per_page: int, language: str = "") -> dict | None:
-    key = _make_key("search", query.lower().strip(), str(page), str(per_page), language)
-    try:
-        data = _get(key)
-        return json.loads(data) if data else None
-    except Exception:
-        logger.warning("Cache get failed for search", exc_info=True)
-        return None
-
-
-async def set_cached_search(
-    query: str, page: int, per_page: int, data: dict, ttl: int = 21600, language: str = ""
-) -> None:
-    key = _make_key("search", query.lower().strip(), str(page), str(per_page), language)
-    try:
-        _set(key, json.dumps(data, ensure_ascii=False), ttl)
-    except Exception:
-        logger.warning("Cache set failed for search", exc_info=True)
-
-
-# ── Query transform cache ──
-
-
-async def get_cached_transform(query: str) -> dict | None:
-    key = _make_key("transform", query.lower().strip())
-    try:
-        data = _get(key)
-        return json.loads(data) if data else None
-    except Exception:
-        return None
-
-
-async def set_cached_transform(query: str, data: dict, ttl: int = 86400) -> None:
-    key = _make_key("transform", query.lower().strip())
-    try:
-        _set(key, json.dumps(data, ensure_ascii=False), ttl)
-    except Exception:
-        logger.warning("Cache set failed for transform", exc_info=True)
-
+# ── CacheBackend protocol ──
 
-# ── Summary cache ──
 
+async def get_many(keys: list[str]) -> dict:
+    return _get_many(keys)
 
-async def get_cached_summary(paper_id: str, language: str) -> str | None:
-    key = f"summary:{paper_id}:{language}"
-    try:
-        return _get(key)
-    except Exception:
-        return None
 
+async def set_many(items: dict, ttl: int | None = None) -> None:
+    _set_many(items, ttl)
 
-async def set_cached_summary(paper_id: str, language: str, summary: str) -> None:
-    key = f"summary:{paper_id}:{language}"
-    try:
-        _set(key, summary)  # No TTL — summaries don't change
-    except Exception:
-        logger.warning("Cache set failed for summary", exc_info=True)
 
-
-# ── Abstract translation cache ──
-
-
-async def get_cached_translation(paper_id: str, language: str, difficulty: str) -> str | None:
-    key = f"translation:{paper_id}:{language}:{difficulty}"
-    try:
-        return _get(key)
-    except Exception:
-        return None
-
-
-async def set_cached_translation(
-    paper_id: str, language: str, difficulty: str, text: str
-) -> None:
-    key = f"translation:{paper_id}:{language}:{difficulty}"
-    try:
-        _set(key, text)  # No TTL — translations don't change
-    except Exception:
-        logger.warning("Cache set failed for translation", exc_info=True)
-
-
-# ── Paper metadata cache (Semantic Scholar) ──
-
-
-async def get_cached_paper_metadata(paper_id: str) -> dict | None:
-    key = f"paper_meta:{paper_id}"
-    try:
-        data = _get(key)
-        return json.loads(data) if data else None
-    except Exception:
-        return None
-
-
-async def set_cached_paper_metadata(paper_id: str, data: dict, ttl: int = 86400) -> None:
-    key = f"paper_meta:{paper_id}"
-    try:
-        _set(key, json.dumps(data, ensure_ascii=False), ttl)
-    except Exception:
-        logger.warning("Cache set failed for paper metadata", exc_info=True)
-
-
-# ── Fulltext translation cache ──
+async def delete_many(keys: list[str]) -> None:
+    if not keys:
+        return
+    conn = _get_conn()
+    conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in keys])
+    conn.commit()
 
 
-async def get_cached_fulltext(paper_id: str, language: str, difficulty: str) -> str | None:
-    key = f"fulltext:{paper_id}:{language}:{difficulty}"
-    try:
-        return _get(key)
-    except Exception:
-        return None
+async def add_members(key: str, members: list[str]) -> None:
+    if not members:
+        return
+    conn = _get_conn()
+    now = time.time()
+    conn.executemany(
+        "INSERT OR IGNORE INTO cache_sets (key, member, added_at) VALUES (?, ?, ?)",
+        [(key, m, now) for m in members],
+    )
+    conn.commit()
 
 
-async def set_cached_fulltext(
-    paper_id: str, language: str, difficulty: str, data: str
-) -> None:
-    key = f"fulltext:{paper_id}:{language}:{difficulty}"
-    try:
-        _set(key, data)  # No TTL — fulltext translations don't change
-    except Exception:
-        logger.warning("Cache set failed for fulltext", exc_info=True)
+async def get_members(key: str) -> list[str]:
+    rows = _get_conn().execute(
+        "SELECT member FROM cache_sets WHERE key = ? ORDER BY added_at, rowid", (key,)
+    ).fetchall()
+    return [member for (member,) in rows]
@@ -0,0 +1,620 @@
+"""Tiered cache facade used by routes and services.
+
+L1 is an in-process LRU holding live Python objects for hot namespaces
+(search results, query transforms, summaries, translations, paper
+metadata). L2 is the backend selected by ``Settings.cache_backend``
+(SQLite or Redis). Reads go L1 -> L2 and L2 hits are promoted to L1;
+writes go to both tiers.
+
+Values returned from this module may be shared with the L1 tier and must
+not be mutated by callers.
+"""
+
+import hashlib
+import logging
+import time
+
+from app.cache import codec
+from app.cache.backend import get_backend
+from app.cache.memory import LRUCache
+from app.config import get_settings
+from app.utils.query_normalizer import QueryIndex, canonicalize
+
+logger = logging.getLogger(__name__)
+
+# Namespaces served from memory. Fulltext entries (whole documents and
+# single sections) are large and rarely re-read, so they only live in L2.
+_L1_NAMESPACES = {
+    "search", "transform", "summary", "translation", "rank", "paper_meta", "paper_alias", "neg",
+}
+
+_l1: LRUCache | None = None
+_l2_hits = 0
+_l2_misses = 0
+
+
+def _get_l1() -> LRUCache:
+    global _l1
+    if _l1 is None:
+        settings = get_settings()
+        _l1 = LRUCache(
+            max_entries=settings.cache_l1_max_entries,
+            default_ttl=settings.cache_l1_ttl,
+        )
+    return _l1
+
+
+def _make_key(prefix: str, *parts: str) -> str:
+    raw = ":".join(parts)
+    hashed = hashlib.sha256(raw.encode()).hexdigest()[:16]
+    return f"{prefix}:{hashed}"
+
+
+def _in_l1(key: str) -> bool:
+    return key.split(":", 1)[0] in _L1_NAMESPACES
+
+
+async def _get_many(keys: list[str], *, json_values: bool = False) -> dict:
+    """Look up keys in L1, then fetch the remainder from L2 in one call.
+
+    With ``json_values=True``, legacy JSON text entries are parsed before
+    being promoted so L1 always holds ready-to-use objects.
+    """
+    global _l2_hits, _l2_misses
+    l1 = _get_l1()
+    found: dict = {}
+    l2_keys: list[str] = []
+    for key in dict.fromkeys(keys):
+        value = l1.get(key) if _in_l1(key) else None
+        if value is not None:
+            found[key] = value
+        else:
+            l2_keys.append(key)
+
+    if not l2_keys:
+        return found
+
+    try:
+        l2_found = await get_backend().get_many(l2_keys)
+    except Exception:
+        logger.warning("Cache L2 get_many failed", exc_info=True)
+        return found
+
+    _l2_hits += len(l2_found)
+    _l2_misses += len(l2_keys) - len(l2_found)
+    for key, value in l2_found.items():
+        if json_values:
+            try:
+                value = codec.decode_json(value)
+            except ValueError:
+                logger.warning("Undecodable cache entry: %s", key)
+                continue
+        if value is None:
+            continue
+        found[key] = value
+        if _in_l1(key):
+            l1.set(key, value)
+    return found
+
+
+async def _get(key: str, *, json_values: bool = False):
+    return (await _get_many([key], json_values=json_values)).get(key)
+
+
+async def _set_many(items: dict, ttl: int | None = None) -> None:
+    """Write values to L2 and to L1 for hot namespaces."""
+    if not items:
+        return
+    l1 = _get_l1()
+    for key, value in items.items():
+        if _in_l1(key):
+            l1.set(key, value, ttl)
+    try:
+        await get_backend().set_many(items, ttl)
+    except Exception:
+        logger.warning("Cache L2 set_many failed", exc_info=True)
+
+
+async def _set(key: str, value, ttl: int | None = None) -> None:
+    await _set_many({key: value}, ttl)
+
+
+async def _delete(key: str) -> None:
+    await _delete_many([key])
+
+
+async def _delete_many(keys: list[str]) -> None:
+    l1 = _get_l1()
+    for key in keys:
+        l1.delete(key)
+    try:
+        await get_backend().delete_many(keys)
+    except Exception:
+        logger.warning("Cache L2 delete_many failed", exc_info=True)
+
+
+def get_stats() -> dict:
+    """Per-tier hit statistics since process start."""
+    l2_lookups = _l2_hits + _l2_misses
+    return {
+        "l1": _get_l1().stats(),
+        "l2": {
+            "backend": get_backend().name,
+            "hits": _l2_hits,
+            "misses": _l2_misses,
+            "hit_rate": round(_l2_hits / l2_lookups, 4) if l2_lookups else 0.0,
+        },
+    }
+
+
+# ── Search result cache ──
+
+
+def _search_key(query: str, page: int, per_page: int, language: str, filters: str) -> str:
+    parts = [canonicalize(query), str(page), str(per_page), language]
+    if filters:  # unfiltered searches keep their original keys
+        parts.append(filters)
+    return _make_key("search", *parts)
+
+
+async def get_cached_search(
+    query: str, page: int, per_page: int, language: str = "", filters: str = ""
+) -> dict | None:
+    return await _get(_search_key(query, page, per_page, language, filters), json_values=True)
+
+
+async def set_cached_search(
+    query: str,
+    page: int,
+    per_page: int,
+    data: dict,
+    ttl: int = 21600,
+    language: str = "",
+    filters: str = "",
+) -> None:
+    await _set(_search_key(query, page, per_page, language, filters), data, ttl)
+
+
+# ── Query transform cache ──
+#
+# Keyed by the canonical query (see utils.query_normalizer), so spelling
+# variants share one entry. Queries transformed by this process are also
+# kept in a trigram index; a miss falls back to the entry of the most
+# similar past query.
+
+_query_index = QueryIndex()
+
+
+async def get_cached_transform(query: str) -> dict | None:
+    canonical = canonicalize(query)
+    cached = await _get(_make_key("transform", canonical), json_values=True)
+    if cached is not None:
+        return cached
+
+    similar = _query_index.nearest(canonical)
+    if similar is None:
+        return None
+    cached = await _get(_make_key("transform", similar), json_values=True)
+    if cached is not None:
+        logger.info("Transform cache: '%s' reuses near-duplicate '%s'", canonical, similar)
+    return cached
+
+
+async def set_cached_transform(query: str, data: dict, ttl: int = 86400) -> None:
+    canonical = canonicalize(query)
+    await _set(_make_key("transform", canonical), data, ttl)
+    _query_index.add(canonical)
+
+
+# ── Prompt-versioned entries (summary, translation, fulltext) ──
+#
+# Keys look like "summary:{version}:{paper_id}:{language}", where version is
+# the prompt/model fingerprint from summarizer.prompt_version(). Every
+# version ever written is recorded in a small registry so lookups can fall
+# back to entries from older versions (and to pre-versioning keys without a
+# version segment). Callers serve those stale values and schedule a lazy
+# regeneration.
+
+# The registry is a backend set, so processes sharing the L2 add versions
+# atomically instead of overwriting each other's list. Registries from
+# before that (a JSON list under "prompt_versions:{kind}") are still read.
+
+_MAX_KNOWN_VERSIONS = 8
+_known_versions: dict[str, list[str]] = {}
+
+
+async def _get_known_versions(kind: str) -> list[str]:
+    """Registered versions of a kind, oldest first (at most _MAX_KNOWN_VERSIONS)."""
+    if kind not in _known_versions:
+        legacy = await _get(f"prompt_versions:{kind}", json_values=True)
+        try:
+            members = await get_backend().get_members(f"prompt_version_set:{kind}")
+        except Exception:
+            logger.warning("Cache L2 get_members failed", exc_info=True)
+            members = []
+        versions = list(dict.fromkeys([*(legacy or []), *members]))
+        _known_versions[kind] = versions[-_MAX_KNOWN_VERSIONS:]
+    return _known_versions[kind]
+
+
+async def _register_version(kind: str, version: str) -> None:
+    versions = await _get_known_versions(kind)
+    if version in versions:
+        return
+    try:
+        await get_backend().add_members(f"prompt_version_set:{kind}", [version])
+    except Exception:
+        logger.warning("Cache L2 add_members failed", exc_info=True)
+    versions.append(version)
+    del versions[:-_MAX_KNOWN_VERSIONS]
+
+
+async def _get_versioned(
+    kind: str, suffixes: list[str], version: str, *, json_values: bool = False
+) -> tuple[dict[str, object], set[str]]:
+    """Look up "{kind}:{version}:{suffix}" keys, falling back to older versions.
+
+    Returns (values by suffix, suffixes that were served from an older
+    version). At most two L2 round trips regardless of the number of keys.
+    """
+    current = {f"{kind}:{version}:{sfx}": sfx for sfx in suffixes}
+    found = await _get_many(list(current), json_values=json_values)
+    result = {current[k]: v for k, v in found.items() if v}
+
+    missing = [sfx for sfx in suffixes if sfx not in result]
+    if not missing:
+        return result, set()
+
+    # Newest older version first, pre-versioning keys last
+    older = [v for v in reversed(await _get_known_versions(kind)) if v != version]
+    candidates = [(f"{kind}:{v}:{sfx}", sfx) for v in older for sfx in missing]
+    candidates += [(f"{kind}:{sfx}", sfx) for sfx in missing]
+    found = await _get_many([k for k, _ in candidates], json_values=json_values)
+
+    stale: set[str] = set()
+    for key, sfx in candidates:
+        if sfx not in result and found.get(key):
+            result[sfx] = found[key]
+            stale.add(sfx)
+    return result, stale
+
+
+async def _set_versioned(
+    kind: str, items: dict[str, object], version: str, ttl: int | None = None
+) -> None:
+    if not items:
+        return
+    await _register_version(kind, version)
+    await _set_many({f"{kind}:{version}:{sfx}": v for sfx, v in items.items()}, ttl)
+
+
+# ── Paper identity index ──
+#
+# "paper_alias:{alias}" -> canonical paper key, where aliases are S2 IDs,
+# "pmid:NNN" and "doi:..." (see services.paper_identity). LLM-derived
+# entries below are always keyed by the canonical key so a paper reached
+# through any alias shares one summary/translation per language.
+
+
+async def get_paper_aliases(aliases: list[str]) -> dict[str, str]:
+    """Return the canonical key for every alias that is already registered."""
+    found = await _get_many([f"paper_alias:{a}" for a in aliases])
+    prefix_len = len("paper_alias:")
+    return {k[prefix_len:]: v for k, v in found.items()}
+
+
+async def set_paper_aliases(mapping: dict[str, str]) -> None:
+    """Register alias -> canonical key mappings (permanent)."""
+    await _set_many({f"paper_alias:{a}": canonical for a, canonical in mapping.items()})
+
+
+async def resolve_paper_ids(paper_ids: list[str]) -> dict[str, str]:
+    """Map each paper ID to its canonical key (unknown IDs map to themselves)."""
+    known = await get_paper_aliases(paper_ids)
+    return {pid: known.get(pid, pid) for pid in paper_ids}
+
+
+# ── Summary cache ──
+
+
+async def get_cached_summary(
+    paper_id: str, language: str, version: str
+) -> tuple[str | None, bool]:
+    """Return (summary, is_stale)."""
+    found, stale = await get_cached_summaries([(paper_id, language)], version)
+    return found.get((paper_id, language)), bool(stale)
+
+
+async def set_cached_summary(paper_id: str, language: str, summary: str, version: str) -> None:
+    await set_cached_summaries({(paper_id, language): summary}, version)
+
+
+async def get_cached_summaries(
+    keys: list[tuple[str, str]], version: str
+) -> tuple[dict[tuple[str, str], str], set[tuple[str, str]]]:
+    """Get cached summaries for several (paper_id, language) pairs at once.
+
+    Returns (summaries, pairs served from an older prompt version).
+    """
+    canonical = await resolve_paper_ids([pid for pid, _ in keys])
+    suffixes = {(pid, lang): f"{canonical[pid]}:{lang}" for pid, lang in keys}
+    found, stale = await _get_versioned("summary", list(set(suffixes.values())), version)
+    return (
+        {k: found[sfx] for k, sfx in suffixes.items() if sfx in found},
+        {k for k, sfx in suffixes.items() if sfx in stale},
+    )
+
+
+async def set_cached_summaries(summaries: dict[tuple[str, str], str], version: str) -> None:
+    """Cache several summaries keyed by (paper_id, language) at once."""
+    canonical = await resolve_paper_ids([pid for pid, _ in summaries])
+    await _set_versioned(
+        "summary",
+        {f"{canonical[pid]}:{lang}": text for (pid, lang), text in summaries.items() if text},
+        version,
+    )  # No TTL — superseded by prompt version instead
+
+
+# ── Abstract translation cache ──
+
+
+async def get_cached_translations(
+    paper_id: str, language: str, difficulties: list[str], version: str
+) -> tuple[dict[str, str], set[str]]:
+    """Get cached translations for several difficulty levels at once.
+
+    Returns (translations by difficulty, difficulties served stale).
+    """
+    canonical = (await resolve_paper_ids([paper_id]))[paper_id]
+    key_map = {f"{canonical}:{language}:{d}": d for d in difficulties}
+    found, stale = await _get_versioned("translation", list(key_map), version)
+    return {key_map[k]: v for k, v in found.items()}, {key_map[k] for k in stale}
+
+
+async def set_cached_translations(
+    paper_id: str, language: str, translations: dict[str, str], version: str
+) -> None:
+    """Cache translations for several difficulty levels at once."""
+    canonical = (await resolve_paper_ids([paper_id]))[paper_id]
+    await _set_versioned(
+        "translation",
+        {f"{canonical}:{language}:{d}": text for d, text in translations.items() if text},
+        version,
+    )
+
+
+# ── Relevance ranking cache ──
+#
+# One LLM ranking per (normalized intent, canonical paper) so overlapping
+# searches only send unscored candidates to the ranker. The key carries the
+# ranking prompt version; older versions are simply not read.
+
+
+def _ranking_key(intent_key: str, canonical: str, version: str) -> str:
+    return _make_key(f"rank:{version}", intent_key, canonical)
+
+
+async def get_cached_rankings(
+    intent_key: str, paper_ids: list[str], version: str
+) -> dict[str, dict]:
+    """Return cached ranking entries by paper ID for this intent."""
+    canonical = await resolve_paper_ids(paper_ids)
+    keys = {_ranking_key(intent_key, canonical[pid], version): pid for pid in paper_ids}
+    found = await _get_many(list(keys), json_values=True)
+    return {keys[k]: v for k, v in found.items() if v}
+
+
+async def set_cached_rankings(
+    intent_key: str, rankings: dict[str, dict], version: str, ttl: int = 3 * 86400
+) -> None:
+    canonical = await resolve_paper_ids(list(rankings))
+    await _set_many(
+        {_ranking_key(intent_key, canonical[pid], version): r for pid, r in rankings.items()},
+        ttl,
+    )
+
+
+# ── Paper metadata cache (Semantic Scholar) ──
+#
+# Like source results, entries record when they were fetched and are kept
+# well past PAPER_METADATA_TTL, so paper routes can serve stale metadata
+# while Semantic Scholar is unavailable.
+
+PAPER_METADATA_TTL = 86400
+_PAPER_METADATA_RETENTION = 30 * 86400
+
+
+def _fresh_metadata(value: dict | None, max_age: float) -> dict | None:
+    if value is None:
+        return None
+    # Entries written before fetched_at was recorded expire with their L2 TTL
+    if set(value) != {"fetched_at", "data"}:
+        return value
+    return value["data"] if time.time() - value["fetched_at"] < max_age else None
+
+
+async def get_cached_paper_metadata(
+    paper_id: str, max_age: float = PAPER_METADATA_TTL
+) -> dict | None:
+    """Look up metadata under the requested ID or its canonical key.
+
+    Only entries fetched less than ``max_age`` seconds ago are returned.
+    """
+    canonical = (await resolve_paper_ids([paper_id]))[paper_id]
+    keys = [f"paper_meta:{paper_id}", f"paper_meta:{canonical}"]
+    found = await _get_many(keys, json_values=True)
+    return _fresh_metadata(found.get(keys[0]), max_age) or _fresh_metadata(
+        found.get(keys[1]), max_age
+    )
+
+
+async def set_cached_paper_metadata(paper_id: str, data: dict) -> None:
+    await set_cached_paper_metadata_many({paper_id: data})
+
+
+async def set_cached_paper_metadata_many(items: dict[str, dict]) -> None:
+    """Cache metadata for several papers keyed by paper ID at once."""
+    now = time.time()
+    await _set_many(
+        {f"paper_meta:{pid}": {"fetched_at": now, "data": data} for pid, data in items.items()},
+        _PAPER_METADATA_RETENTION,
+    )
+
+
+# ── Raw source search results (per academic query) ──
+#
+# Different user queries often produce the same academic query, so each
+# source's results are cached per (source, query, year range, limit).
+# Entries record when they were fetched: readers decide how old is too old,
+# and the L2 TTL only bounds how long they are kept.
+
+SOURCE_RESULTS_TTL = 6 * 3600
+_SOURCE_RESULTS_RETENTION = 7 * 86400
+
+SourceRequest = tuple[str, str, int | None, int | None, int]  # source, query, year_from, year_to, limit
+
+
+def _source_key(request: SourceRequest) -> str:
+    source, query, year_from, year_to, limit = request
+    # Case is kept: PubMed only reads uppercase AND/OR/NOT as operators
+    return _make_key(
+        "source", source, " ".join(query.split()), str(year_from), str(year_to), str(limit)
+    )
+
+
+async def get_cached_source_results(
+    requests: list[SourceRequest], max_age: float = SOURCE_RESULTS_TTL
+) -> dict[SourceRequest, list[dict]]:
+    """Cached paper dicts for each request fetched less than ``max_age`` seconds ago."""
+    keys = {request: _source_key(request) for request in requests}
+    found = await _get_many(list(keys.values()), json_values=True)
+    now = time.time()
+    return {
+        request: found[key]["papers"]
+        for request, key in keys.items()
+        if key in found and now - found[key]["fetched_at"] < max_age
+    }
+
+
+async def set_cached_source_results(results: dict[SourceRequest, list[dict]]) -> None:
+    now = time.time()
+    await _set_many(
+        {
+            _source_key(request): {"fetched_at": now, "papers": papers}
+            for request, papers in results.items()
+        },
+        _SOURCE_RESULTS_RETENTION,
+    )
+
+
+# ── Fulltext translation cache ──
+
+
+async def get_cached_fulltext(
+    paper_id: str, language: str, difficulty: str, version: str
+) -> tuple[list[dict] | None, bool]:
+    """Return (translated sections, is_stale)."""
+    canonical = (await resolve_paper_ids([paper_id]))[paper_id]
+    suffix = f"{canonical}:{language}:{difficulty}"
+    found, stale = await _get_versioned("fulltext", [suffix], version, json_values=True)
+    return found.get(suffix), bool(stale)
+
+
+async def set_cached_fulltext(
+    paper_id: str, language: str, difficulty: str, sections: list[dict], version: str
+) -> None:
+    canonical = (await resolve_paper_ids([paper_id]))[paper_id]
+    await _set_versioned("fulltext", {f"{canonical}:{language}:{difficulty}": sections}, version)
+
+
+# Individually translated sections, keyed by a hash of the section's source
+# text so entries survive outline changes. The full-document entry above is
+# written once every section of a paper has been translated.
+
+
+def _section_suffix(canonical: str, language: str, difficulty: str, original: str) -> str:
+    text_hash = hashlib.sha256(original.encode()).hexdigest()[:16]
+    return f"{canonical}:{language}:{difficulty}:{text_hash}"
+
+
+async def get_cached_fulltext_sections(
+    paper_id: str, language: str, difficulty: str, originals: list[str], version: str
+) -> tuple[dict[int, str], set[int]]:
+    """Return (translated text by section index, indices served stale)."""
+    canonical = (await resolve_paper_ids([paper_id]))[paper_id]
+    suffixes = [_section_suffix(canonical, language, difficulty, o) for o in originals]
+    found, stale = await _get_versioned("fulltext_section", list(set(suffixes)), version)
+    return (
+        {i: found[sfx] for i, sfx in enumerate(suffixes) if sfx in found},
+        {i for i, sfx in enumerate(suffixes) if sfx in stale},
+    )
+
+
+async def set_cached_fulltext_sections(
+    paper_id: str, language: str, difficulty: str, sections: list[dict], version: str
+) -> None:
+    """Cache each translated section ({"original", "translated"}); empty ones are skipped."""
+    canonical = (await resolve_paper_ids([paper_id]))[paper_id]
+    await _set_versioned(
+        "fulltext_section",
+        {
+            _section_suffix(canonical, language, difficulty, s["original"]): s["translated"]
+            for s in sections
+            if s["translated"]
+        },
+        version,
+    )
+
+
+# ── PDF store index (URL -> content hash) ──
+
+
+async def get_pdf_hash(pdf_url: str) -> str | None:
+    return await _get(_make_key("pdf_blob", pdf_url))
+
+
+async def set_pdf_hash(pdf_url: str, sha: str) -> None:
+    await _set(_make_key("pdf_blob", pdf_url), sha)
+
+
+# ── Extracted PDF sections (language/difficulty independent) ──
+
+
+async def get_cached_pdf_sections(sha: str, splitter_version: str) -> list[dict] | None:
+    return await _get(f"pdf_sections:{splitter_version}:{sha}", json_values=True)
+
+
+async def set_cached_pdf_sections(sha: str, splitter_version: str, sections: list[dict]) -> None:
+    # No TTL — keyed by content hash, so the entry can never go stale
+    await _set(f"pdf_sections:{splitter_version}:{sha}", sections)
+
+
+# ── Negative cache (known upstream failures) ──
+
+# Short TTLs: these record transient facts about upstreams
+NEGATIVE_TTLS = {
+    "paper": 1800,  # Semantic Scholar 404
+    "search": 600,  # search returned zero papers
+    "pdf": 3600,  # PDF download/extraction failed
+}
+
+
+def _negative_key(kind: str, ident: str) -> str:
+    return _make_key("neg", kind, ident)
+
+
+async def get_negative(kind: str, ident: str) -> dict | None:
+    """Return the recorded failure for (kind, ident), e.g. {"reason": "..."}."""
+    return await _get(_negative_key(kind, ident), json_values=True)
+
+
+async def set_negative(kind: str, ident: str, reason: str, **extra) -> None:
+    await _set(
+        _negative_key(kind, ident),
+        {"reason": reason, **extra},
+        NEGATIVE_TTLS.get(kind, 600),
+    )
+
+
+async def clear_negative(kind: str, ident: str) -> None:
+    await _delete(_negative_key(kind, ident))
@@ -6,6 +6,7 @@ import httpx
 
 from app.config import get_settings
 from app.models.schemas import UnifiedPaper
+from app.utils import circuit_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -17,15 +18,31 @@ TIMEOUT = 10.0
 _semaphore = asyncio.Semaphore(2)
 
 
+def has_free_slot() -> bool:
+    """Whether a request could start now without waiting for the limiter."""
+    return not _semaphore.locked()
+
+
 async def search_papers(
     query: str,
     *,
     limit: int = 20,
     year_from: int | None = None,
     year_to: int | None = None,
+    wait_for_slot: bool = True,
 ) -> list[UnifiedPaper]:
-    """Search PubMed for papers matching the query."""
+    """Search PubMed for papers matching the query.
+
+    Raises CircuitOpenError without calling the API while the PubMed
+    circuit is open.
+
+    With ``wait_for_slot=False`` (hedged duplicates) nothing is sent and []
+    is returned unless a limiter slot is free right now, so the call never
+    queues behind first attempts.
+    """
     settings = get_settings()
+    breaker = circuit_breaker.get("pubmed")
+    breaker.check()
 
     # Add date filter to query if specified
     date_filter = ""
@@ -46,6 +63,10 @@ async def search_papers(
 
     xml_text = None
     max_retries = 3
+    # No await between the check and the acquire: the slot cannot be taken
+    # by another task in between
+    if not wait_for_slot and _semaphore.locked():
+        return []
     async with _semaphore:
         for attempt in range(max_retries):
             try:
@@ -57,6 +78,7 @@ async def search_papers(
 
                     id_list = search_data.get("esearchresult", {}).get("idlist", [])
                     if not id_list:
+                        breaker.record_success()
                         return []
 
                     # Step 2: EFetch to get full records
@@ -71,19 +93,28 @@ async def search_papers(
                     resp = await client.get(EFETCH_URL, params=fetch_params)
                     resp.raise_for_status()
                     xml_text = resp.text
+                    breaker.record_success()
                     break
             except httpx.HTTPStatusError as e:
-                if e.response.status_code == 429 and attempt < max_retries - 1:
+                status = e.response.status_code
+                if status == 429 or status >= 500:
+                    breaker.record_failure()
+                else:  # the upstream answered; the request was bad
+                    breaker.record_success()
+                # No point backing off once other calls have opened the circuit
+                if status == 429 and attempt < max_retries - 1 and not breaker.is_open:
                     wait = 2 ** attempt + 1
                     logger.info("PubMed 429, retrying in %ds: %s", wait, query)
                     await asyncio.sleep(wait)
                     continue
-                logger.warning("PubMed HTTP error %s: %s", e.response.status_code, query)
+                logger.warning("PubMed HTTP error %s: %s", status, query)
                 return []
             except httpx.TimeoutException:
+                breaker.record_failure()
                 logger.warning("PubMed timeout for query: %s", query)
                 return []
             except Exception:
+                breaker.record_failure()
                 logger.exception("PubMed unexpected error for query: %s", query)
                 return []
 
@@ -181,6 +212,17 @@ def _parse_single_article(article_elem: ET.Element) -> UnifiedPaper | None:
             doi = eid.text
             break
 
+    # MeSH descriptors (indexer-assigned topics)
+    mesh_terms = [
+        d.text
+        for d in medline.findall("MeshHeadingList/MeshHeading/DescriptorName")
+        if d.text
+    ]
+
+    publication_types = [
+        t.text for t in article.findall("PublicationTypeList/PublicationType") if t.text
+    ]
+
     return UnifiedPaper(
         id=f"pmid:{pmid}",
         title=title,
@@ -193,5 +235,7 @@ def _parse_single_article(article_elem: ET.Element) -> UnifiedPaper | None:
         is_open_access=False,  # Would need PMC check
         pdf_url=None,
         abstract=abstract,
+        mesh_terms=mesh_terms,
+        publication_types=publication_types,
         source="pubmed",
     )
@@ -3,9 +3,10 @@ import logging
 
 import httpx
 
-from app.cache import sqlite_cache
+from app.cache import store as cache
 from app.config import get_settings
 from app.models.schemas import UnifiedPaper
+from app.utils import circuit_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -17,15 +18,31 @@ TIMEOUT = 10.0
 _semaphore = asyncio.Semaphore(2)
 
 
+def has_free_slot() -> bool:
+    """Whether a request could start now without waiting for the limiter."""
+    return not _semaphore.locked()
+
+
 async def search_papers(
     query: str,
     *,
     limit: int = 20,
     year_from: int | None = None,
     year_to: int | None = None,
+    wait_for_slot: bool = True,
 ) -> list[UnifiedPaper]:
-    """Search Semantic Scholar for papers matching the query."""
+    """Search Semantic Scholar for papers matching the query.
+
+    Raises CircuitOpenError without calling the API while the search
+    circuit is open.
+
+    With ``wait_for_slot=False`` (hedged duplicates) nothing is sent and []
+    is returned unless a limiter slot is free right now, so the call never
+    queues behind first attempts.
+    """
     settings = get_settings()
+    breaker = circuit_breaker.get("semantic_scholar_search")
+    breaker.check()
 
     params: dict = {
         "query": query,
@@ -44,6 +61,10 @@ async def search_papers(
 
     max_retries = 3
     data = None
+    # No await between the check and the acquire: the slot cannot be taken
+    # by another task in between
+    if not wait_for_slot and _semaphore.locked():
+        return []
     async with _semaphore:
         for attempt in range(max_retries):
             try:
@@ -55,19 +76,28 @@ async def search_papers(
                     )
                     resp.raise_for_status()
                     data = resp.json()
+                    breaker.record_success()
                     break
             except httpx.HTTPStatusError as e:
-                if e.response.status_code == 429 and attempt < max_retries - 1:
+                status = e.response.status_code
+                if status == 429 or status >= 500:
+                    breaker.record_failure()
+                else:  # the upstream answered; the request was bad
+                    breaker.record_success()
+                # No point backing off once other calls have opened the circuit
+                if status == 429 and attempt < max_retries - 1 and not breaker.is_open:
                     wait = 2 ** attempt + 1
                     logger.info("Semantic Scholar 429, retrying in %ds: %s", wait, query)
                     await asyncio.sleep(wait)
                     continue
-                logger.warning("Semantic Scholar HTTP error %s: %s", e.response.status_code, query)
+                logger.warning("Semantic Scholar HTTP error %s: %s", status, query)
                 return []
             except httpx.TimeoutException:
+                breaker.record_failure()
                 logger.warning("Semantic Scholar timeout for query: %s", query)
                 return []
             except Exception:
+                breaker.record_failure()
                 logger.exception("Semantic Scholar unexpected error for query: %s", query)
                 return []
 
@@ -75,6 +105,7 @@ async def search_papers(
         return []
 
     papers: list[UnifiedPaper] = []
+    metadata: dict[str, dict] = {}
     for item in data.get("data", []):
         if not item:
             continue
@@ -113,14 +144,17 @@ async def search_papers(
                 is_open_access=item.get("isOpenAccess", False),
                 pdf_url=pdf_url,
                 abstract=item.get("abstract"),
+                publication_types=item.get("publicationTypes") or [],
                 source="semantic_scholar",
             )
         )
 
-        # Pre-cache paper metadata so detail pages don't need to re-fetch
-        await sqlite_cache.set_cached_paper_metadata(paper_id, item)
+        metadata[paper_id] = item
         if pmid:
-            await sqlite_cache.set_cached_paper_metadata(f"pmid:{pmid}", item)
+            metadata[f"pmid:{pmid}"] = item
+
+    # Pre-cache paper metadata so detail pages don't need to re-fetch
+    await cache.set_cached_paper_metadata_many(metadata)
 
     logger.info("Semantic Scholar returned %d papers for: %s", len(papers), query)
     return papers
@@ -1,12 +1,17 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
-from app.api.routes import paper, search, summary
+from app.api.routes import jobs, paper, search, summary
+from app.cache import store as cache
+from app.services import jobs as job_queue
+from app.services import paper_searcher
+from app.utils import circuit_breaker
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,6 +23,15 @@ docs_url = "/docs" if os.getenv("ENVIRONMENT") == "development" else None
 redoc_url = "/redoc" if os.getenv("ENVIRONMENT") == "development" else None
 openapi_url = "/openapi.json" if os.getenv("ENVIRONMENT") == "development" else None
 
+
+# ── Background job workers ──
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start_workers()
+    yield
+    await job_queue.stop_workers()
+
+
 app = FastAPI(
     title="LOHAS Papers API",
     description="AI-powered academic paper search and multilingual summarization",
@@ -25,6 +39,7 @@ app = FastAPI(
     docs_url=docs_url,
     redoc_url=redoc_url,
     openapi_url=openapi_url,
+    lifespan=lifespan,
 )
 
 
@@ -69,8 +84,39 @@ app.add_middleware(
 app.include_router(search.router, prefix="/api/v1", tags=["search"])
 app.include_router(paper.router, prefix="/api/v1", tags=["paper"])
 app.include_router(summary.router, prefix="/api/v1", tags=["summary"])
+app.include_router(jobs.router, prefix="/api/v1", tags=["jobs"])
+
+
+@app.exception_handler(circuit_breaker.CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: circuit_breaker.CircuitOpenError):
+    """An upstream skipped on an open circuit is unavailable, not missing."""
+    return JSONResponse(
+        status_code=503,
+        content={
+            "detail": "Upstream service is temporarily unavailable",
+            "degraded_sources": [exc.name],
+        },
+    )
 
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+
+@app.get("/health/cache")
+async def cache_health():
+    """Per-tier cache hit rates (requires API key when configured)."""
+    return cache.get_stats()
+
+
+@app.get("/health/circuits")
+async def circuit_health():
+    """State of each upstream circuit breaker (requires API key when configured)."""
+    return circuit_breaker.get_stats()
+
+
+@app.get("/health/hedging")
+async def hedging_health():
+    """Hedge delay and counts per search source (requires API key when configured)."""
+    return paper_searcher.get_hedging_stats()
@@ -20,6 +20,8 @@ class SearchRequest(BaseModel):
     per_page: int = 50
     sort_by: str = "relevance"
     filters: SearchFilters = Field(default_factory=SearchFilters)
+    # Skip negative cache entries (e.g. a recent zero-result search)
+    retry_failed: bool = False
 
 
 class BatchSummaryRequest(BaseModel):
@@ -75,6 +77,12 @@ class SearchResponse(BaseModel):
     page: int
     per_page: int
     cached: bool = False
+    # Upstreams skipped because their circuit was open (results may be
+    # incomplete or served from older cache entries)
+    degraded_sources: list[str] = Field(default_factory=list)
+    # Stages that fell back to a cheaper result to meet the request deadline
+    # ("transform", "retrieval", "ranking", "title_translation", "summaries")
+    degraded_stages: list[str] = Field(default_factory=list)
 
 
 class PaperSummaryResponse(BaseModel):
@@ -141,9 +149,10 @@ class QueryTransformResult(BaseModel):
 class RankedPaper(BaseModel):
     paper_id: str
     relevance_score: float
-    evidence_level: str
-    study_type: str
-    reason: str
+    # Filled from metadata by services.study_classifier, not by the LLM
+    evidence_level: str = "low"
+    study_type: str = "other"
+    reason: str = ""
 
 
 class RankingResult(BaseModel):
@@ -161,9 +170,28 @@ class FulltextTranslationResponse(BaseModel):
     language: str
     difficulty: str
     sections: list[FulltextSection]
+    complete: bool = True  # every section of the document is translated
     cached: bool = False
 
 
+class JobSectionStatus(BaseModel):
+    section_name: str
+    status: str  # pending | done | failed
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str  # queued | running | done | failed
+    params: dict[str, str]
+    sections: list[JobSectionStatus] = []
+    completed_sections: int = 0
+    total_sections: int = 0
+    error: str | None = None
+    created_at: float
+    updated_at: float
+
+
 class UnifiedPaper(BaseModel):
     """Internal unified paper representation from both APIs."""
 
@@ -178,4 +206,6 @@ class UnifiedPaper(BaseModel):
     is_open_access: bool = False
     pdf_url: str | None = None
     abstract: str | None = None
+    mesh_terms: list[str] = Field(default_factory=list)  # PubMed MeSH descriptors
+    publication_types: list[str] = Field(default_factory=list)  # S2 and PubMed labels
     source: str = "semantic_scholar"
@@ -0,0 +1,96 @@
+"""Bounded background regeneration of cache entries from older prompt versions.
+
+Routes serve stale summaries/translations immediately and call one of the
+``schedule_*`` functions. Jobs are deduplicated by cache key, run at most
+_MAX_CONCURRENT at a time, and are dropped once _MAX_PENDING are queued so a
+prompt change never turns into a cold-start storm of LLM calls.
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+from app.cache import store as cache
+from app.services import summarizer
+from app.services.pdf_extractor import extract_sections_from_url
+
+logger = logging.getLogger(__name__)
+
+_MAX_CONCURRENT = 2
+_MAX_PENDING = 200
+
+_semaphore = asyncio.Semaphore(_MAX_CONCURRENT)
+_pending: set[str] = set()
+_tasks: set[asyncio.Task] = set()
+
+
+def schedule(key: str, regenerate: Callable[[], Awaitable[None]]) -> bool:
+    """Queue a regeneration job unless it is already pending or the queue is full."""
+    if key in _pending or len(_pending) >= _MAX_PENDING:
+        return False
+    _pending.add(key)
+    task = asyncio.create_task(_run(key, regenerate))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return True
+
+
+async def _run(key: str, regenerate: Callable[[], Awaitable[None]]) -> None:
+    try:
+        async with _semaphore:
+            await regenerate()
+    except Exception:
+        logger.warning("Cache refresh failed for %s", key, exc_info=True)
+    finally:
+        _pending.discard(key)
+
+
+async def _load_abstract(paper_id: str) -> tuple[str, str]:
+    """Abstract and title from cached metadata (refresh never hits upstream APIs)."""
+    meta = await cache.get_cached_paper_metadata(paper_id) or {}
+    return meta.get("abstract") or "", meta.get("title") or ""
+
+
+def schedule_summary_refresh(
+    paper_id: str, language: str, abstract: str | None = None, title: str = ""
+) -> bool:
+    async def regenerate() -> None:
+        nonlocal abstract, title
+        if not abstract:
+            abstract, title = await _load_abstract(paper_id)
+            if not abstract:
+                return
+        version = summarizer.prompt_version("summary")
+        summary = await summarizer.generate_paper_summary(abstract, language, title)
+        if summary:
+            await cache.set_cached_summary(paper_id, language, summary, version)
+
+    return schedule(f"summary:{paper_id}:{language}", regenerate)
+
+
+def schedule_translation_refresh(
+    paper_id: str, language: str, difficulty: str, abstract: str, title: str = ""
+) -> bool:
+    async def regenerate() -> None:
+        version = summarizer.prompt_version("translation")
+        text = await summarizer.translate_abstract(abstract, language, difficulty, title)
+        if text:
+            await cache.set_cached_translations(paper_id, language, {difficulty: text}, version)
+
+    return schedule(f"translation:{paper_id}:{language}:{difficulty}", regenerate)
+
+
+def schedule_fulltext_refresh(paper_id: str, language: str, difficulty: str) -> bool:
+    async def regenerate() -> None:
+        meta = await cache.get_cached_paper_metadata(paper_id) or {}
+        pdf_url = (meta.get("openAccessPdf") or {}).get("url")
+        if not pdf_url:
+            return
+        version = summarizer.prompt_version("fulltext")
+        sections = await extract_sections_from_url(pdf_url)
+        translated = await summarizer.translate_fulltext_sections(sections, language, difficulty)
+        await cache.set_cached_fulltext_sections(paper_id, language, difficulty, translated, version)
+        if all(s["translated"] for s in translated):
+            await cache.set_cached_fulltext(paper_id, language, difficulty, translated, version)
+
+    return schedule(f"fulltext:{paper_id}:{language}:{difficulty}", regenerate)
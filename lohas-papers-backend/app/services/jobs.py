@@ -0,0 +1,239 @@
+"""Persistent background jobs for long-running work (e.g. fulltext translation).
+
+Jobs live in a ``jobs`` table in the SQLite cache database, so queued and
+interrupted jobs are picked up again after a restart. A fixed pool of
+asyncio workers (``Settings.job_workers``) claims queued jobs one at a time.
+Submitting a job whose dedup key matches a queued or running job returns
+that job instead of creating a new one.
+
+Handlers are registered per job kind with ``register_handler`` and receive
+the job params plus a ``JobProgress`` for reporting per-section status.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+
+from app.cache import sqlite_cache
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# A running job not updated for this long is assumed to belong to a dead
+# worker and is requeued
+_LEASE_SECONDS = 300
+_POLL_INTERVAL = 5.0
+_MAX_ATTEMPTS = 3
+_RETENTION_SECONDS = 7 * 86400  # finished jobs are kept this long
+
+_conn: sqlite3.Connection | None = None
+_wakeup = asyncio.Event()
+_workers: list[asyncio.Task] = []
+
+
+class JobProgress:
+    """Per-section progress of a running job, persisted on every update."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.sections: list[dict] = []
+
+    def set_sections(self, names: list[str], done: set[int] | None = None) -> None:
+        done = done or set()
+        self.sections = [
+            {"section_name": name, "status": "done" if i in done else "pending"}
+            for i, name in enumerate(names)
+        ]
+        self._save()
+
+    def mark(self, index: int, status: str) -> None:
+        self.sections[index]["status"] = status
+        self._save()
+
+    def _save(self) -> None:
+        _update(self.job_id, sections=json.dumps(self.sections, ensure_ascii=False))
+
+
+Handler = Callable[[dict, JobProgress], Awaitable[None]]
+_handlers: dict[str, Handler] = {}
+
+
+def register_handler(kind: str, handler: Handler) -> None:
+    _handlers[kind] = handler
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(str(sqlite_cache._DB_PATH), check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "  id TEXT PRIMARY KEY,"
+            "  kind TEXT NOT NULL,"
+            "  dedup_key TEXT NOT NULL,"
+            "  params TEXT NOT NULL,"
+            "  status TEXT NOT NULL,"  # queued | running | done | failed
+            "  sections TEXT NOT NULL DEFAULT '[]',"
+            "  error TEXT,"
+            "  attempts INTEGER NOT NULL DEFAULT 0,"
+            "  created_at REAL NOT NULL,"
+            "  updated_at REAL NOT NULL"
+            ")"
+        )
+        # At most one active job per dedup key
+        _conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active ON jobs(dedup_key)"
+            " WHERE status IN ('queued', 'running')"
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+        _conn.commit()
+    return _conn
+
+
+def _row_to_dict(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["sections"] = json.loads(job["sections"])
+    return job
+
+
+def _update(job_id: str, **fields) -> None:
+    conn = _get_conn()
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{k} = ?" for k in fields)
+    conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+    conn.commit()
+
+
+def submit(kind: str, dedup_key: str, params: dict) -> dict:
+    """Queue a job, or return the active job with the same dedup key."""
+    conn = _get_conn()
+    existing = conn.execute(
+        "SELECT * FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'running')",
+        (dedup_key,),
+    ).fetchone()
+    if existing:
+        return _row_to_dict(existing)
+
+    now = time.time()
+    job_id = uuid.uuid4().hex
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, dedup_key, params, status, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, kind, dedup_key, json.dumps(params), now, now),
+        )
+        conn.commit()
+    except sqlite3.IntegrityError:
+        # Lost a race with a concurrent submit of the same key
+        conn.rollback()
+        return _row_to_dict(conn.execute(
+            "SELECT * FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'running')",
+            (dedup_key,),
+        ).fetchone())
+
+    _wakeup.set()
+    return get(job_id)
+
+
+def get(job_id: str) -> dict | None:
+    row = _get_conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def _claim() -> dict | None:
+    """Atomically move the oldest queued job to running."""
+    conn = _get_conn()
+    row = conn.execute(
+        "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ?"
+        " WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1)"
+        " AND status = 'queued'"
+        " RETURNING *",
+        (time.time(),),
+    ).fetchone()
+    conn.commit()
+    return _row_to_dict(row) if row else None
+
+
+def _recover(cutoff: float) -> None:
+    """Requeue running jobs not updated since ``cutoff`` and drop old finished jobs.
+
+    Jobs interrupted _MAX_ATTEMPTS times are failed instead of retried.
+    """
+    conn = _get_conn()
+    requeued = conn.execute(
+        "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND updated_at < ?"
+        " AND attempts < ?",
+        (cutoff, _MAX_ATTEMPTS),
+    ).rowcount
+    conn.execute(
+        "UPDATE jobs SET status = 'failed', error = 'Job was interrupted repeatedly'"
+        " WHERE status = 'running' AND updated_at < ?",
+        (cutoff,),
+    )
+    conn.execute(
+        "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+        (time.time() - _RETENTION_SECONDS,),
+    )
+    conn.commit()
+    if requeued:
+        logger.info("Requeued %d interrupted jobs", requeued)
+
+
+async def _execute(job: dict) -> None:
+    handler = _handlers.get(job["kind"])
+    if handler is None:
+        _update(job["id"], status="failed", error=f"Unknown job kind: {job['kind']}")
+        return
+
+    progress = JobProgress(job["id"])
+    try:
+        await handler(job["params"], progress)
+    except Exception as e:
+        logger.warning("Job %s (%s) failed: %s", job["id"], job["kind"], e)
+        _update(job["id"], status="failed", error=str(getattr(e, "detail", e)))
+        return
+
+    if any(s["status"] == "failed" for s in progress.sections):
+        _update(job["id"], status="failed", error="Some sections failed")
+    else:
+        _update(job["id"], status="done")
+
+
+async def _worker(n: int) -> None:
+    while True:
+        # Clear before claiming so a submit in between is never missed
+        _wakeup.clear()
+        job = _claim()
+        if job is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                _recover(time.time() - _LEASE_SECONDS)
+            continue
+        logger.info("Worker %d running job %s (%s)", n, job["id"], job["kind"])
+        await _execute(job)
+
+
+def start_workers() -> None:
+    """Start the worker pool (called once at application startup)."""
+    if _workers:
+        return
+    # Everything still marked running was interrupted by the previous shutdown
+    _recover(time.time())
+    for n in range(get_settings().job_workers):
+        _workers.append(asyncio.create_task(_worker(n)))
+
+
+async def stop_workers() -> None:
+    """Cancel the worker pool; running jobs are resumed on next startup."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
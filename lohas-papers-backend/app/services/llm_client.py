@@ -1,9 +1,12 @@
+import hashlib
 import json
 import logging
+from collections.abc import AsyncIterator
 
 import anthropic
 
 from app.config import get_settings
+from app.utils import circuit_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +21,64 @@ def get_llm_client() -> anthropic.AsyncAnthropic:
     return _client
 
 
+def _record_outcome(breaker: circuit_breaker.CircuitBreaker, error: Exception | None) -> None:
+    """Count connection errors, 429 and 5xx as failures; anything else reached the API."""
+    if isinstance(error, anthropic.APIConnectionError) or (
+        isinstance(error, anthropic.APIStatusError)
+        and (error.status_code == 429 or error.status_code >= 500)
+    ):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def prompt_fingerprint(*prompts: str) -> str:
+    """Short hash of the configured model and prompt templates.
+
+    Used to namespace cache keys of LLM-derived outputs so a prompt or model
+    change produces new entries instead of silently mixing styles.
+    """
+    settings = get_settings()
+    h = hashlib.sha256(settings.llm_model.encode())
+    for prompt in prompts:
+        h.update(b"\0")
+        h.update(prompt.encode())
+    return "v" + h.hexdigest()[:8]
+
+
+async def llm_complete(
+    system_prompt: str,
+    messages: list[dict],
+    *,
+    max_tokens: int = 2048,
+) -> tuple[str, str | None]:
+    """Run one completion and return (raw text, stop_reason).
+
+    A stop_reason of "max_tokens" means the output was cut off; callers can
+    continue it by appending the partial text as a final assistant message.
+    Raises CircuitOpenError while the Anthropic circuit is open.
+    """
+    settings = get_settings()
+    client = get_llm_client()
+    breaker = circuit_breaker.get("anthropic")
+    breaker.check()
+
+    try:
+        response = await client.messages.create(
+            model=settings.llm_model,
+            max_tokens=max_tokens,
+            system=system_prompt,
+            messages=messages,
+        )
+    except Exception as e:
+        _record_outcome(breaker, e)
+        raise
+    _record_outcome(breaker, None)
+
+    text = response.content[0].text if response.content else ""
+    return text, response.stop_reason
+
+
 async def llm_chat(
     system_prompt: str,
     user_message: str,
@@ -26,17 +87,12 @@ async def llm_chat(
     max_tokens: int = 2048,
 ) -> str:
     """Send a message to the LLM and return the text response."""
-    settings = get_settings()
-    client = get_llm_client()
-
-    response = await client.messages.create(
-        model=settings.llm_model,
+    text, _ = await llm_complete(
+        system_prompt,
+        [{"role": "user", "content": user_message}],
         max_tokens=max_tokens,
-        system=system_prompt,
-        messages=[{"role": "user", "content": user_message}],
     )
-
-    text = response.content[0].text.strip()
+    text = text.strip()
 
     if expect_json:
         # Strip markdown code fences if present
@@ -76,3 +132,65 @@ async def llm_chat_json(
                 raise
     # unreachable
     raise RuntimeError("LLM JSON parse failed after retries")
+
+
+async def llm_stream_objects(
+    system_prompt: str,
+    user_message: str,
+    *,
+    max_tokens: int = 2048,
+) -> AsyncIterator[dict]:
+    """Stream a JSON response and yield each array item object as soon as it closes.
+
+    For responses shaped like {"key": [{...}, {...}]}: every object nested
+    at depth 2 is parsed and yielded once its closing brace arrives, so
+    callers can act on the first items before the response is complete.
+    """
+    settings = get_settings()
+    client = get_llm_client()
+    breaker = circuit_breaker.get("anthropic")
+    breaker.check()
+
+    buffer = ""
+    pos = 0  # next unscanned character
+    depth = 0
+    in_string = escaped = False
+    item_start = -1
+
+    try:
+        async with client.messages.stream(
+            model=settings.llm_model,
+            max_tokens=max_tokens,
+            system=system_prompt,
+            messages=[{"role": "user", "content": user_message}],
+        ) as stream:
+            async for text in stream.text_stream:
+                buffer += text
+                for i in range(pos, len(buffer)):
+                    ch = buffer[i]
+                    if in_string:
+                        if escaped:
+                            escaped = False
+                        elif ch == "\\":
+                            escaped = True
+                        elif ch == '"':
+                            in_string = False
+                    elif ch == '"':
+                        in_string = True
+                    elif ch == "{":
+                        depth += 1
+                        if depth == 2:
+                            item_start = i
+                    elif ch == "}":
+                        if depth == 2 and item_start >= 0:
+                            try:
+                                yield json.loads(buffer[item_start:i + 1])
+                            except json.JSONDecodeError:
+                                logger.warning("Skipping malformed streamed item: %s", buffer[item_start:i + 1][:200])
+                            item_start = -1
+                        depth -= 1
+                pos = len(buffer)
+    except Exception as e:
+        _record_outcome(breaker, e)
+        raise
+    _record_outcome(breaker, None)
@@ -0,0 +1,80 @@
+"""Canonical paper identity resolution across S2 IDs, PMIDs and DOIs.
+
+Every alias of a paper maps to one canonical key in the persistent
+``paper_alias`` index. The canonical key is the ID under which the paper
+was first seen (an S2 paper ID or "pmid:NNN"), so existing cache entries
+keep working. Later sightings through another alias reuse it.
+"""
+
+import logging
+
+from app.cache import store as cache
+from app.models.schemas import UnifiedPaper
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_doi(doi: str) -> str:
+    doi = doi.strip().lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "doi:"):
+        if doi.startswith(prefix):
+            doi = doi[len(prefix):]
+    return doi
+
+
+def paper_aliases(paper: UnifiedPaper) -> list[str]:
+    """All known aliases of a paper; the first one is its own ID."""
+    aliases = [paper.id]
+    if paper.pmid:
+        aliases.append(f"pmid:{paper.pmid}")
+    if paper.doi:
+        aliases.append(f"doi:{normalize_doi(paper.doi)}")
+    return list(dict.fromkeys(aliases))
+
+
+def metadata_aliases(paper_id: str, data: dict) -> list[str]:
+    """Aliases from a Semantic Scholar paper record fetched as ``paper_id``."""
+    aliases = [paper_id]
+    if data.get("paperId"):
+        aliases.append(data["paperId"])
+    external_ids = data.get("externalIds") or {}
+    if external_ids.get("PubMed"):
+        aliases.append(f"pmid:{external_ids['PubMed']}")
+    if external_ids.get("DOI"):
+        aliases.append(f"doi:{normalize_doi(external_ids['DOI'])}")
+    return list(dict.fromkeys(aliases))
+
+
+async def register(alias_groups: list[list[str]]) -> list[str]:
+    """Register groups of aliases that denote the same paper.
+
+    Returns the canonical key of each group. A group adopts the canonical
+    key of any alias that is already known; otherwise its first alias
+    becomes canonical. Existing mappings are never rewritten.
+    """
+    all_aliases = list(dict.fromkeys(a for group in alias_groups for a in group))
+    known = await cache.get_paper_aliases(all_aliases)
+
+    new: dict[str, str] = {}
+    canonicals: list[str] = []
+    for group in alias_groups:
+        canonical = next((known[a] for a in group if a in known), group[0])
+        for alias in group:
+            if alias not in known:
+                known[alias] = canonical
+                new[alias] = canonical
+            elif known[alias] != canonical:
+                logger.info(
+                    "Alias %s already maps to %s, not %s", alias, known[alias], canonical
+                )
+        canonicals.append(canonical)
+
+    if new:
+        await cache.set_paper_aliases(new)
+    return canonicals
+
+
+async def register_papers(papers: list[UnifiedPaper]) -> dict[str, str]:
+    """Register search results and return paper.id -> canonical key."""
+    canonicals = await register([paper_aliases(p) for p in papers])
+    return {p.id: c for p, c in zip(papers, canonicals)}
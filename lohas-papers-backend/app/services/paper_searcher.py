@@ -1,12 +1,20 @@
 import asyncio
 import logging
 
+from app.cache import store as cache
+from app.config import get_settings
 from app.external import pubmed, semantic_scholar
 from app.models.schemas import QueryTransformResult, UnifiedPaper
+from app.services import paper_identity
+from app.utils import circuit_breaker, deadline
 from app.utils.deduplication import deduplicate_papers
+from app.utils.hedging import Hedger
 
 logger = logging.getLogger(__name__)
 
+_SOURCES = {"semantic_scholar": semantic_scholar, "pubmed": pubmed}
+_hedgers: dict[str, Hedger] = {}
+
 
 async def search_all_sources(
     transform_result: QueryTransformResult,
@@ -17,37 +25,127 @@ async def search_all_sources(
 ) -> list[UnifiedPaper]:
     """Search both Semantic Scholar and PubMed in parallel for all academic queries,
     then merge and deduplicate the results."""
+    papers = await fetch_results(
+        transform_result.academic_queries,
+        year_from=year_from,
+        year_to=year_to,
+        limit_per_query=limit_per_query,
+    )
+    return await merge_results(papers)
+
+
+async def fetch_results(
+    queries: list[str],
+    *,
+    year_from: int | None = None,
+    year_to: int | None = None,
+    limit_per_query: int = 20,
+    timeout: float | None = None,
+) -> list[UnifiedPaper]:
+    """Raw results of every query from both sources, not yet deduplicated.
 
-    queries = transform_result.academic_queries
+    Each (source, query) result is served from the source result cache when
+    fetched within the last SOURCE_RESULTS_TTL. Empty results are not
+    cached: the clients also return [] when the upstream failed. While a
+    source's circuit is open, older cached results are used if there are any.
 
-    # Fire all queries to both sources in parallel.
+    Searches still running after ``timeout`` seconds are cancelled and
+    treated the same way (the "retrieval" stage is marked degraded).
+    """
+    requests = [
+        (source, query, year_from, year_to, limit_per_query)
+        for query in queries
+        for source in _SOURCES
+    ]
+    cached = await cache.get_cached_source_results(requests)
+    to_fetch = [r for r in requests if r not in cached]
+    if cached:
+        logger.info("Source results: %d cached, %d fetched", len(cached), len(to_fetch))
+
+    # Fire all remaining queries to both sources in parallel.
     # Retry with exponential backoff (already in each client) handles 429.
-    tasks = []
-    for query in queries:
-        tasks.append(
-            semantic_scholar.search_papers(
-                query, limit=limit_per_query, year_from=year_from, year_to=year_to
-            )
+    tasks = [asyncio.ensure_future(_search_source(*request)) for request in to_fetch]
+    pending: set = set()
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Search timed out after %.1fs: %d searches cancelled", timeout, len(pending))
+            deadline.degrade("retrieval")
+
+    by_request = {r: [UnifiedPaper(**p) for p in papers] for r, papers in cached.items()}
+    fetched: dict = {}
+    skipped = []
+    for request, task in zip(to_fetch, tasks):
+        error = None if task in pending else task.exception()
+        if task in pending or isinstance(error, circuit_breaker.CircuitOpenError):
+            skipped.append(request)
+        elif error is not None:
+            logger.warning("Search task %s failed: %s", request[:2], error)
+        else:
+            result = task.result()
+            by_request[request] = result
+            if result:
+                fetched[request] = [p.model_dump() for p in result]
+    await cache.set_cached_source_results(fetched)
+
+    if skipped:
+        stale = await cache.get_cached_source_results(skipped, max_age=float("inf"))
+        logger.warning(
+            "Skipped %d searches (open circuit or timeout), %d served from stale cache",
+            len(skipped), len(stale),
         )
-        tasks.append(
-            pubmed.search_papers(
-                query, limit=limit_per_query, year_from=year_from, year_to=year_to
-            )
+        for request, papers in stale.items():
+            by_request[request] = [UnifiedPaper(**p) for p in papers]
+
+    # Keep the query/source order of an uncached search
+    return [p for request in requests for p in by_request.get(request, [])]
+
+
+async def _search_source(
+    source: str, query: str, year_from: int | None, year_to: int | None, limit: int
+) -> list[UnifiedPaper]:
+    """One source search, hedged when ``Settings.search_hedging`` is on.
+
+    A hedge only runs if it takes a free slot of the source's concurrency
+    limiter when it starts (otherwise it returns [] and the primary wins),
+    so hedging never queues behind (or delays) first attempts.
+    """
+    client = _SOURCES[source]
+
+    def call(wait_for_slot: bool = True):
+        return client.search_papers(
+            query, limit=limit, year_from=year_from, year_to=year_to, wait_for_slot=wait_for_slot
         )
 
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    settings = get_settings()
+    if not settings.search_hedging:
+        return await call()
+
+    hedger = _hedgers.get(source)
+    if hedger is None:
+        hedger = _hedgers[source] = Hedger(source, budget=settings.search_hedge_budget)
+    # An empty list may be a failed call; a non-empty one is final
+    return await hedger.run(
+        call,
+        hedge_call=lambda: call(wait_for_slot=False),
+        can_hedge=client.has_free_slot,
+        accept=bool,
+    )
+
+
+def get_hedging_stats() -> dict:
+    return {source: hedger.snapshot() for source, hedger in _hedgers.items()}
 
-    all_papers: list[UnifiedPaper] = []
-    for i, result in enumerate(results):
-        if isinstance(result, Exception):
-            logger.warning("Search task %d failed: %s", i, result)
-            continue
-        all_papers.extend(result)
 
+async def merge_results(all_papers: list[UnifiedPaper]) -> list[UnifiedPaper]:
+    """Deduplicate raw results (possibly from several fetch_results calls)."""
     logger.info("Total papers before dedup: %d", len(all_papers))
 
-    # Deduplicate
-    unique_papers = deduplicate_papers(all_papers)
+    # Deduplicate (same paper reached via S2 ID, PMID or DOI shares one canonical key)
+    canonical_ids = await paper_identity.register_papers(all_papers)
+    unique_papers = deduplicate_papers(all_papers, canonical_ids)
     logger.info("Total papers after dedup: %d", len(unique_papers))
 
     return unique_papers
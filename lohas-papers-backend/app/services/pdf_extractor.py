@@ -1,45 +1,188 @@
 """PDF text extraction and section splitting for academic papers."""
 
-import io
+import asyncio
+import hashlib
 import logging
+import multiprocessing
 import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from urllib.parse import urlparse
 
 import httpx
 from pypdf import PdfReader
 
+from app.cache import store as cache
+from app.services import pdf_store
+from app.utils import circuit_breaker
+
 logger = logging.getLogger(__name__)
 
 MAX_PDF_SIZE = 20 * 1024 * 1024  # 20 MB
 DOWNLOAD_TIMEOUT = 30.0
-
-# Common section headers in academic papers
-_SECTION_PATTERNS = [
-    r"(?i)^(abstract)\s*$",
-    r"(?i)^(introduction)\s*$",
-    r"(?i)^(background)\s*$",
-    r"(?i)^(methods?|materials?\s+and\s+methods?|experimental\s+methods?)\s*$",
-    r"(?i)^(results?)\s*$",
-    r"(?i)^(results?\s+and\s+discussion)\s*$",
-    r"(?i)^(discussion)\s*$",
-    r"(?i)^(conclusion|conclusions|concluding\s+remarks?)\s*$",
-    r"(?i)^(limitations?)\s*$",
-    r"(?i)^(acknowledgements?|acknowledgments?)\s*$",
-    r"(?i)^(references|bibliography)\s*$",
-    r"(?i)^(supplementary|supporting\s+information)\s*",
-    # Numbered sections: "1. Introduction", "2 Methods", "I. Introduction"
-    r"(?i)^(?:\d+\.?\s+|[IVX]+\.?\s+)(introduction|background|methods?|materials?\s+and\s+methods?|results?|discussion|conclusion|conclusions|limitations?|acknowledgements?|references)",
-]
+_CHUNK_SIZE = 64 * 1024
+
+# PDF parsing is CPU-bound and runs in a process pool, never on the event loop
+PDF_WORKERS = 2
+MAX_PDF_PAGES = 80  # pages beyond this are not extracted
+EXTRACTION_JOB_TIMEOUT = 30.0  # seconds per pool job, once it is running
+_PAGES_PER_JOB = 8  # long PDFs are extracted in parallel page ranges
+_MAX_CONCURRENT_EXTRACTIONS = 2  # documents in flight per API process
+
+_executor: ProcessPoolExecutor | None = None
+_extraction_semaphore = asyncio.Semaphore(_MAX_CONCURRENT_EXTRACTIONS)
+# Jobs are submitted only into a free worker, so none waits in the pool's queue
+_pool_slots = asyncio.Semaphore(PDF_WORKERS)
+# Jobs in flight per pool, and tasks tearing down retired pools
+_pool_jobs: dict[ProcessPoolExecutor, set[asyncio.Future]] = {}
+_retiring: set[asyncio.Task] = set()
+
+# Bump when split_into_sections output changes so cached sections are rebuilt
+SECTION_SPLITTER_VERSION = "1"
+
+# In-flight section extractions by PDF URL, so concurrent requests for the
+# same paper (e.g. several languages at once) share one extraction
+_inflight: dict[str, asyncio.Task] = {}
+
+# Common section headers in academic papers, as one alternation matched
+# against whole lines of the text (MULTILINE). Word gaps use [^\S\n] so a
+# header never spans two lines. Named groups:
+#   plain:    the header alone on its line ("Methods", "Results and Discussion")
+#   prefix:   header at the start of the line ("Supplementary Materials")
+#   numbered: "1. Introduction", "2 Methods", "I. Introduction"
+_SECTION_HEADER_RE = re.compile(
+    r"^[^\S\n]*(?:"
+    r"(?P<plain>abstract|introduction|background"
+    r"|methods?|materials?[^\S\n]+and[^\S\n]+methods?|experimental[^\S\n]+methods?"
+    r"|results?|results?[^\S\n]+and[^\S\n]+discussion|discussion"
+    r"|conclusion|conclusions|concluding[^\S\n]+remarks?|limitations?"
+    r"|acknowledgements?|acknowledgments?|references|bibliography)[^\S\n]*$"
+    r"|(?P<prefix>supplementary|supporting[^\S\n]+information)"
+    r"|(?:\d+\.?[^\S\n]+|[IVX]+\.?[^\S\n]+)"
+    r"(?P<numbered>introduction|background|methods?|materials?[^\S\n]+and[^\S\n]+methods?"
+    r"|results?|discussion|conclusion|conclusions|limitations?|acknowledgements?|references)"
+    r")",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Whitespace-only lines inside a section are emptied
+_BLANK_LINE_RE = re.compile(r"^[^\S\n]+$", re.MULTILINE)
+
+_SECTION_NAMES = {
+    "abstract": "Abstract",
+    "introduction": "Introduction",
+    "background": "Background",
+    "method": "Methods",
+    "methods": "Methods",
+    "materials and methods": "Methods",
+    "materials & methods": "Methods",
+    "experimental methods": "Methods",
+    "result": "Results",
+    "results": "Results",
+    "results and discussion": "Results and Discussion",
+    "discussion": "Discussion",
+    "conclusion": "Conclusion",
+    "conclusions": "Conclusion",
+    "concluding remarks": "Conclusion",
+    "limitation": "Limitations",
+    "limitations": "Limitations",
+    "acknowledgement": "Acknowledgements",
+    "acknowledgements": "Acknowledgements",
+    "acknowledgment": "Acknowledgements",
+    "acknowledgments": "Acknowledgements",
+    "references": "References",
+    "bibliography": "References",
+    "supplementary": "Supplementary",
+    "supporting information": "Supplementary",
+}
 
 # Sections to exclude from translation
 _EXCLUDE_SECTIONS = {"references", "bibliography", "acknowledgements", "acknowledgments", "supplementary", "supporting information"}
 
 
+# Download statuses that will not change on an immediate retry
+_PERMANENT_STATUSES = {403, 404, 410}
+
+
+class PdfError(ValueError):
+    """A PDF could not be downloaded or read.
+
+    ``permanent`` failures (HTTP 403/404/410, too large, not a PDF, no
+    extractable text) fail the same way on an immediate retry; everything
+    else (429, 5xx, timeouts, connection errors, crashed workers) may not.
+    """
+
+    def __init__(self, message: str, *, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+class ExtractionTimeoutError(PdfError):
+    """A pool job ran longer than EXTRACTION_JOB_TIMEOUT (transient: retrying may work)."""
+
+
 async def extract_text_from_url(pdf_url: str) -> str:
-    """Download a PDF from URL and extract its text content.
+    """Download a PDF from URL (or read it from the PDF store) and extract its text.
 
     Returns the full text as a single string.
-    Raises ValueError if the PDF is too large or download fails.
+    Raises PdfError if the PDF is too large or download fails.
+    """
+    _, path = await fetch_pdf(pdf_url)
+    return await extract_text_from_file(path)
+
+
+async def extract_sections_from_url(pdf_url: str) -> list[dict]:
+    """Return the sections of a PDF, extracting them at most once per PDF.
+
+    Sections are cached by PDF content hash, independent of language and
+    difficulty. On a miss the PDF is downloaded (or loaded from the PDF
+    store), then extracted and split in the process pool. Raises PdfError
+    like extract_text_from_url.
+    """
+    task = _inflight.get(pdf_url)
+    if task is None:
+        task = asyncio.create_task(_load_sections(pdf_url))
+        _inflight[pdf_url] = task
+        task.add_done_callback(lambda _: _inflight.pop(pdf_url, None))
+    return await asyncio.shield(task)
+
+
+async def _load_sections(pdf_url: str) -> list[dict]:
+    sha = await cache.get_pdf_hash(pdf_url)
+    if sha:
+        cached = await cache.get_cached_pdf_sections(sha, SECTION_SPLITTER_VERSION)
+        if cached:
+            return cached
+
+    sha, path = await fetch_pdf(pdf_url)
+    # The same content may already be known under another URL
+    cached = await cache.get_cached_pdf_sections(sha, SECTION_SPLITTER_VERSION)
+    if cached:
+        return cached
+
+    sections = await extract_sections_from_file(path)
+    await cache.set_cached_pdf_sections(sha, SECTION_SPLITTER_VERSION, sections)
+    return sections
+
+
+async def fetch_pdf(pdf_url: str) -> tuple[str, Path]:
+    """Return (content hash, local path) of the PDF, downloading it if needed.
+
+    The body is streamed to a temporary file and the download is aborted as
+    soon as Content-Length or the received byte count exceeds MAX_PDF_SIZE.
+    Raises PdfError on failure and CircuitOpenError while the PDF host's
+    circuit is open.
     """
+    stored = await pdf_store.lookup(pdf_url)
+    if stored:
+        return stored
+
+    # Hosts that keep failing or blocking downloads are skipped for a while
+    breaker = circuit_breaker.get(f"pdf:{urlparse(pdf_url).hostname}")
+    breaker.check()
+
+    tmp = None
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -49,84 +192,210 @@ async def extract_text_from_url(pdf_url: str) -> str:
             timeout=DOWNLOAD_TIMEOUT,
             follow_redirects=True,
         ) as client:
-            resp = await client.get(pdf_url, headers=headers)
-            resp.raise_for_status()
-
-            content_length = len(resp.content)
-            if content_length > MAX_PDF_SIZE:
-                raise ValueError(
-                    f"PDF too large: {content_length / 1024 / 1024:.1f} MB (max {MAX_PDF_SIZE / 1024 / 1024:.0f} MB)"
-                )
-
-            pdf_bytes = io.BytesIO(resp.content)
+            async with client.stream("GET", pdf_url, headers=headers) as resp:
+                resp.raise_for_status()
+
+                declared = resp.headers.get("Content-Length", "")
+                if declared.isdigit() and int(declared) > MAX_PDF_SIZE:
+                    raise PdfError(
+                        f"PDF too large: {int(declared) / 1024 / 1024:.1f} MB (max {MAX_PDF_SIZE / 1024 / 1024:.0f} MB)",
+                        permanent=True,
+                    )
+
+                sha = hashlib.sha256()
+                received = 0
+                tmp = pdf_store.new_temp_file()
+                async for chunk in resp.aiter_bytes(_CHUNK_SIZE):
+                    # The %PDF header must appear within the first 1024 bytes
+                    if received == 0 and b"%PDF" not in chunk[:1024]:
+                        raise PdfError("Not a PDF file", permanent=True)
+                    received += len(chunk)
+                    if received > MAX_PDF_SIZE:
+                        raise PdfError(
+                            f"PDF too large: exceeds {MAX_PDF_SIZE / 1024 / 1024:.0f} MB limit",
+                            permanent=True,
+                        )
+                    sha.update(chunk)
+                    tmp.write(chunk)
+                tmp.close()
 
     except httpx.HTTPStatusError as e:
-        raise ValueError(f"PDF download failed: HTTP {e.response.status_code}") from e
+        _discard(tmp)
+        # A missing file says nothing about the host; blocks and errors do
+        if e.response.status_code == 404:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        raise PdfError(
+            f"PDF download failed: HTTP {e.response.status_code}",
+            permanent=e.response.status_code in _PERMANENT_STATUSES,
+        ) from e
     except httpx.TimeoutException:
-        raise ValueError("PDF download timed out") from None
-    except ValueError:
+        _discard(tmp)
+        breaker.record_failure()
+        raise PdfError("PDF download timed out") from None
+    except PdfError:
+        _discard(tmp)
+        breaker.record_success()  # too large / not a PDF: the host itself is fine
         raise
     except Exception as e:
-        raise ValueError(f"PDF download failed: {e}") from e
+        _discard(tmp)
+        breaker.record_failure()
+        raise PdfError(f"PDF download failed: {e}") from e
 
-    # Extract text from PDF
-    try:
-        reader = PdfReader(pdf_bytes)
-        pages_text = []
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                pages_text.append(text)
+    breaker.record_success()
 
-        full_text = "\n\n".join(pages_text)
+    digest = sha.hexdigest()
+    path = await pdf_store.put(pdf_url, digest, Path(tmp.name))
+    logger.info("Stored PDF %s (%d bytes) from %s", digest[:12], received, pdf_url)
+    return digest, path
 
-        if not full_text.strip():
-            raise ValueError("No text could be extracted from the PDF (may be image-based)")
 
-        logger.info("Extracted %d characters from %d pages", len(full_text), len(reader.pages))
-        return full_text
+def _discard(tmp) -> None:
+    if tmp is not None:
+        tmp.close()
+        Path(tmp.name).unlink(missing_ok=True)
 
-    except ValueError:
-        raise
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: never fork the event loop / open sockets into workers
+        _executor = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _retire_executor(executor: ProcessPoolExecutor) -> None:
+    """Send new jobs to a new pool; kill this one's workers once its other jobs end.
+
+    A timed-out job is stuck in pypdf and keeps its worker busy; shutdown()
+    alone does not stop it. Which worker runs it is not known, so the whole
+    pool is killed, but only after the jobs of other PDFs running in it
+    have finished (or timed out themselves).
+    """
+    global _executor
+    if _executor is not executor:
+        return  # already retired
+    _executor = None
+    task = asyncio.ensure_future(_kill_when_idle(executor))
+    _retiring.add(task)
+    task.add_done_callback(_retiring.discard)
+
+
+async def _kill_when_idle(executor: ProcessPoolExecutor) -> None:
+    jobs = _pool_jobs.pop(executor, set())
+    if jobs:
+        await asyncio.wait(jobs)
+    for process in list((executor._processes or {}).values()):
+        process.kill()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run_in_pool(fn, *args):
+    """Run a pool job with a timeout, mapping failures to PdfError.
+
+    The timeout covers execution only: a job waits for a free worker before
+    it is submitted.
+    """
+    async with _pool_slots:
+        executor = _get_executor()
+        job = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        jobs = _pool_jobs.setdefault(executor, set())
+        jobs.add(job)
+        job.add_done_callback(jobs.discard)
+        try:
+            return await asyncio.wait_for(job, timeout=EXTRACTION_JOB_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("PDF pool job timed out, replacing the pool")
+            _retire_executor(executor)
+            raise ExtractionTimeoutError(
+                f"PDF text extraction timed out after {EXTRACTION_JOB_TIMEOUT:.0f}s"
+            ) from None
+        except BrokenProcessPool as e:
+            _retire_executor(executor)
+            raise PdfError("PDF text extraction failed: worker crashed") from e
+
+
+def _count_pages(path: str) -> int:
+    """Pool job: number of pages in the PDF."""
+    try:
+        with pdf_store.open_mapped(Path(path)) as mm:
+            return len(PdfReader(mm).pages)
     except Exception as e:
         raise ValueError(f"PDF text extraction failed: {e}") from e
 
 
+def _extract_pages(path: str, start: int, end: int) -> list[str]:
+    """Pool job: text of pages [start, end)."""
+    try:
+        with pdf_store.open_mapped(Path(path)) as mm:
+            reader = PdfReader(mm)
+            return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+    except Exception as e:
+        raise ValueError(f"PDF text extraction failed: {e}") from e
+
+
+async def _extract_text_in_pool(path: Path) -> str:
+    total_pages = await _run_in_pool(_count_pages, str(path))
+    pages = min(total_pages, MAX_PDF_PAGES)
+    if total_pages > pages:
+        logger.info("PDF has %d pages, extracting the first %d", total_pages, pages)
+
+    ranges = [(s, min(s + _PAGES_PER_JOB, pages)) for s in range(0, pages, _PAGES_PER_JOB)]
+    chunks = await asyncio.gather(
+        *(_run_in_pool(_extract_pages, str(path), s, e) for s, e in ranges)
+    )
+    pages_text = [t for chunk in chunks for t in chunk if t]
+
+    full_text = "\n\n".join(pages_text)
+    if not full_text.strip():
+        raise PdfError(
+            "No text could be extracted from the PDF (may be image-based)", permanent=True
+        )
+
+    logger.info("Extracted %d characters from %d pages", len(full_text), pages)
+    return full_text
+
+
+async def extract_text_from_file(path: Path) -> str:
+    """Extract the text of a stored PDF in the process pool."""
+    async with _extraction_semaphore:
+        return await _extract_text_in_pool(path)
+
+
+async def extract_sections_from_file(path: Path) -> list[dict]:
+    """Extract a stored PDF and split it into sections, both in the process pool."""
+    async with _extraction_semaphore:
+        full_text = await _extract_text_in_pool(path)
+        return await _run_in_pool(split_into_sections, full_text)
+
+
 def split_into_sections(text: str) -> list[dict]:
     """Split extracted PDF text into logical sections.
 
     Returns a list of dicts: [{"name": "Introduction", "text": "..."}]
     If no section headers are detected, returns the entire text as one section.
+
+    Header lines are found with a single scan of _SECTION_HEADER_RE and the
+    text between them is sliced out, so the document is never split into
+    per-line strings.
     """
-    lines = text.split("\n")
     sections: list[dict] = []
     current_name = "Full Text"
-    current_lines: list[str] = []
-
-    for line in lines:
-        stripped = line.strip()
-        if not stripped:
-            current_lines.append("")
-            continue
+    start = 0
 
-        # Check if this line is a section header
-        matched_section = _match_section_header(stripped)
-        if matched_section:
-            # Save previous section
-            if current_lines:
-                section_text = "\n".join(current_lines).strip()
-                if section_text:
-                    sections.append({"name": current_name, "text": section_text})
-            current_name = matched_section
-            current_lines = []
-        else:
-            current_lines.append(line)
+    for m in _SECTION_HEADER_RE.finditer(text):
+        _append_section(sections, current_name, text[start:m.start()])
+        current_name = _normalize_section_name(m.group(m.lastgroup))
+        # Skip the rest of the header line (prefix/numbered headers may
+        # carry trailing words, which belong to the header)
+        line_end = text.find("\n", m.end())
+        start = len(text) if line_end == -1 else line_end + 1
 
-    # Save last section
-    if current_lines:
-        section_text = "\n".join(current_lines).strip()
-        if section_text:
-            sections.append({"name": current_name, "text": section_text})
+    _append_section(sections, current_name, text[start:])
 
     # If no sections were detected (only "Full Text"), return as-is
     if len(sections) <= 1:
@@ -146,50 +415,12 @@ def split_into_sections(text: str) -> list[dict]:
     return filtered if filtered else [{"name": "Full Text", "text": text.strip()}]
 
 
-def _match_section_header(line: str) -> str | None:
-    """Check if a line matches a known section header pattern.
-
-    Returns the canonical section name or None.
-    """
-    for pattern in _SECTION_PATTERNS:
-        m = re.match(pattern, line)
-        if m:
-            # Extract the section name from the first capture group
-            raw_name = m.group(1) if m.lastindex else line
-            return _normalize_section_name(raw_name)
-    return None
+def _append_section(sections: list[dict], name: str, body: str) -> None:
+    section_text = _BLANK_LINE_RE.sub("", body).strip()
+    if section_text:
+        sections.append({"name": name, "text": section_text})
 
 
 def _normalize_section_name(name: str) -> str:
     """Normalize section name to a canonical form."""
-    name_lower = name.lower().strip()
-
-    mapping = {
-        "abstract": "Abstract",
-        "introduction": "Introduction",
-        "background": "Background",
-        "method": "Methods",
-        "methods": "Methods",
-        "materials and methods": "Methods",
-        "materials & methods": "Methods",
-        "experimental methods": "Methods",
-        "result": "Results",
-        "results": "Results",
-        "results and discussion": "Results and Discussion",
-        "discussion": "Discussion",
-        "conclusion": "Conclusion",
-        "conclusions": "Conclusion",
-        "concluding remarks": "Conclusion",
-        "limitation": "Limitations",
-        "limitations": "Limitations",
-        "acknowledgement": "Acknowledgements",
-        "acknowledgements": "Acknowledgements",
-        "acknowledgment": "Acknowledgements",
-        "acknowledgments": "Acknowledgements",
-        "references": "References",
-        "bibliography": "References",
-        "supplementary": "Supplementary",
-        "supporting information": "Supplementary",
-    }
-
-    return mapping.get(name_lower, name.title())
+    return _SECTION_NAMES.get(name.lower().strip(), name.title())
@@ -0,0 +1,99 @@
+"""Content-addressed on-disk store for downloaded PDFs.
+
+PDFs are stored as ``{dir}/{sha[:2]}/{sha}.pdf`` and the cache maps each
+PDF URL to its content hash, so a paper's PDF is downloaded once and later
+read from disk (memory-mapped). Total size is kept under
+``Settings.pdf_store_max_bytes`` by evicting least recently used files.
+"""
+
+import logging
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.cache import store as cache
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _root() -> Path:
+    root = Path(get_settings().pdf_store_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def _path_for(sha: str) -> Path:
+    return _root() / sha[:2] / f"{sha}.pdf"
+
+
+def new_temp_file():
+    """Open a temporary file on the store's filesystem (so it can be renamed in)."""
+    tmp_dir = _root() / "tmp"
+    tmp_dir.mkdir(exist_ok=True)
+    return tempfile.NamedTemporaryFile(dir=tmp_dir, suffix=".part", delete=False)
+
+
+async def lookup(pdf_url: str) -> tuple[str, Path] | None:
+    """Return (content hash, path) of a stored PDF for this URL, if present."""
+    sha = await cache.get_pdf_hash(pdf_url)
+    if not sha:
+        return None
+    path = _path_for(sha)
+    if not path.exists():
+        return None
+    os.utime(path)  # mark as recently used for eviction
+    return sha, path
+
+
+async def put(pdf_url: str, sha: str, tmp_path: Path) -> Path:
+    """Move a fully downloaded temp file into the store and index it by URL."""
+    path = _path_for(sha)
+    path.parent.mkdir(exist_ok=True)
+    if path.exists():
+        tmp_path.unlink(missing_ok=True)
+        os.utime(path)
+    else:
+        os.replace(tmp_path, path)
+    await cache.set_pdf_hash(pdf_url, sha)
+    _enforce_budget(keep=path)
+    return path
+
+
+def _enforce_budget(keep: Path) -> None:
+    """Delete least recently used PDFs until the store fits its size budget."""
+    budget = get_settings().pdf_store_max_bytes
+    files = []
+    total = 0
+    for path in _root().glob("*/*.pdf"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+    if total <= budget:
+        return
+
+    files.sort()
+    for _, size, path in files:
+        if total <= budget:
+            break
+        if path == keep:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        logger.info("Evicted %s from PDF store", path.name)
+
+
+@contextmanager
+def open_mapped(path: Path):
+    """Memory-map a stored PDF read-only."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
@@ -0,0 +1,160 @@
+"""Dictionary-based query transformation, used as a fast path next to the LLM.
+
+Terms come from ``app/data/medical_terms.json`` (versioned with the data):
+brand and lay names in the supported languages map to a generic English
+term, its synonyms and MeSH headings. A query whose content is entirely
+covered by dictionary terms gets the same three query strategies as the
+LLM prompt (precise, synonym expansion, PICO) without a model call.
+Anything else is left to the LLM.
+"""
+
+import json
+import logging
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from app.models.schemas import QueryTransformResult
+from app.utils.query_normalizer import canonicalize
+
+logger = logging.getLogger(__name__)
+
+_DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "medical_terms.json"
+
+# Kana and CJK ideographs: those aliases match anywhere in the text since
+# the languages do not separate words with spaces
+_CJK_RE = re.compile(r"[぀-ヿ一-鿿]")
+
+# Japanese particles that may be left between matched terms once they are
+# cut out ("ビタミンDはうつに効く" leaves "は" and "に効く"). Only whole
+# particles count: the が of がん is not one.
+_JA_PARTICLES = (
+    "について", "に関する", "に対する", "による", "とは", "って", "では", "には",
+    "での", "への", "から", "まで", "より",
+    "の", "は", "が", "を", "に", "で", "と", "も", "や", "へ",
+)
+
+
+@dataclass(frozen=True)
+class _Term:
+    kind: str  # condition | intervention | outcome
+    term: str
+    synonyms: tuple[str, ...]
+    mesh: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class _Dictionary:
+    version: str
+    # (alias pattern, alias length, term), longest alias first
+    aliases: tuple[tuple[re.Pattern, int, _Term], ...]
+    ignore: frozenset[str]
+    # Unspaced (CJK) text made only of particles and ignored words
+    filler: re.Pattern
+
+
+@lru_cache
+def _load() -> _Dictionary:
+    data = json.loads(_DATA_PATH.read_text(encoding="utf-8"))
+    aliases = []
+    for entry in data["terms"]:
+        term = _Term(
+            kind=entry["kind"],
+            term=entry["term"],
+            synonyms=tuple(entry.get("synonyms", [])),
+            mesh=tuple(entry.get("mesh", [])),
+        )
+        for alias in {canonicalize(a) for a in entry["aliases"]}:
+            escaped = re.escape(alias)
+            pattern = escaped if _CJK_RE.search(alias) else rf"(?<!\w){escaped}(?!\w)"
+            aliases.append((re.compile(pattern), len(alias), term))
+    aliases.sort(key=lambda a: a[1], reverse=True)
+    ignore = frozenset(canonicalize(w) for w in data.get("ignore", []))
+    fillers = sorted({*_JA_PARTICLES, *(w for w in ignore if _CJK_RE.search(w))}, key=len, reverse=True)
+    logger.info("Loaded medical term dictionary %s (%d aliases)", data["version"], len(aliases))
+    return _Dictionary(
+        version=data["version"],
+        aliases=tuple(aliases),
+        ignore=ignore,
+        filler=re.compile(f"(?:{'|'.join(map(re.escape, fillers))})+"),
+    )
+
+
+def dictionary_version() -> str:
+    return _load().version
+
+
+def _match_terms(text: str, dictionary: _Dictionary) -> tuple[list[_Term], str]:
+    """Dictionary terms in the text (longest alias wins) and the unmatched rest."""
+    taken = [False] * len(text)
+    found: list[tuple[int, _Term]] = []
+    for pattern, _, term in dictionary.aliases:
+        for m in pattern.finditer(text):
+            if any(taken[m.start():m.end()]):
+                continue
+            taken[m.start():m.end()] = [True] * (m.end() - m.start())
+            if all(term is not t for _, t in found):
+                found.append((m.start(), term))
+    rest = "".join(" " if t else ch for ch, t in zip(text, taken))
+    return [term for _, term in sorted(found, key=lambda f: f[0])], rest
+
+
+def _is_filler(word: str, dictionary: _Dictionary) -> bool:
+    """Whether unmatched text carries no meaning of its own (particles, "効果")."""
+    if word in dictionary.ignore:
+        return True
+    return bool(_CJK_RE.search(word)) and dictionary.filler.fullmatch(word) is not None
+
+
+def _or_group(terms: list[str]) -> str:
+    unique = list(dict.fromkeys(terms))
+    return unique[0] if len(unique) == 1 else f"({' OR '.join(unique)})"
+
+
+def transform(user_query: str) -> QueryTransformResult | None:
+    """Rule-based transform, or None when the dictionary does not cover the query."""
+    dictionary = _load()
+    text = canonicalize(user_query)
+    terms, rest = _match_terms(text, dictionary)
+    if not terms:
+        return None
+
+    # Any meaningful unmatched text ("がん" before it was in the dictionary,
+    # "elderly") could change the question, so the LLM has to see it
+    if not all(_is_filler(w, dictionary) for w in rest.split()):
+        return None
+
+    by_kind = {
+        kind: [t for t in terms if t.kind == kind]
+        for kind in ("condition", "intervention", "outcome")
+    }
+    conditions, interventions, outcomes = by_kind.values()
+
+    # 1. precise, 2. synonym expansion, 3. PICO over MeSH headings
+    precise = " ".join(t.term for t in terms)
+    synonyms = " AND ".join(_or_group([t.term, *t.synonyms]) for t in terms)
+    pico = " AND ".join(
+        _or_group([m for t in group for m in (t.mesh or (t.term,))])
+        for group in (conditions, interventions, outcomes)
+        if group
+    )
+    queries = list(dict.fromkeys([precise, synonyms, pico]))
+
+    subjects = [t.term for t in interventions] or [t.term for t in conditions]
+    targets = [t.term for t in outcomes + (conditions if interventions else [])]
+    intent = f"Effects of {' and '.join(subjects)}" if subjects else "Evidence"
+    if targets:
+        intent += f" on {' and '.join(targets)}"
+
+    return QueryTransformResult(
+        original_query=user_query,
+        interpreted_intent=intent,
+        academic_queries=queries,
+        mesh_terms=list(dict.fromkeys(m for t in terms for m in t.mesh)),
+        key_concepts={
+            "conditions": [t.term for t in conditions],
+            "interventions": [t.term for t in interventions],
+            "outcomes": [t.term for t in outcomes],
+        },
+    )
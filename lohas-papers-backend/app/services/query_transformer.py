@@ -74,6 +74,11 @@ FALLBACK_RESULT = QueryTransformResult(
 )
 
 
+def is_fallback(result: QueryTransformResult) -> bool:
+    """Whether a transform is the generic fallback used when the LLM failed."""
+    return result.interpreted_intent == FALLBACK_RESULT.interpreted_intent
+
+
 async def transform_query(user_query: str, language: str) -> QueryTransformResult:
     """Transform a natural language query into academic search queries."""
     user_query = _sanitize_query(user_query)
@@ -95,11 +100,16 @@ async def transform_query(user_query: str, language: str) -> QueryTransformResul
         return result
     except Exception:
         logger.exception("Query transformation failed for: %s", user_query)
-        fallback = FALLBACK_RESULT.model_copy()
-        fallback.original_query = user_query
-        fallback.academic_queries = [
-            f"{user_query} systematic review",
-            f"{user_query} meta-analysis",
-            f"{user_query} randomized controlled trial",
-        ]
-        return fallback
+        return fallback_result(user_query)
+
+
+def fallback_result(user_query: str) -> QueryTransformResult:
+    """Transform used without the LLM: the query itself plus study designs."""
+    fallback = FALLBACK_RESULT.model_copy()
+    fallback.original_query = user_query
+    fallback.academic_queries = [
+        f"{user_query} systematic review",
+        f"{user_query} meta-analysis",
+        f"{user_query} randomized controlled trial",
+    ]
+    return fallback
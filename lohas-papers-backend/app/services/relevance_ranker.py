@@ -1,7 +1,18 @@
+import asyncio
+import datetime
 import logging
+import math
+from collections import Counter
+from collections.abc import Callable
 
-from app.models.schemas import RankedPaper, RankingResult, UnifiedPaper
-from app.services.llm_client import llm_chat_json
+from pydantic import ValidationError
+
+from app.cache import store as cache
+from app.models.schemas import QueryTransformResult, RankedPaper, RankingResult, UnifiedPaper
+from app.services import query_transformer, study_classifier
+from app.services.llm_client import llm_chat_json, llm_stream_objects, prompt_fingerprint
+from app.utils import deadline
+from app.utils.bm25 import BM25Index, tokenize
 
 logger = logging.getLogger(__name__)
 
@@ -12,61 +23,316 @@ SYSTEM_PROMPT = """あなたは学術論文の関連度評価エンジンです
 ## 評価基準
 
 1. **ユーザー意図との直接的関連性**（最重要）: 一般ユーザーが本当に知りたい情報を含んでいるか
-2. **エビデンスレベル**: メタアナリシス > システマティックレビュー > RCT > コホート研究 > ケースシリーズ > 症例報告 > 基礎研究 > 総説
+2. **エビデンスレベル**: 各論文の研究デザインは type: として付記済み（分類は不要）。メタアナリシス > システマティックレビュー > RCT > コホート研究 > ケースシリーズ > 症例報告 > 基礎研究 > 総説
 3. **実用性**: 臨床的に実用的な情報を含むか（基礎研究の分子メカニズム詳細より、臨床試験の結果を優先）
 4. **新しさ**: 同等のエビデンスレベルなら、新しい論文を優先
 5. **被引用数**: 同等の条件なら、被引用数が多い論文を優先
 
-## 出力形式（JSONのみ）
+## 出力形式（JSONのみ、rankings は relevance_score の高い順）
 
 {
   "rankings": [
     {
       "paper_id": "元のID",
       "relevance_score": 0.95,
-      "evidence_level": "high",
-      "study_type": "meta-analysis",
       "reason": "ランキング理由の短い説明（英語、50語以内）"
     }
   ]
-}
+}"""
+
+
+def normalize_intent(intent: str) -> str:
+    """Token form of an interpreted intent, used as the ranking cache key.
+
+    Word order is kept: "smoking causes depression" and "depression causes
+    smoking" are different questions.
+    """
+    return " ".join(tokenize(intent))
+
+
+def prompt_version() -> str:
+    return prompt_fingerprint(SYSTEM_PROMPT)
+
+
+# ── Lexical pre-ranking (BM25 over title, abstract and MeSH terms) ──
+
+_LLM_CANDIDATES = 80
+_SHARD_SIZE = 23  # papers per ranking call, including the 3 shared anchors
+_FIELD_WEIGHTS = {"title": 3.0, "mesh": 2.0, "abstract": 1.0}
+_LEXICAL_WEIGHT = 0.7  # rest is the citation/recency prior
+# Papers the LLM did not see are scored below this, so LLM-judged papers
+# stay ahead of merely matching ones
+_UNRANKED_SCORE_CAP = 0.5
+# With less time than this for the LLM, rank by pre-score right away
+_MIN_LLM_SECONDS = 3.0
+
+
+def _query_terms(
+    user_query: str,
+    interpreted_intent: str,
+    transform: QueryTransformResult | None,
+) -> dict[str, float]:
+    """Weighted query terms from the intent, academic queries and key concepts.
+
+    A term's weight grows with the number of query texts that mention it.
+    """
+    texts = [user_query, interpreted_intent]
+    if transform:
+        texts += transform.academic_queries + transform.mesh_terms
+        for concepts in transform.key_concepts.values():
+            texts += concepts if isinstance(concepts, list) else [str(concepts)]
+    counts = Counter(term for text in texts for term in set(tokenize(text)))
+    return {term: 1 + math.log(n) for term, n in counts.items()}
+
+
+def prescore_papers(papers: list[UnifiedPaper], query_terms: dict[str, float]) -> list[float]:
+    """0-1 pre-rank score per paper: BM25 match blended with citations and recency."""
+    index = BM25Index(
+        [
+            {
+                "title": tokenize(p.title),
+                "abstract": tokenize(p.abstract or ""),
+                "mesh": [t for term in p.mesh_terms for t in tokenize(term)],
+            }
+            for p in papers
+        ],
+        _FIELD_WEIGHTS,
+    )
+    lexical = index.score(query_terms)
+    max_lexical = max(lexical, default=0.0) or 1.0
 
-evidence_levelは "high", "moderate", "low" のいずれか。
-study_typeは "meta-analysis", "systematic-review", "RCT", "cohort", "case-series", "case-report", "basic-research", "review", "other" のいずれか。"""
+    current_year = datetime.date.today().year
+    max_citations = max((p.citation_count for p in papers), default=1) or 1
+
+    scores = []
+    for p, bm25 in zip(papers, lexical):
+        citation_score = p.citation_count / max_citations  # 0-1
+        recency_score = max(0, 1 - (current_year - (p.year or 2000)) / 20)  # 0-1, last 20 years
+        prior = citation_score * 0.6 + recency_score * 0.4
+        scores.append(_LEXICAL_WEIGHT * bm25 / max_lexical + (1 - _LEXICAL_WEIGHT) * prior)
+    return scores
 
 
 async def rank_papers(
     user_query: str,
     interpreted_intent: str,
     papers: list[UnifiedPaper],
+    transform: QueryTransformResult | None = None,
+    on_ranked: Callable[[RankedPaper], None] | None = None,
+    llm_timeout: float | None = None,
 ) -> list[RankedPaper]:
-    """Use LLM to rank papers by relevance to user query.
+    """Rank papers by relevance to the user query.
 
-    For efficiency, only rank the top 30 papers (by citation count as a pre-filter).
+    All papers are pre-scored locally (BM25 against the transformed queries
+    plus a citation/recency prior); the top _LLM_CANDIDATES are ranked by
+    the LLM, except those with a cached score for the same normalized
+    intent. Every other paper gets its pre-score, capped at
+    _UNRANKED_SCORE_CAP. A fallback transform carries the same generic
+    intent for every query, so its rankings are neither read from nor
+    written to the cache.
+
+    ``on_ranked`` is called with each provisional LLM score as soon as it is
+    known: cached scores immediately, the rest as the ranking streams in
+    (uncalibrated, best first within each shard). Callers use it to start
+    work on likely top papers before the full ranking is done.
+
+    ``llm_timeout`` bounds the LLM stage; when it is too short or runs out,
+    the uncached candidates keep their pre-score (the "ranking" stage is
+    marked degraded).
     """
     if not papers:
         return []
 
-    # Pre-filter: take top 50 using hybrid score (citations + recency)
-    # This ensures recent important papers with few citations aren't excluded
-    import datetime
-    current_year = datetime.date.today().year
-    max_citations = max((p.citation_count for p in papers), default=1) or 1
+    prescores = prescore_papers(papers, _query_terms(user_query, interpreted_intent, transform))
+    order = sorted(range(len(papers)), key=lambda i: prescores[i], reverse=True)
+    candidate_idx = order[:_LLM_CANDIDATES]
+    candidates = [papers[i] for i in candidate_idx]
+
+    # Candidates already scored for an equivalent intent skip the LLM
+    intent_key = None
+    if transform is None or not query_transformer.is_fallback(transform):
+        intent_key = normalize_intent(interpreted_intent or user_query)
+    version = prompt_version()
+    cached = (
+        await cache.get_cached_rankings(intent_key, [p.id for p in candidates], version)
+        if intent_key
+        else {}
+    )
+    rankings = [RankedPaper(**{**cached[p.id], "paper_id": p.id}) for p in candidates if p.id in cached]
+    to_rank = [p for p in candidates if p.id not in cached]
+    if cached:
+        logger.info("Ranking: %d cached, %d sent to LLM", len(cached), len(to_rank))
+    if on_ranked:
+        for r in sorted(rankings, key=lambda r: r.relevance_score, reverse=True):
+            on_ranked(r)
+
+    if to_rank:
+        to_rank_prescores = [prescores[i] for i in candidate_idx if papers[i].id not in cached]
+        try:
+            if llm_timeout is not None and llm_timeout < _MIN_LLM_SECONDS:
+                raise asyncio.TimeoutError
+            rankings += await asyncio.wait_for(
+                _rank_with_llm(
+                    user_query,
+                    interpreted_intent,
+                    to_rank,
+                    to_rank_prescores,
+                    intent_key,
+                    version,
+                    on_ranked,
+                ),
+                llm_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("LLM ranking over budget (%.1fs), using pre-scores", llm_timeout)
+            deadline.degrade("ranking")
+            rankings += _fallback_ranking(to_rank, to_rank_prescores)
+
+    ranked_ids = {r.paper_id for r in rankings}
+    for i in order:
+        if papers[i].id not in ranked_ids:
+            rankings.append(
+                RankedPaper(
+                    paper_id=papers[i].id,
+                    relevance_score=round(prescores[i] * _UNRANKED_SCORE_CAP, 3),
+                    reason="Lexical match to the query (not LLM-ranked)",
+                )
+            )
+
+    # Study design and evidence level come from metadata, not the LLM
+    paper_map = {p.id: p for p in papers}
+    for r in rankings:
+        if r.paper_id in paper_map:
+            r.study_type, r.evidence_level = study_classifier.classify(paper_map[r.paper_id])
+    return rankings
 
-    def hybrid_score(p: UnifiedPaper) -> float:
-        citation_score = p.citation_count / max_citations  # 0-1
-        recency_score = max(0, 1 - (current_year - (p.year or 2000)) / 20)  # 0-1, last 20 years
-        return citation_score * 0.6 + recency_score * 0.4
 
-    sorted_by_hybrid = sorted(papers, key=hybrid_score, reverse=True)
-    candidates = sorted_by_hybrid[:20]
+def _plan_shards(n: int) -> tuple[list[int], list[list[int]]]:
+    """Split n candidates (sorted by pre-score) into shards sharing anchor papers.
 
+    Anchors sit at the 10th/50th/90th percentile of the pre-score order so
+    they span the score range; the remaining papers are dealt round-robin so
+    every shard gets a similar mix. Returns (anchor indices, shards).
+    """
+    if n <= _SHARD_SIZE:
+        return [], [list(range(n))]
+    anchors = sorted({round(q * (n - 1)) for q in (0.1, 0.5, 0.9)})
+    rest = [i for i in range(n) if i not in anchors]
+    n_shards = math.ceil(len(rest) / (_SHARD_SIZE - len(anchors)))
+    return anchors, [sorted(anchors + rest[k::n_shards]) for k in range(n_shards)]
+
+
+def _calibrate(
+    shard_scores: list[dict[str, float]], anchor_ids: list[str]
+) -> tuple[list[tuple[float, float]], dict[str, float]]:
+    """Per-shard linear maps onto a common scale, fitted on the anchors.
+
+    The reference score of an anchor is its mean over all shards. Each shard
+    gets score' = a * score + b by least squares against the reference (the
+    slope is clamped to [0.5, 2]; with fewer than two usable anchors only an
+    offset is applied). Returns (maps, reference anchor scores).
+    """
+    reference: dict[str, float] = {}
+    for a in anchor_ids:
+        seen = [scores[a] for scores in shard_scores if a in scores]
+        if seen:
+            reference[a] = sum(seen) / len(seen)
+
+    maps = []
+    for scores in shard_scores:
+        pairs = [(scores[a], reference[a]) for a in reference if a in scores]
+        if not pairs:
+            maps.append((1.0, 0.0))
+            continue
+        mean_x = sum(x for x, _ in pairs) / len(pairs)
+        mean_y = sum(y for _, y in pairs) / len(pairs)
+        var_x = sum((x - mean_x) ** 2 for x, _ in pairs)
+        slope = 1.0
+        if len(pairs) >= 2 and var_x > 1e-4:
+            cov = sum((x - mean_x) * (y - mean_y) for x, y in pairs)
+            slope = min(2.0, max(0.5, cov / var_x))
+        maps.append((slope, mean_y - slope * mean_x))
+    return maps, reference
+
+
+async def _rank_with_llm(
+    user_query: str,
+    interpreted_intent: str,
+    candidates: list[UnifiedPaper],
+    prescores: list[float],
+    intent_key: str | None,
+    version: str,
+    on_ranked: Callable[[RankedPaper], None] | None = None,
+) -> list[RankedPaper]:
+    """LLM ranking of candidates in concurrent shards; results are cached per paper.
+
+    Shards share a few anchor papers whose scores calibrate the shards onto
+    one scale before merging. Papers of a failed shard fall back to their
+    pre-score (and are not cached). Nothing is cached without ``intent_key``.
+    """
+    anchor_idx, shards = _plan_shards(len(candidates))
+    results = await asyncio.gather(
+        *[
+            _rank_shard(user_query, interpreted_intent, [candidates[i] for i in shard], on_ranked)
+            for shard in shards
+        ],
+        return_exceptions=True,
+    )
+
+    ok = [(shard, r) for shard, r in zip(shards, results) if not isinstance(r, BaseException)]
+    for r in results:
+        if isinstance(r, BaseException):
+            logger.warning("Ranking shard failed, using pre-score fallback: %s", r)
+
+    anchor_ids = [candidates[i].id for i in anchor_idx]
+    maps, reference = _calibrate(
+        [{rp.paper_id: rp.relevance_score for rp in r} for _, r in ok], anchor_ids
+    )
+
+    merged: dict[str, RankedPaper] = {}
+    for (_, shard_rankings), (slope, offset) in zip(ok, maps):
+        for rp in shard_rankings:
+            if rp.paper_id in merged:
+                continue
+            score = reference.get(rp.paper_id, slope * rp.relevance_score + offset)
+            merged[rp.paper_id] = rp.model_copy(
+                update={"relevance_score": round(min(1.0, max(0.0, score)), 3)}
+            )
+
+    if merged and intent_key:
+        await cache.set_cached_rankings(
+            intent_key,
+            {pid: r.model_dump(include={"relevance_score", "reason"}) for pid, r in merged.items()},
+            version,
+        )
+
+    unscored = [(p, score) for p, score in zip(candidates, prescores) if p.id not in merged]
+    if unscored and len(ok) < len(shards):
+        return list(merged.values()) + _fallback_ranking(
+            [p for p, _ in unscored], [score for _, score in unscored]
+        )
+    return list(merged.values())
+
+
+async def _rank_shard(
+    user_query: str,
+    interpreted_intent: str,
+    papers: list[UnifiedPaper],
+    on_ranked: Callable[[RankedPaper], None] | None = None,
+) -> list[RankedPaper]:
+    """One ranking call; only IDs from this shard are kept.
+
+    With ``on_ranked`` the response is streamed and each ranking is reported
+    as soon as its JSON object is complete. A stream that breaks off keeps
+    the rankings received so far.
+    """
     # Build compact paper list for LLM (minimize tokens for speed)
     paper_list_text = ""
-    for p in candidates:
+    for p in papers:
         abstract_preview = (p.abstract or "")[:100]
         paper_list_text += (
-            f"- ID: {p.id} | {p.year or '?'} | cite:{p.citation_count}\n"
+            f"- ID: {p.id} | {p.year or '?'} | cite:{p.citation_count}"
+            f" | type:{study_classifier.classify(p)[0]}\n"
             f"  {p.title}\n"
             f"  {abstract_preview}\n"
         )
@@ -77,30 +343,37 @@ async def rank_papers(
         f"論文リスト:\n{paper_list_text}"
     )
 
-    try:
+    ids = {p.id for p in papers}
+    if on_ranked is None:
         data = await llm_chat_json(SYSTEM_PROMPT, user_message, max_tokens=4096, retries=1)
-        result = RankingResult(**data)
-        return result.rankings
-    except Exception:
-        logger.exception("Relevance ranking failed, using citation-based fallback")
-        return _fallback_ranking(candidates)
+        return [r for r in RankingResult(**data).rankings if r.paper_id in ids]
 
+    rankings: list[RankedPaper] = []
+    try:
+        async for item in llm_stream_objects(SYSTEM_PROMPT, user_message, max_tokens=4096):
+            try:
+                ranked = RankedPaper(**item)
+            except ValidationError:
+                continue
+            if ranked.paper_id in ids:
+                rankings.append(ranked)
+                on_ranked(ranked)
+    except Exception as e:
+        if not rankings:
+            raise
+        logger.warning("Ranking stream broke off after %d papers: %s", len(rankings), e)
+    if not rankings:
+        raise ValueError("Ranking stream returned no rankings")
+    return rankings
 
-def _fallback_ranking(papers: list[UnifiedPaper]) -> list[RankedPaper]:
-    """Fallback ranking based on citation count when LLM fails."""
-    rankings = []
-    max_citations = max((p.citation_count for p in papers), default=1) or 1
 
-    for paper in papers:
-        score = round(paper.citation_count / max_citations, 2)
-        rankings.append(
-            RankedPaper(
-                paper_id=paper.id,
-                relevance_score=score,
-                evidence_level="moderate",
-                study_type="other",
-                reason="Ranked by citation count (LLM fallback)",
-            )
+def _fallback_ranking(papers: list[UnifiedPaper], prescores: list[float]) -> list[RankedPaper]:
+    """Fallback ranking based on the local pre-score when the LLM fails."""
+    return [
+        RankedPaper(
+            paper_id=paper.id,
+            relevance_score=round(score, 2),
+            reason="Ranked by query match and citations (LLM fallback)",
         )
-
-    return rankings
+        for paper, score in zip(papers, prescores)
+    ]
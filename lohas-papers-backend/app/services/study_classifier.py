@@ -0,0 +1,108 @@
+"""Deterministic study-type and evidence-level classification from metadata.
+
+Uses Semantic Scholar ``publicationTypes``, PubMed ``PublicationType`` and
+title/abstract keywords. Every matching signal votes for a study type and
+the highest one in the evidence hierarchy wins, so e.g. a "systematic
+review and meta-analysis of randomized trials" tagged "Review" is a
+meta-analysis.
+"""
+
+import re
+
+from app.models.schemas import UnifiedPaper
+
+# Evidence hierarchy, strongest first (same vocabulary as the ranking prompt)
+STUDY_TYPES = [
+    "meta-analysis",
+    "systematic-review",
+    "RCT",
+    "cohort",
+    "case-series",
+    "case-report",
+    "basic-research",
+    "review",
+    "other",
+]
+_PRIORITY = {t: i for i, t in enumerate(STUDY_TYPES)}
+
+EVIDENCE_LEVELS = {
+    "meta-analysis": "high",
+    "systematic-review": "high",
+    "RCT": "high",
+    "cohort": "moderate",
+    "case-series": "low",
+    "case-report": "low",
+    "basic-research": "low",
+    "review": "low",
+    "other": "low",
+}
+
+# Publication type labels (lowercased) from both sources
+_PUBLICATION_TYPES = {
+    # Semantic Scholar
+    "metaanalysis": "meta-analysis",
+    "casereport": "case-report",
+    "review": "review",
+    # PubMed
+    "meta-analysis": "meta-analysis",
+    "systematic review": "systematic-review",
+    "randomized controlled trial": "RCT",
+    "pragmatic clinical trial": "RCT",
+    "equivalence trial": "RCT",
+    "observational study": "cohort",
+    "case reports": "case-report",
+    "scoping review": "review",
+}
+
+# Title keywords
+_TITLE_KEYWORDS = [
+    (re.compile(r"\bmeta[- ]?analy[sz]"), "meta-analysis"),
+    (re.compile(r"\bsystematic (?:literature )?review\b"), "systematic-review"),
+    (re.compile(r"\brandomi[sz]ed\b.{0,60}\b(?:trial|study)\b|\brcts?\b"), "RCT"),
+    (re.compile(r"\b(?:cohort|prospective|retrospective|longitudinal|population-based)\b"), "cohort"),
+    (re.compile(r"\bcase series\b"), "case-series"),
+    (re.compile(r"\bcase reports?\b|\ba case of\b"), "case-report"),
+    (re.compile(r"\bin vitro\b|\bin vivo\b|\bmice\b|\bmouse\b|\brats?\b|\bcell lines?\b"), "basic-research"),
+    (re.compile(r"\breview\b"), "review"),
+]
+
+# Abstract phrases describing the paper's own design ("In this randomized
+# trial", "We conducted a meta-analysis"); a bare mention is too often about
+# prior work ("earlier meta-analyses found ...")
+_SELF = r"\b(?:this|present|current|we (?:conducted|performed|report|carried out))\b(?:\W+[\w-]+){0,4}?\W+"
+_ABSTRACT_KEYWORDS = [
+    (re.compile(_SELF + r"meta[- ]?analy[sz]"), "meta-analysis"),
+    (re.compile(_SELF + r"systematic (?:literature )?review\b"), "systematic-review"),
+    (re.compile(_SELF + r"randomi[sz]ed\b"), "RCT"),
+    (re.compile(_SELF + r"(?:cohort|prospective|retrospective|longitudinal)\b"), "cohort"),
+    (re.compile(_SELF + r"case series\b"), "case-series"),
+]
+
+
+def classify(paper: UnifiedPaper) -> tuple[str, str]:
+    """Return (study_type, evidence_level) for a paper."""
+    votes = []
+    for pub_type in paper.publication_types:
+        study_type = _PUBLICATION_TYPES.get(pub_type.lower())
+        if study_type:
+            votes.append(study_type)
+
+    title = (paper.title or "").lower()
+    votes += [t for pattern, t in _TITLE_KEYWORDS if pattern.search(title)]
+
+    # The abstract is only consulted when nothing else classified the paper
+    if not votes and paper.abstract:
+        abstract = paper.abstract.lower()
+        votes += [t for pattern, t in _ABSTRACT_KEYWORDS if pattern.search(abstract)]
+
+    study_type = min(votes, key=_PRIORITY.__getitem__, default="other")
+    return study_type, EVIDENCE_LEVELS[study_type]
+
+
+def matches_filter(study_type: str, wanted: str) -> bool:
+    """Whether a study type passes a ``SearchFilters.study_type`` value.
+
+    The filter is a comma-separated list of study types (case-insensitive).
+    """
+    allowed = {t.strip().lower() for t in wanted.split(",") if t.strip()}
+    return not allowed or study_type.lower() in allowed
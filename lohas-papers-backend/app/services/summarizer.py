@@ -1,7 +1,11 @@
 import asyncio
 import logging
+import re
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from functools import lru_cache
 
-from app.services.llm_client import llm_chat
+from app.services.llm_client import llm_chat, llm_complete, prompt_fingerprint
 
 logger = logging.getLogger(__name__)
 
@@ -303,19 +307,133 @@ FULLTEXT_SECTION_PROMPT = """あなたは学術論文の翻訳者です。
 5. 翻訳テキストのみを出力すること。余計な前置きや説明は一切含めないこと"""
 
 
+FULLTEXT_MERGED_PROMPT = """## 複数セクションの入力
+入力に「<<<1: Acknowledgements>>>」のような区切り行が含まれる場合は、区切り行を一字一句そのまま出力に残し、
+その直後に対応するセクションの翻訳を出力すること。区切り行の順序と数を変えないこと。"""
+
+# Chunking budget. Token counts are estimated from characters (no tokenizer
+# is bundled); ~4 chars/token holds for English source text.
+_CHARS_PER_TOKEN = 4
+_CHUNK_INPUT_TOKENS = 1500  # source tokens per call; output stays well under max_tokens
+_MERGE_BELOW_TOKENS = 400  # sections smaller than this are batched into one call
+_CHUNK_MAX_TOKENS = 4096
+_MAX_CONTINUATIONS = 2  # extra calls when a chunk's output hits max_tokens
+_FULLTEXT_CONCURRENCY = 4
+
+_fulltext_semaphore = asyncio.Semaphore(_FULLTEXT_CONCURRENCY)
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\[])")
+_MARKER_RE = re.compile(r"^<<<(\d+)[^>\n]*>>>[ \t]*$", re.MULTILINE)
+
+
+@dataclass
+class _Chunk:
+    """One LLM call: a list of (section index, part index, text) pieces."""
+
+    pieces: list[tuple[int, int, str]] = field(default_factory=list)
+    tokens: int = 0
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def _split_to_budget(text: str, budget: int) -> list[str]:
+    """Split text into parts under ``budget`` tokens.
+
+    Breaks at paragraph boundaries, falling back to sentence boundaries for
+    oversized paragraphs and to a hard character cut for oversized sentences.
+    """
+    if _estimate_tokens(text) <= budget:
+        return [text]
+
+    # (unit, separator from the previous unit): sentences of one paragraph
+    # rejoin with a space, hard cuts of one sentence with nothing
+    units: list[tuple[str, str]] = []
+    for para in _PARAGRAPH_RE.split(text):
+        if _estimate_tokens(para) <= budget:
+            units.append((para, "\n\n"))
+            continue
+        sep = "\n\n"
+        for sentence in _SENTENCE_RE.split(para):
+            max_chars = budget * _CHARS_PER_TOKEN
+            for i in range(0, len(sentence), max_chars):
+                units.append((sentence[i:i + max_chars], sep if i == 0 else ""))
+            sep = " "
+
+    parts: list[str] = []
+    current = ""
+    current_tokens = 0
+    for unit, sep in units:
+        unit_tokens = _estimate_tokens(unit)
+        if current and current_tokens + unit_tokens > budget:
+            parts.append(current)
+            current, current_tokens = "", 0
+        current = f"{current}{sep}{unit}" if current else unit
+        current_tokens += unit_tokens
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _plan_chunks(sections: list[dict]) -> list[_Chunk]:
+    """Group sections into token-budgeted calls, preserving document order.
+
+    Long sections are split into several chunks; runs of consecutive small
+    sections share one chunk.
+    """
+    chunks: list[_Chunk] = []
+    merging: _Chunk | None = None
+    for s_idx, section in enumerate(sections):
+        text = section["text"]
+        tokens = _estimate_tokens(text)
+        if tokens < _MERGE_BELOW_TOKENS:
+            if merging is None or merging.tokens + tokens > _CHUNK_INPUT_TOKENS:
+                merging = _Chunk()
+                chunks.append(merging)
+            merging.pieces.append((s_idx, 0, text))
+            merging.tokens += tokens
+            continue
+        merging = None
+        for p_idx, part in enumerate(_split_to_budget(text, _CHUNK_INPUT_TOKENS)):
+            chunks.append(_Chunk([(s_idx, p_idx, part)], _estimate_tokens(part)))
+    return chunks
+
+
+async def _complete_with_continuation(system_prompt: str, user_message: str) -> str:
+    """Run a completion, continuing it while the output is cut off at max_tokens."""
+    messages = [{"role": "user", "content": user_message}]
+    text = ""
+    for attempt in range(_MAX_CONTINUATIONS + 1):
+        part, stop_reason = await llm_complete(
+            system_prompt, messages, max_tokens=_CHUNK_MAX_TOKENS
+        )
+        text += part
+        if stop_reason != "max_tokens":
+            break
+        if attempt == _MAX_CONTINUATIONS:
+            logger.warning("Fulltext chunk still truncated after %d continuations", attempt)
+            break
+        # The API rejects a prefill ending in whitespace
+        text = text.rstrip()
+        messages = [messages[0], {"role": "assistant", "content": text}]
+    return text.strip()
+
+
+def _fulltext_system_prompt(difficulty: str) -> str:
+    difficulty_prompt = _DIFFICULTY_PROMPTS.get(difficulty, LAYPERSON_TRANSLATION_PROMPT)
+    return f"{difficulty_prompt}\n\n{FULLTEXT_SECTION_PROMPT}\n\n{FULLTEXT_MERGED_PROMPT}"
+
+
 async def translate_fulltext_section(
     text: str,
     language: str,
     difficulty: str,
     section_name: str = "",
 ) -> str:
-    """Translate a single section of a paper at the specified difficulty level."""
-    difficulty_prompt = _DIFFICULTY_PROMPTS.get(difficulty, LAYPERSON_TRANSLATION_PROMPT)
+    """Translate one piece of a paper at the specified difficulty level."""
     lang_name = LANGUAGE_NAMES.get(language, language)
-
-    # Combine section-specific prompt with difficulty prompt
-    system_prompt = f"{difficulty_prompt}\n\n{FULLTEXT_SECTION_PROMPT}"
-
     user_message = (
         f"言語: {lang_name} ({language})\n"
         f"セクション: {section_name}\n\n"
@@ -323,8 +441,10 @@ async def translate_fulltext_section(
     )
 
     try:
-        # Use higher max_tokens for full sections (up to ~4K words)
-        return await llm_chat(system_prompt, user_message, max_tokens=8192)
+        async with _fulltext_semaphore:
+            return await _complete_with_continuation(
+                _fulltext_system_prompt(difficulty), user_message
+            )
     except Exception:
         logger.exception(
             "Fulltext section translation failed (section=%s, difficulty=%s, lang=%s)",
@@ -333,34 +453,124 @@ async def translate_fulltext_section(
         return ""
 
 
+async def _translate_merged(
+    pieces: list[tuple[str, str]],
+    language: str,
+    difficulty: str,
+) -> list[str]:
+    """Translate several small (name, text) sections in one call.
+
+    Falls back to one call per section if the output markers don't line up.
+    """
+    lang_name = LANGUAGE_NAMES.get(language, language)
+    body = "\n\n".join(f"<<<{i + 1}: {name}>>>\n{text}" for i, (name, text) in enumerate(pieces))
+    user_message = f"言語: {lang_name} ({language})\n\n{body}"
+
+    try:
+        async with _fulltext_semaphore:
+            output = await _complete_with_continuation(
+                _fulltext_system_prompt(difficulty), user_message
+            )
+        # re.split with one group yields [preamble, num, text, num, text, ...]
+        split = _MARKER_RE.split(output)
+        numbers = [int(n) for n in split[1::2]]
+        if numbers == list(range(1, len(pieces) + 1)):
+            return [t.strip() for t in split[2::2]]
+        logger.warning(
+            "Merged section translation returned %d/%d markers, retrying separately",
+            len(numbers), len(pieces),
+        )
+    except Exception:
+        logger.warning("Merged section translation failed, retrying separately", exc_info=True)
+
+    return list(await asyncio.gather(*[
+        translate_fulltext_section(text, language, difficulty, name) for name, text in pieces
+    ]))
+
+
 async def translate_fulltext_sections(
     sections: list[dict],
     language: str,
     difficulty: str,
+    on_section: Callable[[int, dict], Awaitable[None]] | None = None,
 ) -> list[dict]:
-    """Translate all sections of a paper in parallel.
+    """Translate all sections of a paper in token-budgeted chunks.
 
     Input: [{"name": "Introduction", "text": "..."}]
-    Returns: [{"name": "Introduction", "original": "...", "translated": "..."}]
-    """
-    tasks = [
-        translate_fulltext_section(s["text"], language, difficulty, s["name"])
-        for s in sections
-    ]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    Returns: [{"section_name": "Introduction", "original": "...", "translated": "..."}]
 
-    translated_sections: list[dict] = []
-    for section, result in zip(sections, results):
-        if isinstance(result, Exception):
-            logger.warning("Section translation failed for %s: %s", section["name"], result)
-            translated_text = ""
+    Long sections are split at paragraph/sentence boundaries and small ones
+    are batched; chunks run concurrently (bounded by _FULLTEXT_CONCURRENCY)
+    and are reassembled in order. A section with any failed chunk is left
+    untranslated rather than returned partially. ``on_section(index, entry)``
+    is awaited as soon as each section's last chunk finishes.
+    """
+    chunks = _plan_chunks(sections)
+    part_counts = [0] * len(sections)
+    for chunk in chunks:
+        for s_idx, _, _ in chunk.pieces:
+            part_counts[s_idx] += 1
+
+    parts: list[list[str]] = [[""] * n for n in part_counts]
+    remaining = list(part_counts)
+    translated_sections: list[dict | None] = [None] * len(sections)
+
+    async def finish(s_idx: int) -> None:
+        section = sections[s_idx]
+        if all(parts[s_idx]):
+            translated_text = "\n\n".join(parts[s_idx])
         else:
-            translated_text = result
-
-        translated_sections.append({
+            logger.warning("Section translation incomplete for %s", section["name"])
+            translated_text = ""
+        entry = {
             "section_name": section["name"],
             "original": section["text"],
             "translated": translated_text,
-        })
+        }
+        translated_sections[s_idx] = entry
+        if on_section:
+            await on_section(s_idx, entry)
+
+    async def run(chunk: _Chunk) -> None:
+        if len(chunk.pieces) == 1:
+            s_idx, p_idx, text = chunk.pieces[0]
+            name = sections[s_idx]["name"]
+            if part_counts[s_idx] > 1:
+                name = f"{name} ({p_idx + 1}/{part_counts[s_idx]})"
+            outputs = [await translate_fulltext_section(text, language, difficulty, name)]
+        else:
+            pieces = [(sections[s_idx]["name"], text) for s_idx, _, text in chunk.pieces]
+            outputs = await _translate_merged(pieces, language, difficulty)
+
+        for (s_idx, p_idx, _), output in zip(chunk.pieces, outputs):
+            parts[s_idx][p_idx] = output
+            remaining[s_idx] -= 1
+            if remaining[s_idx] == 0:
+                await finish(s_idx)
 
+    await asyncio.gather(*[run(c) for c in chunks])
     return translated_sections
+
+
+# ── Prompt versions (cache key namespaces) ──
+
+
+@lru_cache
+def prompt_version(kind: str) -> str:
+    """Version tag for cached outputs of "summary", "translation" or "fulltext"."""
+    prompts = {
+        "summary": [SUMMARY_SYSTEM_PROMPT],
+        "translation": [
+            EXPERT_TRANSLATION_PROMPT,
+            LAYPERSON_TRANSLATION_PROMPT,
+            CHILDREN_TRANSLATION_PROMPT,
+        ],
+        "fulltext": [
+            EXPERT_TRANSLATION_PROMPT,
+            LAYPERSON_TRANSLATION_PROMPT,
+            CHILDREN_TRANSLATION_PROMPT,
+            FULLTEXT_SECTION_PROMPT,
+            FULLTEXT_MERGED_PROMPT,
+        ],
+    }
+    return prompt_fingerprint(*prompts[kind])
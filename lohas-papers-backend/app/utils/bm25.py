@@ -0,0 +1,84 @@
+import math
+import re
+from collections import Counter
+
+# Words that carry no topical signal, plus boolean operators from the
+# generated academic queries
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "and", "or", "not", "with", "to",
+    "by", "at", "from", "as", "is", "are", "was", "were", "be", "been", "this",
+    "that", "these", "those", "it", "its", "their", "we", "our", "vs", "versus",
+    "than", "into", "between", "among", "after", "before", "during", "which",
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word tokens without stopwords, with plural -s folded."""
+    tokens = []
+    for word in _TOKEN_RE.findall(text.lower()):
+        if word in _STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class BM25Index:
+    """BM25 over a small in-memory document set with weighted fields.
+
+    Each document is a dict of field -> tokens; term frequencies are summed
+    across fields with ``field_weights`` (a simplified BM25F sharing one
+    length normalization). Scoring walks the inverted index once per query
+    term and accumulates into a flat score array, so cost is proportional to
+    matching postings rather than to documents x query terms.
+    """
+
+    def __init__(
+        self,
+        docs: list[dict[str, list[str]]],
+        field_weights: dict[str, float],
+        *,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.n_docs = len(docs)
+        self.postings: dict[str, list[tuple[int, float]]] = {}
+        lengths: list[float] = []
+        for i, doc in enumerate(docs):
+            tf: Counter = Counter()
+            for field, tokens in doc.items():
+                weight = field_weights.get(field, 1.0)
+                for token in tokens:
+                    tf[token] += weight
+            lengths.append(sum(tf.values()))
+            for term, freq in tf.items():
+                self.postings.setdefault(term, []).append((i, freq))
+
+        avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self.k1 = k1
+        # Per-document length normalization term, precomputed once
+        self._norms = [
+            k1 * (1 - b + b * (length / avg_length if avg_length else 0.0))
+            for length in lengths
+        ]
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+
+    def score(self, query_terms: dict[str, float]) -> list[float]:
+        """BM25 score of every document for weighted query terms."""
+        scores = [0.0] * self.n_docs
+        k1_plus_1 = self.k1 + 1
+        norms = self._norms
+        for term, query_weight in query_terms.items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            weight = query_weight * self.idf(term)
+            for i, tf in postings:
+                scores[i] += weight * tf * k1_plus_1 / (tf + norms[i])
+        return scores
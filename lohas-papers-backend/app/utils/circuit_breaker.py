@@ -0,0 +1,155 @@
+"""Per-upstream circuit breakers.
+
+A breaker opens when at least ``failure_rate`` of the calls in the last
+``window`` seconds failed (and there were at least ``min_calls`` of them).
+While open, calls are rejected immediately with ``CircuitOpenError``.
+After ``open_seconds`` one probe call at a time is let through (half-open):
+a success closes the circuit, a failure opens it again.
+
+Only upstream health counts as failure (timeouts, connection errors, 429,
+5xx); callers decide which outcomes to record.
+
+Rejections are also noted in a request-scoped set (see ``track_degraded``)
+so responses can report which sources were skipped.
+"""
+
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"Circuit open for {name}")
+        self.name = name
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window: float = 60.0,
+        open_seconds: float = 30.0,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._calls: deque[tuple[float, bool]] = deque()  # (time, ok)
+        self._opened_at = 0.0
+        self._probe_started: float | None = None
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now (claims the probe when half-open)."""
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self._opened_at < self.open_seconds:
+                return False
+            self.state = HALF_OPEN
+            self._probe_started = None
+        # Half-open: one probe at a time; a probe that never reported back
+        # (e.g. cancelled) is given up on after open_seconds
+        if self._probe_started is None or now - self._probe_started > self.open_seconds:
+            self._probe_started = now
+            return True
+        return False
+
+    def check(self) -> None:
+        """Raise CircuitOpenError (and mark the source degraded) if the call is not allowed."""
+        if not self.allow():
+            mark_degraded(self.name)
+            raise CircuitOpenError(self.name)
+
+    @property
+    def is_open(self) -> bool:
+        """Open and still cooling down, i.e. retrying now would be rejected."""
+        return self.state == OPEN and time.monotonic() - self._opened_at < self.open_seconds
+
+    def record_success(self) -> None:
+        if self.state == HALF_OPEN:
+            logger.info("Circuit %s closed after successful probe", self.name)
+            self.state = CLOSED
+            self._calls.clear()
+        self._record(True)
+
+    def record_failure(self) -> None:
+        if self.state == HALF_OPEN:
+            self._open("probe failed")
+            return
+        self._record(False)
+        if self.state != CLOSED or len(self._calls) < self.min_calls:
+            return
+        failures = sum(1 for _, ok in self._calls if not ok)
+        if failures / len(self._calls) >= self.failure_rate:
+            self._open(f"{failures}/{len(self._calls)} calls failed")
+
+    def _record(self, ok: bool) -> None:
+        now = time.monotonic()
+        self._calls.append((now, ok))
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+
+    def _open(self, reason: str) -> None:
+        logger.warning("Circuit %s opened (%s)", self.name, reason)
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started = None
+        self._calls.clear()
+
+    def snapshot(self) -> dict:
+        failures = sum(1 for _, ok in self._calls if not ok)
+        return {"state": self.state, "calls": len(self._calls), "failures": failures}
+
+
+# PDF hosts are many and each serves few requests, so they trip sooner
+_SETTINGS = {
+    "pdf": {"min_calls": 3, "open_seconds": 300.0},
+}
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get(name: str) -> CircuitBreaker:
+    """Breaker for an upstream, e.g. "pubmed" or "pdf:www.example.org"."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = CircuitBreaker(name, **_SETTINGS.get(name.split(":", 1)[0], {}))
+        _breakers[name] = breaker
+    return breaker
+
+
+def get_stats() -> dict:
+    return {name: b.snapshot() for name, b in sorted(_breakers.items())}
+
+
+# ── Request-scoped record of skipped upstreams ──
+
+_degraded: ContextVar[set[str] | None] = ContextVar("degraded_sources", default=None)
+
+
+def track_degraded() -> set[str]:
+    """Start collecting degraded sources for the current request.
+
+    Tasks spawned from the request share the returned set.
+    """
+    degraded: set[str] = set()
+    _degraded.set(degraded)
+    return degraded
+
+
+def mark_degraded(name: str) -> None:
+    degraded = _degraded.get()
+    if degraded is not None:
+        degraded.add(name)
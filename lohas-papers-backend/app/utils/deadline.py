@@ -0,0 +1,49 @@
+"""Request-scoped deadline shared by the stages of a request.
+
+``start`` sets a deadline in a context variable, so every stage of the
+request (including tasks it spawns) sees the same clock without passing it
+around. A stage asks for ``budget(reserve)``: the time left after keeping
+``reserve`` seconds for the stages after it. A stage that cuts corners to
+fit (cached/rule-based transform, fewer queries, pre-score ranking, fewer
+summaries) records that with ``degrade``, and the response reports it.
+
+Without a deadline (background jobs, other routes) budgets are unlimited.
+"""
+
+import math
+import time
+from contextvars import ContextVar
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+        self.degraded: set[str] = set()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+_current: ContextVar[Deadline | None] = ContextVar("deadline", default=None)
+
+
+def start(seconds: float) -> Deadline:
+    deadline = Deadline(seconds)
+    _current.set(deadline)
+    return deadline
+
+
+def remaining() -> float:
+    deadline = _current.get()
+    return deadline.remaining() if deadline else math.inf
+
+
+def budget(reserve: float) -> float:
+    """Seconds this stage may use while leaving ``reserve`` for later stages."""
+    return max(0.0, remaining() - reserve)
+
+
+def degrade(stage: str) -> None:
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.degraded.add(stage)
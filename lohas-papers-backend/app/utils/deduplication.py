@@ -1,49 +1,99 @@
-import re
 import logging
+import random
+import re
+import zlib
 
 from app.models.schemas import UnifiedPaper
 
 logger = logging.getLogger(__name__)
 
+# ── Near-duplicate detection (MinHash + LSH over title words) ──
+
+_MINHASH_PERMUTATIONS = 16
+_LSH_BANDS = 8  # 8 bands x 2 rows: candidates from ~0.35 Jaccard upward
+_LSH_ROWS = _MINHASH_PERMUTATIONS // _LSH_BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+
+_rng = random.Random(20240611)  # fixed seed: signatures are stable across processes
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(_MINHASH_PERMUTATIONS)
+]
+
+# Words that carry no identity (a title that differs only by these is the same)
+_TITLE_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "and", "or", "with", "to", "by",
+    "at", "from", "as", "vs", "versus", "its", "their", "is", "are",
+}
+
+# Verification thresholds on title word sets
+_JACCARD_THRESHOLD = 0.8
+_CONTAINMENT_THRESHOLD = 0.9  # shorter title (e.g. without subtitle) inside longer
+_MIN_CONTAINMENT_WORDS = 4
+
+# Title words that tell apart otherwise identical titles: numbers, roman
+# numerals and single letters ("Part I" / "Part II", "vitamin C" / "vitamin D")
+_DISTINGUISHING_WORD_RE = re.compile(r"^(?:\d+|[ivx]+|[a-z])$")
+
 
 def _normalize_title(title: str) -> str:
     """Normalize a paper title for comparison."""
     t = title.lower()
-    t = re.sub(r"[^\w\s]", "", t)
+    t = re.sub(r"[^\w\s]", " ", t)  # "all-cause" and "all cause" agree
     t = re.sub(r"\s+", " ", t).strip()
     return t
 
 
-def deduplicate_papers(papers: list[UnifiedPaper]) -> list[UnifiedPaper]:
-    """Remove duplicate papers based on DOI or normalized title.
+def deduplicate_papers(
+    papers: list[UnifiedPaper],
+    canonical_ids: dict[str, str] | None = None,
+) -> list[UnifiedPaper]:
+    """Remove duplicate papers based on canonical identity, DOI or normalized title.
 
+    ``canonical_ids`` maps paper.id to its canonical key from the identity
+    index (see services.paper_identity); papers sharing a key are merged.
     When a duplicate is found, prefer the version with more metadata
     (Semantic Scholar usually has citation counts).
     """
+    canonical_ids = canonical_ids or {}
+    seen_canonical: dict[str, int] = {}  # canonical key -> index in result
     seen_dois: dict[str, int] = {}  # doi -> index in result
     seen_titles: dict[str, int] = {}  # normalized title -> index in result
     result: list[UnifiedPaper] = []
 
     for paper in papers:
-        # Check DOI-based dedup
-        if paper.doi:
-            doi_lower = paper.doi.lower()
-            if doi_lower in seen_dois:
-                idx = seen_dois[doi_lower]
-                result[idx] = _merge_papers(result[idx], paper)
-                continue
-            seen_dois[doi_lower] = len(result)
-
-        # Check title-based dedup
+        canonical = canonical_ids.get(paper.id)
+        doi_lower = paper.doi.lower() if paper.doi else None
         norm_title = _normalize_title(paper.title)
-        if norm_title and norm_title in seen_titles:
+
+        # Check identity-index, then DOI, then title-based dedup
+        idx = None
+        if canonical and canonical in seen_canonical:
+            idx = seen_canonical[canonical]
+        elif doi_lower and doi_lower in seen_dois:
+            idx = seen_dois[doi_lower]
+        elif (
+            norm_title
+            and norm_title in seen_titles
+            and _same_work(result[seen_titles[norm_title]], paper)
+        ):
             idx = seen_titles[norm_title]
+
+        if idx is not None:
             result[idx] = _merge_papers(result[idx], paper)
-            continue
+        else:
+            idx = len(result)
+            result.append(paper)
+
+        # Register this record's keys so later aliases find the merged entry
+        if canonical:
+            seen_canonical.setdefault(canonical, idx)
+        if doi_lower:
+            seen_dois.setdefault(doi_lower, idx)
         if norm_title:
-            seen_titles[norm_title] = len(result)
+            seen_titles.setdefault(norm_title, idx)
 
-        result.append(paper)
+    result = _merge_near_duplicates(result)
 
     removed = len(papers) - len(result)
     if removed > 0:
@@ -66,5 +116,117 @@ def _merge_papers(existing: UnifiedPaper, new: UnifiedPaper) -> UnifiedPaper:
         is_open_access=existing.is_open_access or new.is_open_access,
         pdf_url=existing.pdf_url or new.pdf_url,
         abstract=existing.abstract if existing.abstract and len(existing.abstract) > len(new.abstract or "") else new.abstract,
+        mesh_terms=existing.mesh_terms or new.mesh_terms,
+        publication_types=list(dict.fromkeys(existing.publication_types + new.publication_types)),
         source=existing.source,
     )
+
+
+def _title_words(title: str) -> frozenset[str]:
+    return frozenset(w for w in _normalize_title(title).split() if w not in _TITLE_STOPWORDS)
+
+
+def _minhash(words: frozenset[str]) -> list[int]:
+    hashes = [zlib.crc32(w.encode()) for w in words]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def _author_surnames(paper: UnifiedPaper) -> set[str]:
+    return {name.split()[-1].lower() for name in paper.authors if name.split()}
+
+
+def _same_work(a: UnifiedPaper, b: UnifiedPaper) -> bool:
+    """Year/author guards for records with matching titles.
+
+    Preprint and published version are at most a year apart, and share an
+    author when both author lists are known.
+    """
+    if a.year and b.year and abs(a.year - b.year) > 1:
+        return False
+    surnames_a, surnames_b = _author_surnames(a), _author_surnames(b)
+    return not (surnames_a and surnames_b) or bool(surnames_a & surnames_b)
+
+
+def _is_near_duplicate(
+    a: UnifiedPaper, b: UnifiedPaper, words_a: frozenset[str], words_b: frozenset[str]
+) -> bool:
+    """Verify an LSH candidate pair with exact set similarity plus year/author guards."""
+    if not _same_work(a, b):
+        return False
+    distinguishing = {w for w in words_a ^ words_b if _DISTINGUISHING_WORD_RE.match(w)}
+    if distinguishing:
+        return False
+
+    authors_known = bool(_author_surnames(a) and _author_surnames(b))
+
+    overlap = len(words_a & words_b)
+    if overlap / len(words_a | words_b) >= _JACCARD_THRESHOLD:
+        return True
+
+    # Subtitle differences: the shorter title is (almost) contained in the
+    # longer one. Only trusted when shared authors confirm the match.
+    shorter = min(len(words_a), len(words_b))
+    return (
+        authors_known
+        and shorter >= _MIN_CONTAINMENT_WORDS
+        and overlap / shorter >= _CONTAINMENT_THRESHOLD
+    )
+
+
+def find_near_duplicates(papers: list[UnifiedPaper]) -> list[list[int]]:
+    """Group indices of near-duplicate papers.
+
+    Titles are reduced to word sets, MinHashed and bucketed by LSH bands, so
+    only papers sharing a bucket are compared (near-linear in practice).
+    Returns groups of size >= 2, each sorted by index.
+    """
+    words = [_title_words(p.title) for p in papers]
+    buckets: dict[tuple, list[int]] = {}
+    for i, w in enumerate(words):
+        if not w:
+            continue
+        signature = _minhash(w)
+        for band in range(_LSH_BANDS):
+            key = (band, *signature[band * _LSH_ROWS:(band + 1) * _LSH_ROWS])
+            buckets.setdefault(key, []).append(i)
+
+    # Union-find over verified candidate pairs
+    parent = list(range(len(papers)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked: set[tuple[int, int]] = set()
+    for members in buckets.values():
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                i, j = members[x], members[y]
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if find(i) != find(j) and _is_near_duplicate(papers[i], papers[j], words[i], words[j]):
+                    parent[max(find(i), find(j))] = min(find(i), find(j))
+
+    groups: dict[int, list[int]] = {}
+    for i in range(len(papers)):
+        groups.setdefault(find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def _merge_near_duplicates(papers: list[UnifiedPaper]) -> list[UnifiedPaper]:
+    """Merge each near-duplicate group into its first member, keeping order."""
+    groups = find_near_duplicates(papers)
+    if not groups:
+        return papers
+
+    merged_away: set[int] = set()
+    result = list(papers)
+    for group in groups:
+        head = group[0]
+        for i in group[1:]:
+            result[head] = _merge_papers(result[head], papers[i])
+            merged_away.add(i)
+    return [p for i, p in enumerate(result) if i not in merged_away]
@@ -0,0 +1,132 @@
+"""Hedged requests: duplicate a slow call and take whichever answers first.
+
+A ``Hedger`` tracks the latency of recent calls to one upstream. When a
+call runs longer than the observed ``quantile`` (p90 by default), the same
+call is started a second time and the first acceptable result wins. A
+losing hedge is cancelled; a losing primary is left to finish so the
+latency distribution stays that of first attempts. Hedges are capped at
+``budget`` of all calls so a slow upstream never sees more than that much
+extra traffic.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Primaries left running after a hedge won; the event loop only keeps weak
+# references to tasks, so without this they could be collected mid-flight
+_background: set[asyncio.Future] = set()
+
+
+class Hedger:
+    def __init__(
+        self,
+        name: str,
+        *,
+        budget: float = 0.05,
+        quantile: float = 0.9,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        self.name = name
+        self.budget = budget
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._hedged: deque[bool] = deque(maxlen=window * 5)  # per call: was it hedged
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def delay(self) -> float | None:
+        """Seconds after which a call is hedged, or None until enough samples exist."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(self.quantile * (len(ordered) - 1))]
+
+    def _within_budget(self) -> bool:
+        return sum(self._hedged) < self.budget * len(self._hedged)
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        *,
+        hedge_call: Callable[[], Awaitable[T]] | None = None,
+        can_hedge: Callable[[], bool] = lambda: True,
+        accept: Callable[[T], bool] = lambda result: True,
+    ) -> T:
+        """Run ``call()``, hedging it once if it is slow.
+
+        ``hedge_call`` (default: ``call``) makes the duplicate call, e.g. one
+        that gives up instead of waiting for a concurrency slot.
+        ``can_hedge`` is checked at hedge time. A result failing ``accept``
+        (e.g. an empty list a client returns on error) only wins if the
+        other call does no better.
+
+        The delay is learned from the primary call's latency only: when the
+        hedge wins, the primary is left to finish so its (slow) latency is
+        still observed. Recording the winner instead would pull the delay
+        down and make hedging more and more frequent.
+        """
+        start = time.monotonic()
+        delay = self.delay()
+        primary = asyncio.ensure_future(call())
+        primary.add_done_callback(lambda task: self._observe(start, task))
+        hedge: asyncio.Future | None = None
+        keep_primary = False
+        try:
+            if delay is not None:
+                try:
+                    return await asyncio.wait_for(asyncio.shield(primary), delay)
+                except asyncio.TimeoutError:
+                    pass
+                if self._within_budget() and can_hedge():
+                    hedge = asyncio.ensure_future((hedge_call or call)())
+                    self.hedges += 1
+
+            if hedge is None:
+                return await primary
+
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and accept(task.result()):
+                        if task is hedge:
+                            self.hedge_wins += 1
+                            keep_primary = True
+                        return task.result()
+            # Neither result was acceptable: behave as if never hedged
+            return primary.result()
+        finally:
+            # Every call counts towards the budget, including failed ones
+            self._hedged.append(hedge is not None)
+            if hedge is not None and not hedge.done():
+                hedge.cancel()
+            if keep_primary and not primary.done():
+                _background.add(primary)
+                primary.add_done_callback(_background.discard)
+            elif not primary.done():
+                primary.cancel()
+
+    def _observe(self, start: float, primary: asyncio.Future) -> None:
+        """Record the primary's latency once it completes (not if cancelled or failed)."""
+        if primary.cancelled() or primary.exception() is not None:
+            return
+        self._latencies.append(time.monotonic() - start)
+
+    def snapshot(self) -> dict:
+        delay = self.delay()
+        return {
+            "p_delay": round(delay, 3) if delay is not None else None,
+            "samples": len(self._latencies),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
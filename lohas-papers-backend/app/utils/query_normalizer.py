@@ -0,0 +1,165 @@
+import re
+import unicodedata
+from collections import OrderedDict
+
+# Japanese particles and question endings between content words
+# ("オゼンピックの効果", "ビタミンDは効く?"), only stripped next to kanji/katakana
+# or Latin text so words written in hiragana stay intact
+_JA_CONTENT = r"[゠-ヿ一-鿿a-z0-9]"
+_JA_PARTICLE_RE = re.compile(
+    rf"(?<={_JA_CONTENT})"
+    r"(?:について|に関する|による|に対する|とは|って|では|には|での|への|から|まで|"
+    r"の|は|が|を|に|で|と|も|や|へ)"
+    rf"(?={_JA_CONTENT}|\s|$)"
+)
+# Negations (ない) are not endings: "運動しない" and "運動する" differ
+_JA_ENDING_RE = re.compile(r"(?:ですか|ますか|でしょうか|かな|なの|って何|とは何|は何|か)$")
+
+# Korean particles attached to the end of a word (병원에서, 운동으로). Only
+# multi-syllable particles: one-syllable ones (과, 도, 이, 가, ...) also end
+# nouns, and stripping them turns "소아과" into "소아"
+_KO_PARTICLE_RE = re.compile(r"(?<=[가-힣a-z0-9])(?:에서|으로|에게|부터|까지)$")
+
+# Function words of the Latin-script UI languages (en, es, pt-BR, vi).
+# Negations ("not", "sin", "sem", "không") are deliberately kept: they
+# change what the user is asking for. So are single letters ("a", "e"),
+# which are vitamin names as often as articles.
+_STOPWORDS = {
+    # en
+    "an", "the", "of", "in", "on", "for", "and", "to", "by", "at", "is", "are",
+    "does", "do", "can", "what", "how", "about", "with", "from", "be", "it", "any", "which",
+    "why", "when", "should", "my",
+    # es
+    "el", "la", "los", "las", "de", "del", "en", "y", "para", "por", "un", "una", "que",
+    "es", "sobre",
+    # pt
+    "os", "as", "da", "do", "dos", "das", "um", "uma", "no", "na", "para", "sobre",
+    # vi
+    "của", "và", "là", "có", "cho", "về", "với",
+}
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_WS_RE = re.compile(r"\s+")
+_DIGITS_RE = re.compile(r"\d")
+
+# Trigram similarity two tokens need to count as the same word
+# ("supplement" / "supplements", but not "hypertension" / "hypotension")
+_TOKEN_THRESHOLD = 0.8
+
+
+def canonicalize(query: str) -> str:
+    """Canonical form of a user query for cache lookups.
+
+    NFKC (full-width/half-width), lowercase, punctuation folded to spaces,
+    particles stripped per script (Japanese, Korean) and stopwords dropped,
+    so "オゼンピック 効果", "オゼンピックの効果？" and "ｵｾﾞﾝﾋﾟｯｸの効果" agree.
+    The language is taken from the script of the text, not the UI language.
+    """
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = _PUNCT_RE.sub(" ", text)
+    text = _WS_RE.sub(" ", text).strip()
+
+    words = []
+    for word in text.split(" "):
+        word = _JA_ENDING_RE.sub("", word) if len(word) > 3 else word
+        word = _JA_PARTICLE_RE.sub(" ", word)
+        for part in word.split():
+            if len(part) > 2:
+                part = _KO_PARTICLE_RE.sub("", part)
+            if part and part not in _STOPWORDS:
+                words.append(part)
+    # A query made only of stopwords keeps its folded text
+    return " ".join(words) or text
+
+
+def _trigrams(canonical: str) -> set[str]:
+    # Spaces are dropped so "オゼンピック 効果" and "オゼンピック効果" match
+    text = canonical.replace(" ", "")
+    if len(text) < 3:
+        return {text}
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _jaccard(a: set[str], b: set[str]) -> float:
+    return len(a & b) / len(a | b)
+
+
+def _same_word(a: str, b: str) -> bool:
+    """Tokens that differ at most by an inflection; numbers must match exactly."""
+    if a == b:
+        return True
+    if _DIGITS_RE.search(a) or _DIGITS_RE.search(b):
+        return False
+    return _jaccard(_trigrams(a), _trigrams(b)) >= _TOKEN_THRESHOLD
+
+
+def _same_tokens(a: list[str], b: list[str]) -> bool:
+    """Tokens pair up in order, each with a near-identical token of the other.
+
+    Whole-query similarity cannot tell "hypertension" from "hypotension" or
+    "women" from "men"; a single mismatched content word is a different
+    question. Order matters too: "smoking cause depression" and
+    "depression cause smoking" swap cause and effect.
+    """
+    return len(a) == len(b) and all(_same_word(x, y) for x, y in zip(a, b))
+
+
+def _equivalent(a: str, b: str) -> bool:
+    """Same text in the same order, respaced or with particles dropped."""
+    return a.replace(" ", "") == b.replace(" ", "")
+
+
+class QueryIndex:
+    """Character trigram index over canonical queries for near-duplicate lookup.
+
+    Holds the most recent ``max_entries`` queries in memory. A query that
+    differs only in spacing always matches. Otherwise a match needs a
+    trigram Jaccard similarity of at least ``threshold`` and every token
+    paired, in order, with a near-identical one (see ``_same_tokens``).
+    """
+
+    def __init__(self, max_entries: int = 5000, threshold: float = 0.8):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._grams: OrderedDict[str, set[str]] = OrderedDict()
+        self._postings: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def add(self, canonical: str) -> None:
+        if canonical in self._grams:
+            self._grams.move_to_end(canonical)
+            return
+        grams = _trigrams(canonical)
+        self._grams[canonical] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(canonical)
+        while len(self._grams) > self.max_entries:
+            old, old_grams = self._grams.popitem(last=False)
+            for gram in old_grams:
+                bucket = self._postings.get(gram)
+                if bucket is not None:
+                    bucket.discard(old)
+                    if not bucket:
+                        del self._postings[gram]
+
+    def nearest(self, canonical: str) -> str | None:
+        """Most similar indexed query asking the same question, or None."""
+        grams = _trigrams(canonical)
+        overlap: dict[str, int] = {}
+        for gram in grams:
+            for other in self._postings.get(gram, ()):
+                overlap[other] = overlap.get(other, 0) + 1
+
+        tokens = canonical.split()
+        best, best_score = None, self.threshold
+        for other, shared in overlap.items():
+            if other == canonical:
+                continue
+            if _equivalent(canonical, other):
+                return other
+            score = shared / (len(grams) + len(self._grams[other]) - shared)
+            if score >= best_score and _same_tokens(tokens, other.split()):
+                best, best_score = other, score
+        return best
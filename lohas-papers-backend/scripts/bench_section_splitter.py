@@ -0,0 +1,171 @@
+"""Benchmark pdf_extractor.split_into_sections against the previous splitter.
+
+Usage (from lohas-papers-backend/):
+
+    python -m scripts.bench_section_splitter [CORPUS_DIR] [--repeat N]
+
+CORPUS_DIR holds extracted texts as *.txt files (e.g. dumped from
+extract_text_from_file). Without it a synthetic corpus of paper-shaped texts
+is generated. Both implementations must produce identical sections; the
+script exits non-zero on any mismatch.
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+from app.services.pdf_extractor import _EXCLUDE_SECTIONS, split_into_sections
+
+# ── Previous implementation (per-line loop over 13 patterns), for comparison ──
+
+_LEGACY_PATTERNS = [
+    r"(?i)^(abstract)\s*$",
+    r"(?i)^(introduction)\s*$",
+    r"(?i)^(background)\s*$",
+    r"(?i)^(methods?|materials?\s+and\s+methods?|experimental\s+methods?)\s*$",
+    r"(?i)^(results?)\s*$",
+    r"(?i)^(results?\s+and\s+discussion)\s*$",
+    r"(?i)^(discussion)\s*$",
+    r"(?i)^(conclusion|conclusions|concluding\s+remarks?)\s*$",
+    r"(?i)^(limitations?)\s*$",
+    r"(?i)^(acknowledgements?|acknowledgments?)\s*$",
+    r"(?i)^(references|bibliography)\s*$",
+    r"(?i)^(supplementary|supporting\s+information)\s*",
+    r"(?i)^(?:\d+\.?\s+|[IVX]+\.?\s+)(introduction|background|methods?|materials?\s+and\s+methods?|results?|discussion|conclusion|conclusions|limitations?|acknowledgements?|references)",
+]
+
+
+def _legacy_normalize(name: str) -> str:
+    mapping = {
+        "abstract": "Abstract", "introduction": "Introduction", "background": "Background",
+        "method": "Methods", "methods": "Methods", "materials and methods": "Methods",
+        "materials & methods": "Methods", "experimental methods": "Methods",
+        "result": "Results", "results": "Results",
+        "results and discussion": "Results and Discussion", "discussion": "Discussion",
+        "conclusion": "Conclusion", "conclusions": "Conclusion",
+        "concluding remarks": "Conclusion", "limitation": "Limitations",
+        "limitations": "Limitations", "acknowledgement": "Acknowledgements",
+        "acknowledgements": "Acknowledgements", "acknowledgment": "Acknowledgements",
+        "acknowledgments": "Acknowledgements", "references": "References",
+        "bibliography": "References", "supplementary": "Supplementary",
+        "supporting information": "Supplementary",
+    }
+    return mapping.get(name.lower().strip(), name.title())
+
+
+def _legacy_match(line: str) -> str | None:
+    for pattern in _LEGACY_PATTERNS:
+        m = re.match(pattern, line)
+        if m:
+            return _legacy_normalize(m.group(1) if m.lastindex else line)
+    return None
+
+
+def legacy_split_into_sections(text: str) -> list[dict]:
+    sections: list[dict] = []
+    current_name = "Full Text"
+    current_lines: list[str] = []
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            current_lines.append("")
+            continue
+        matched = _legacy_match(stripped)
+        if matched:
+            section_text = "\n".join(current_lines).strip()
+            if section_text:
+                sections.append({"name": current_name, "text": section_text})
+            current_name = matched
+            current_lines = []
+        else:
+            current_lines.append(line)
+    section_text = "\n".join(current_lines).strip()
+    if section_text:
+        sections.append({"name": current_name, "text": section_text})
+    if len(sections) <= 1:
+        return [{"name": "Full Text", "text": text.strip()}]
+    filtered = [
+        s for s in sections
+        if s["name"].lower() not in _EXCLUDE_SECTIONS and len(s["text"]) >= 50
+    ]
+    return filtered if filtered else [{"name": "Full Text", "text": text.strip()}]
+
+
+# ── Corpus ──
+
+_HEADERS = [
+    "Abstract", "1. Introduction", "Background", "2 Materials and Methods", "METHODS",
+    "Results", "3. Results", "Results and Discussion", "IV. Discussion", "Discussion",
+    "Conclusions", "Concluding Remarks", "Limitations", "Acknowledgements",
+    "Supplementary Materials", "References",
+]
+_WORDS = (
+    "patients cohort randomized placebo trial weight loss glucose insulin outcome "
+    "analysis hazard ratio confidence interval mean baseline week dose adverse events "
+    "significant reduction participants primary endpoint secondary methods results"
+).split()
+
+
+def synthetic_corpus(n_docs: int = 40, seed: int = 7) -> list[str]:
+    """Paper-shaped texts of ~2k-8k lines with headers, blank and ragged lines."""
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(n_docs):
+        lines = ["A Study of Something Important", "J. Doe, A. Smith", ""]
+        for header in rng.sample(_HEADERS, k=rng.randint(5, len(_HEADERS))):
+            lines.append(header if rng.random() < 0.8 else f"  {header}  ")
+            for _ in range(rng.randint(100, 500)):
+                r = rng.random()
+                if r < 0.08:
+                    lines.append("" if r < 0.05 else "   ")
+                else:
+                    lines.append(" ".join(rng.choices(_WORDS, k=rng.randint(4, 14))))
+        docs.append("\n".join(lines))
+    return docs
+
+
+def load_corpus(path: Path) -> list[str]:
+    return [p.read_text(errors="replace") for p in sorted(path.glob("*.txt"))]
+
+
+def bench(fn, docs: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for doc in docs:
+            fn(doc)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="?", type=Path, help="directory of *.txt extractions")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if not docs:
+        print("Corpus is empty", file=sys.stderr)
+        return 1
+
+    mismatches = sum(split_into_sections(d) != legacy_split_into_sections(d) for d in docs)
+    n_lines = sum(d.count("\n") + 1 for d in docs)
+    n_mb = sum(len(d) for d in docs) / 1e6
+
+    legacy = bench(legacy_split_into_sections, docs, args.repeat)
+    current = bench(split_into_sections, docs, args.repeat)
+
+    print(f"corpus: {len(docs)} docs, {n_lines:,} lines, {n_mb:.1f} MB")
+    print(f"legacy:  {legacy * 1000:8.1f} ms  ({n_lines / legacy / 1e6:.2f} M lines/s)")
+    print(f"current: {current * 1000:8.1f} ms  ({n_lines / current / 1e6:.2f} M lines/s)")
+    print(f"speedup: {legacy / current:.1f}x")
+    print(f"mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
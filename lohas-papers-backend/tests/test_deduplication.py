@@ -0,0 +1,106 @@
+import pytest
+
+from app.models.schemas import UnifiedPaper
+from app.utils.deduplication import deduplicate_papers, find_near_duplicates
+
+SMITH = ["John Smith", "Maria Garcia", "Kenji Tanaka"]
+LEE = ["Soo-jin Lee", "David Brown"]
+
+
+def _paper(id: str, title: str, authors: list[str], year: int | None = 2023, **kwargs) -> UnifiedPaper:
+    return UnifiedPaper(id=id, title=title, authors=authors, year=year, **kwargs)
+
+
+# (first, second): records of the same paper that should merge
+DUPLICATES = [
+    pytest.param(
+        _paper("s2:1", "Semaglutide and weight loss in adults with obesity: a randomized trial", SMITH, 2022),
+        _paper("pm:1", "Semaglutide and Weight Loss in Adults with Obesity: A Randomized Trial.", SMITH, 2023, source="pubmed"),
+        id="preprint-vs-published",
+    ),
+    pytest.param(
+        _paper("s2:2", "Vitamin D supplementation and depressive symptoms in older adults", SMITH),
+        _paper("pm:2", "Vitamin D supplementation and depressive symptoms in older adults: a systematic review and meta-analysis", SMITH, source="pubmed"),
+        id="subtitle-added",
+    ),
+    pytest.param(
+        _paper("s2:3", "Intermittent fasting versus daily calorie restriction for weight loss: the TREAT trial", LEE),
+        _paper("pm:3", "Intermittent fasting versus daily calorie restriction for weight loss", LEE, source="pubmed"),
+        id="subtitle-dropped",
+    ),
+    pytest.param(
+        _paper("s2:4", "Effects of creatine monohydrate on muscle strength in older women.", LEE),
+        _paper("pm:4", "EFFECTS OF CREATINE MONOHYDRATE ON MUSCLE STRENGTH IN OLDER WOMEN", LEE, source="pubmed"),
+        id="trailing-period-and-case",
+    ),
+    pytest.param(
+        _paper("s2:5", "Coffee consumption and all-cause mortality in a large prospective cohort", SMITH),
+        _paper("pm:5", "Coffee consumption and all cause mortality in a large prospective cohort study", [], source="pubmed"),
+        id="hyphen-and-extra-word-authors-unknown",
+    ),
+]
+
+# (first, second): different papers that should stay separate
+DISTINCT = [
+    pytest.param(
+        _paper("s2:10", "Probiotics for the prevention of antibiotic-associated diarrhea in children", SMITH),
+        _paper("s2:11", "Probiotics for the prevention of antibiotic-associated diarrhea in adults", LEE),
+        id="similar-title-different-authors",
+    ),
+    pytest.param(
+        _paper("s2:12", "Effects of exercise training on cognitive function in older adults with mild cognitive impairment", SMITH),
+        _paper("s2:13", "Effects of exercise training on cognitive function in older adults with mild cognitive impairment", LEE),
+        id="same-title-different-authors",
+    ),
+    pytest.param(
+        _paper("s2:14", "Long-term outcomes of bariatric surgery in adolescents with severe obesity: Part I", SMITH),
+        _paper("s2:15", "Long-term outcomes of bariatric surgery in adolescents with severe obesity: Part II", SMITH),
+        id="numbered-parts-roman",
+    ),
+    pytest.param(
+        _paper("s2:16", "Global burden of hypertension in adults aged 30 to 79 years: part 1 methods", SMITH),
+        _paper("s2:17", "Global burden of hypertension in adults aged 30 to 79 years: part 2 methods", SMITH),
+        id="numbered-parts-arabic",
+    ),
+    pytest.param(
+        _paper("s2:18", "Mediterranean diet and cardiovascular events: an updated meta-analysis", SMITH, 2015),
+        _paper("s2:19", "Mediterranean diet and cardiovascular events: an updated meta-analysis", SMITH, 2019),
+        id="same-title-years-apart",
+    ),
+]
+
+
+@pytest.mark.parametrize("first, second", DUPLICATES)
+def test_duplicates_merge(first, second):
+    assert len(deduplicate_papers([first, second])) == 1
+
+
+@pytest.mark.parametrize("first, second", DISTINCT)
+def test_distinct_papers_stay_separate(first, second):
+    assert len(deduplicate_papers([first, second])) == 2
+
+
+def test_precision_and_recall_on_fixtures():
+    """All fixture papers in one batch: every duplicate pair found, nothing else."""
+    pairs = [p.values for p in DUPLICATES + DISTINCT]
+    papers = [paper for pair in pairs for paper in pair]
+    expected = {(2 * i, 2 * i + 1) for i in range(len(DUPLICATES))}
+
+    found = set()
+    for group in find_near_duplicates(papers):
+        found |= {(a, b) for a in group for b in group if a < b}
+
+    true_positives = len(found & expected)
+    precision = true_positives / len(found) if found else 1.0
+    recall = true_positives / len(expected)
+    assert (precision, recall) == (1.0, 1.0), sorted(found ^ expected)
+
+
+def test_merge_keeps_richer_record():
+    s2 = _paper("s2:20", "Melatonin for insomnia in adults", SMITH, citation_count=120)
+    pm = _paper("pm:20", "Melatonin for Insomnia in Adults.", SMITH, source="pubmed", pmid="123", abstract="Background...")
+    [merged] = deduplicate_papers([s2, pm])
+    assert merged.id == "s2:20"
+    assert merged.pmid == "123"
+    assert merged.citation_count == 120
+    assert merged.abstract == "Background..."
@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+
+from app.external import semantic_scholar
+from app.utils import hedging
+from app.utils.hedging import Hedger
+
+# Simulated upstream: most calls take 2ms, ``slow_share`` of them stall for
+# 50 or 100ms (seeded, so runs are reproducible)
+_FAST, _SLOW = 0.002, (0.05, 0.1)
+
+
+def _upstream(slow_share: float, slots: int = 4):
+    semaphore = asyncio.Semaphore(slots)
+    rng = random.Random(7)
+
+    async def call() -> list[int]:
+        async with semaphore:
+            await asyncio.sleep(rng.choice(_SLOW) if rng.random() < slow_share else _FAST)
+            return [1]
+
+    return call, semaphore
+
+
+async def _measure(hedger: Hedger | None, slow_share: float, calls: int = 200) -> list[float]:
+    call, semaphore = _upstream(slow_share)
+    latencies = []
+    for _ in range(calls):
+        start = time.monotonic()
+        if hedger is None:
+            await call()
+        else:
+            await hedger.run(call, can_hedge=lambda: not semaphore.locked(), accept=bool)
+        latencies.append(time.monotonic() - start)
+    await asyncio.sleep(_SLOW[1])  # let primaries that lost to a hedge finish
+    return sorted(latencies)
+
+
+def test_hedging_cuts_tail_latency():
+    async def scenario():
+        plain = await _measure(None, slow_share=0.05)
+        # The p90 delay sits just above the fast calls, so timer jitter alone
+        # hedges up to ~10% of them; leave budget for the slow ones too
+        hedger = Hedger("sim", budget=0.2, min_samples=20)
+        await _measure(hedger, slow_share=0.05, calls=50)  # calls before min_samples are never hedged
+        hedged = await _measure(hedger, slow_share=0.05)
+        return plain, hedged, hedger
+
+    plain, hedged, hedger = asyncio.run(scenario())
+    p99 = int(0.99 * (len(plain) - 1))
+    assert hedger.hedges > 0
+    assert hedged[p99] < plain[p99] / 2
+
+
+def test_delay_learns_from_primary_latency_only():
+    """Winning hedges must not pull the hedge delay below the upstream's real p95.
+
+    15% of calls are slow (half 50ms, half 100ms), so the real p95 is 100ms.
+    Recording the winner's latency would put hedged 100ms calls at ~52ms.
+    """
+
+    async def scenario():
+        hedger = Hedger("sim", budget=0.5, quantile=0.95, min_samples=20)
+        await _measure(hedger, slow_share=0.15, calls=400)
+        return hedger
+
+    hedger = asyncio.run(scenario())
+    assert hedger.hedge_wins > 0
+    assert hedger.delay() >= 0.9 * _SLOW[1]
+
+
+def test_hedge_budget_is_respected():
+    async def scenario():
+        hedger = Hedger("sim", budget=0.05, min_samples=20)
+        await _measure(hedger, slow_share=0.15, calls=400)
+        return hedger
+
+    hedger = asyncio.run(scenario())
+    assert 0 < hedger.hedges <= 0.05 * 400 + 1
+
+
+def test_hedge_does_not_queue_for_a_limiter_slot():
+    async def scenario():
+        semaphore = semantic_scholar._semaphore
+        held = 0
+        while not semaphore.locked():
+            await semaphore.acquire()
+            held += 1
+        try:
+            start = time.monotonic()
+            result = await semantic_scholar.search_papers("metformin", wait_for_slot=False)
+            return result, time.monotonic() - start
+        finally:
+            for _ in range(held):
+                semaphore.release()
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == []
+    assert elapsed < 0.05
+
+
+def test_failed_calls_count_towards_the_budget():
+    async def scenario():
+        hedger = Hedger("sim", min_samples=0)
+        hedger._latencies.append(1.0)
+
+        async def fail() -> list[int]:
+            raise RuntimeError("upstream down")
+
+        try:
+            await hedger.run(fail)
+        except RuntimeError:
+            pass
+        return hedger
+
+    hedger = asyncio.run(scenario())
+    assert list(hedger._hedged) == [False]
+
+
+def test_primary_outliving_a_winning_hedge_is_kept_alive():
+    async def scenario():
+        hedger = Hedger("sim", budget=1.0, min_samples=0)
+        hedger._latencies.append(0.01)
+        hedger._hedged.append(False)  # the budget is a share of earlier calls
+        calls = iter([0.2, 0.0])
+
+        async def call() -> list[int]:
+            await asyncio.sleep(next(calls))
+            return [1]
+
+        await hedger.run(call)
+        kept = len(hedging._background)
+        await asyncio.sleep(0.3)
+        return hedger, kept
+
+    hedger, kept = asyncio.run(scenario())
+    assert hedger.hedge_wins == 1
+    assert kept == 1
+    assert not hedging._background
+    assert len(hedger._latencies) == 2  # the primary's latency was still observed
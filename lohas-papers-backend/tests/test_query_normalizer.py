@@ -0,0 +1,54 @@
+import pytest
+
+from app.utils.query_normalizer import QueryIndex, canonicalize
+
+
+def _index(*queries: str) -> QueryIndex:
+    index = QueryIndex()
+    for q in queries:
+        index.add(canonicalize(q))
+    return index
+
+
+@pytest.mark.parametrize(
+    "indexed, query",
+    [
+        ("hypertension treatment elderly patients", "hypotension treatment elderly patients"),
+        ("semaglutide weight loss women", "semaglutide weight loss men"),
+        ("vitamin c immune function", "vitamin d immune function"),
+        ("vitamin d 1000iu daily", "vitamin d 2000iu daily"),
+        ("運動する 睡眠", "運動しない 睡眠"),
+        ("weight gain metformin", "height gain metformin"),
+        ("smoking cause depression", "depression cause smoking"),
+        ("糖尿病 腎臓病", "腎臓病 糖尿病"),
+    ],
+)
+def test_different_questions_are_not_reused(indexed, query):
+    assert _index(indexed).nearest(canonicalize(query)) is None
+
+
+@pytest.mark.parametrize(
+    "indexed, query",
+    [
+        ("オゼンピックの効果", "オゼンピック効果"),
+        ("オゼンピックの効果は?", "オゼンピック効果"),
+        ("semaglutide weight loss", "semaglutide weightloss"),
+        ("creatine supplement muscle mass", "creatine supplements muscle mass"),
+        ("vitamin d 1000 iu", "vitamin d 1000iu"),
+    ],
+)
+def test_same_questions_are_reused(indexed, query):
+    assert _index(indexed).nearest(canonicalize(query)) == canonicalize(indexed)
+
+
+def test_negation_is_kept():
+    assert canonicalize("運動しない") != canonicalize("運動する")
+    assert "ない" in canonicalize("運動しない")
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [("소아과 추천", "소아과 추천"), ("피부과 레이저", "피부과 레이저"), ("병원에서 검사", "병원 검사")],
+)
+def test_korean_nouns_keep_their_last_syllable(query, expected):
+    assert canonicalize(query) == expected
@@ -0,0 +1,47 @@
+import pytest
+
+from app.services import query_rules
+
+CANCER = "(metformin OR Glucophage OR biguanides) AND (cancer OR neoplasms OR malignancy OR tumor)"
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["メトホルミン がん", "メトホルミンとがん", "メトホルミンはがんに効く", "メトホルミン 癌", "metformin cancer"],
+)
+def test_particles_between_terms_are_dropped_whole(query):
+    result = query_rules.transform(query)
+    assert result is not None
+    assert result.academic_queries[0] == "metformin cancer"
+    assert result.academic_queries[1] == CANCER
+    assert result.key_concepts["conditions"] == ["cancer"]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "vitamin d depression elderly",  # "elderly" narrows the question
+        "肺癌 メトホルミン",  # 肺 (lung) is not covered
+        "メトホルミンは何に効く",
+        "がんばる メトホルミン",
+    ],
+)
+def test_meaningful_leftover_falls_back_to_llm(query):
+    assert query_rules.transform(query) is None
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["メトホルミンはがんに効く", "ビタミンDはうつに効く", "オゼンピックで痩せる", "coffee and blood pressure"],
+)
+def test_queries_never_contain_unmatched_text(query):
+    result = query_rules.transform(query)
+    assert result is not None
+    for q in result.academic_queries:
+        assert not query_rules._CJK_RE.search(q), q
+
+
+def test_ignored_words_are_dropped():
+    result = query_rules.transform("オゼンピックの効果")
+    assert result is not None
+    assert result.academic_queries[0] == "semaglutide"